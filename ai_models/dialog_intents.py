@@ -0,0 +1,296 @@
+"""
+Классификация сообщений игрока в дипломатическом чате.
+
+EnhancedDiplomacyChat.generate_diplomatic_response проверяет сообщение
+цепочкой предикатов _is_* в порядке приоритета, и раньше каждый из них
+заново приводил текст к нижнему регистру и перебирал свои списки слов —
+работа росла с числом намерений на каждое отправленное сообщение.
+
+Здесь собраны словари ключевых слов этих предикатов и таблица триггеров:
+для каждого намерения — слова, без которых его предикат не может сработать
+(для предикатов с регулярными выражениями сюда же добавлены обязательные
+фрагменты шаблонов). DialogClassifier за один проход автоматом
+Ахо–Корасик находит всех кандидатов, и точный предикат вызывается только
+для них. DIALOG_DISPATCH задаёт порядок намерений и их обработчики.
+
+При изменении шаблонов в _is_war_declaration и _is_insult_or_threat
+обновите *_PATTERN_TRIGGERS.
+"""
+
+from ai_models.lerdon_ai.intent_matcher import KeywordAutomaton
+
+CONTEXT_RESET_KEYWORDS = [
+    'забудь', 'забей', 'обнули', 'сбрось', 'начнем заново', 'отстань', 'отвали',
+    'очисти', 'удали контекст', 'стереть', 'забудь все',
+    'сбросить контекст', 'забудь что было', 'начни сначала',
+    'рестарт', 'перезагрузка', 'очистить историю',
+    'сбросим', 'забудем', 'начать с начала',
+    'очистить чат', 'стереть память', 'новый диалог',
+    'сбрось все', 'забудь предыдущее', 'очисти разговор'
+]
+
+CONTEXT_RESET_PHRASES = [
+    'забудь все что было',
+    'сбрось контекст чата',
+    'очисти историю разговора',
+    'начнем диалог заново',
+    'забудь предыдущий разговор',
+    'стереть память о чате',
+    'новый разговор'
+]
+
+HOW_ARE_YOU_KEYWORDS = [
+    'как дела', 'как ты', 'как ваши дела', 'что нового', 'как твои дела',
+    'как поживаешь', 'как жизнь', 'как успехи', 'как сам', 'как ты там',
+    'как оно', 'как делишки', 'что по жизни', 'как настроение',
+    'как здоровье', 'как ты себя чувствуешь'
+]
+
+WHAT_DO_YOU_THINK_KEYWORDS = [
+    'что думаешь', 'что скажешь', 'как считаешь', 'как думаешь',
+    'твоё мнение', 'ты как', 'что на это скажешь', 'что скажешь по поводу',
+    'как тебе', 'что думаешь о', 'что скажешь насчёт', 'твои мысли'
+]
+
+RELATIONSHIP_STATUS_KEYWORDS = [
+    'мы друзья', 'друзья ли мы', 'мы с тобой друзья', 'дружим ли мы',
+    'мы приятели', 'приятели ли мы', 'мы с тобой приятели',
+    'мы партнеры', 'партнеры ли мы', 'мы с тобой партнеры',
+    'как ты меня считаешь', 'кто я для тебя', 'ты меня как воспринимаешь',
+    'ты меня как считаешь', 'какой у нас статус', 'какой наш статус',
+    'ты мой друг', 'я тебе друг', 'ты мне друг',
+    'ты мой приятель', 'я тебе приятель', 'ты мне приятель',
+    'ты мой партнер', 'я тебе партнер', 'ты мне партнер',
+    'кем я для тебя являюсь', 'кем ты меня считаешь'
+]
+
+RELATION_CHECK_KEYWORDS = [
+    'какие отношения', 'как ты ко мне относишься', 'как наши отношения',
+    'отношения с', 'что думаешь о', 'как воспринимаешь',
+    'наши взаимоотношения', 'как обстоят дела между нами',
+    'что скажешь о наших отношениях', 'как мы ладим'
+]
+
+IMPROVE_RELATIONS_KEYWORDS = [
+    'улучшить отношения', 'наладить отношения', 'налаживать отношения',
+    'подружиться', 'стать друзьями', 'укрепить отношения',
+    'наладить связи', 'улучшить контакт', 'наладить диалог',
+    'сблизиться', 'наладить дружбу', 'улучшить взаимопонимание',
+    'построить мосты', 'наладить сотрудничество'
+]
+
+RESOURCE_INQUIRY_WORDS = ['че по', 'че с', 'сколько', 'как много', 'какое количество', 'есть ли', 'хватает ли', 'что с', 'есть']
+
+INSULT_KEYWORDS = [
+    'дурак', 'идиот', 'дебил', 'кретин', 'тупица', 'олух',
+    'мудак', 'козел', 'сволочь', 'подонок', 'ублюдок', 'сука',
+    'тварь', 'скотина', 'жмот', 'жадина', 'трус',
+    'ничтожество', 'отброс', 'мусор', 'гнида', 'паразит',
+    'уебок', 'пидор', 'педик', 'гомик', 'педераст',
+    'задницу', 'жопу', 'хую', 'хуюшки', 'петух',
+    'выебать тебя', 'выебали тебя', 'тебя выебал',
+    'тебя выебать',
+    'гандон', 'уебан', 'пидр', 'охуел', 'ебало',
+    'шлюха', 'блядь', 'проститутка', 'шалава',
+    'выродок', 'урод', 'калека', 'инвалид',
+    'сучонок', 'сучий потрох', 'пёс', 'собака',
+    'свинья', 'осёл', 'кобыла', 'жеребец',
+    'хуй', 'пизда', 'ебать', 'блять', 'еблище', 'ебанашка',
+    'хуило', 'долбоеб', 'тебе пиздец', 'ебло', 'петух', 'пидарасина',
+    'ебало', 'вагина', 'ебасосина', 'пиздабол', 'петушара', 'петуш',
+    'пошёл нахуй', 'иди нахуй', 'пошёл ты', 'пошла ты',
+    'заткнись', 'заткни пасть', 'завались', 'отстань',
+    'отъебись', 'отвали', 'проваливай', 'съеби',
+    'сдохни', 'подыхай', 'сгинь', 'исчезни',
+    'чтоб ты сдох', 'чтоб ты подавился', 'чтоб ты сгнил',
+    'гнилой', 'прогнивший', 'вонючий', 'воняешь',
+    'тупой', 'безмозглый', 'бездарность', 'неудачник',
+    'жалкий', 'жалкое', 'ничтожный', 'мелкий',
+    'тряпка', 'сопляк', 'молокосос', 'щенок',
+    'предатель', 'изменник', 'иуда', 'Иуда',
+    'вор', 'жулик', 'мошенник', 'аферист',
+    'лжец', 'лгун', 'врун', 'обманщик',
+    'трус', 'боязливый', 'пугливый', 'трусливый',
+    'жадный', 'жадина', 'скряга', 'скупой'
+]
+
+THREAT_KEYWORDS = [
+    'убью', 'убить', 'уничтожу', 'уничтожить',
+    'раздавлю', 'раздавить', 'сотру', 'стереть',
+    'сожгу', 'сжечь', 'разорву', 'разорвать',
+    'повешу', 'повесить', 'казню', 'казнить',
+    'запорю', 'запороть', 'зарежу', 'зарезать',
+    'застрелю', 'застрелить', 'задушу', 'задушить',
+    'покалечу', 'покалечить', 'изувечу', 'изувечить',
+    'изнасилую', 'изнасиловать', 'надругаюсь', 'надругаться',
+    'опущу', 'опустить', 'унижу', 'унизить',
+    'отомщу', 'отомстить', 'отплачу', 'отплатить',
+    'накажу', 'наказать', 'покараю', 'покарать',
+    'покончу', 'покончить', 'прикончу', 'прикончить',
+    'сотру с лица земли', 'стереть с карты',
+    'вырежу', 'вырезать', 'выжгу', 'выжечь',
+    'превращу в пепел', 'в пыль', 'в труху',
+    'не оставлю камня на камне', 'камня на камне не оставлю',
+    'сотру в порошок', 'в порошок сотру',
+    'сделаю из тебя фарш', 'фарш сделаю',
+    'костей не соберёшь', 'не соберёшь костей'
+]
+
+STATUS_INQUIRY_KEYWORDS = [
+    'как дела', 'как ты', 'как ваши дела', 'что нового', 'как твои дела', 'ты как',
+    'как поживаешь', 'как жизнь', 'как успехи', 'что по войскам',
+    'как армия', 'сила армии', 'мощь', 'могущество', 'состояние',
+    'положение', 'обстановка', 'ситуация'
+]
+
+ALLIANCE_KEYWORDS = [
+    'союз', 'альянс', 'объединиться', 'сотрудничать',
+    'вместе', 'союзники', 'дружить', 'помогать друг другу',
+    'заключить союз', 'создать альянс', 'стать союзниками',
+    'общий союз', 'военный союз', 'договор о союзе'
+]
+
+PEACE_KEYWORDS = [
+    'мир', 'перемирие', 'закончить войну', 'прекратить войну',
+    'договор о мире', 'заключить мир', 'прекратить боевые действия',
+    'остановить войну', 'мирный договор', 'примирение'
+]
+
+WAR_KEYWORDS = [
+    'война', 'объявляю войну', 'нападу', 'нападем', 'нападете', 'напасть',
+    'атаковать', 'атакую', 'атакуем', 'атакуете',
+    'вторгнуться', 'вторгнусь', 'вторгнемся', 'вторгнетесь',
+    'воевать', 'буду воевать', 'будем воевать', 'будете воевать',
+    'военные действия', 'начать войну', 'развязать войну',
+    'уничтожить', 'уничтожу', 'уничтожим', 'уничтожите',
+    'разгромить', 'разгромлю', 'разгромим', 'разгромите',
+    'сокрушить', 'сокрушу', 'сокрушим', 'сокрушите',
+    'убить', 'убью', 'убьем', 'убьете',
+    'ликвидировать', 'ликвидирую', 'ликвидируем', 'ликвидируете',
+    'стереть с лица земли', 'стереть с карты',
+    'конец', 'конец нашему миру', 'конец переговорам',
+    'умри', 'сдохни', 'погибни', 'пропади',
+    'ненавижу', 'ненавидим', 'ненавидите',
+    'уничтожу тебя', 'убью тебя', 'раздавлю тебя',
+    'в моих глазах ты уже мертв', 'ты труп',
+    'готовься к бою', 'готовься к войне', 'готовься умирать',
+    'между нами война', 'сейчас будет война',
+    'твоя смерть близка', 'ваша гибель неизбежна',
+    'кровопролитие', 'кровь прольется', 'будет кровь'
+]
+
+WAR_THREAT_WORDS = ['убью', 'уничтожу', 'раздавлю', 'сотру', 'стеру', 'сожгу', 'разорву']
+
+PROVOCATION_KEYWORDS = [
+    'напади', 'атакуй', 'уничтожь', 'разгроми', 'бей', 'вреж', 'ударь',
+    'воевать', 'воюй', 'сражайся', 'воевал', 'воевать с', 'воюй с',
+    'устрани', 'ликвидируй', 'уничтожить', 'раздави', 'сотри', 'стереть',
+    'напасть', 'атаковать', 'нападение', 'атака', 'вторжение',
+    'подстрека', 'спровоцируй', 'спровоцировать', 'провоцируй',
+    'объяви войну', 'объявить войну', 'объявляй войну',
+    'иди войной', 'иди на', 'иди против', 'выступи против',
+    'уничтожь их', 'разбей их', 'победи их', 'расправься с'
+]
+
+RELATIONSHIP_BREAK_KEYWORDS = [
+    'разорвать', 'прекратить', 'конец', 'хватит',
+    'достало', 'надоело', 'закончить', 'покончить',
+    'больше не', 'не хочу', 'не буду', 'хватит общаться',
+    'прекращаю', 'заканчиваю', 'прощай навсегда'
+]
+
+RESOURCE_REQUEST_WORDS = [
+    'нужен', 'нужны', 'нужно', 'нуждаюсь', 'нуждается',
+    'дай', 'дайте', 'предоставь', 'предоставьте', 'отдай', 'отдайте',
+    'подкинь', 'скинь', 'переведи',
+    'хочу', 'хотел', 'хотела', 'хотелось', 'желаю', 'желаем',
+    'получить', 'получать', 'достать', 'надо', 'надобно',
+    'можно', 'мог бы', 'могла бы', 'могли бы',
+    'прошу', 'просим', 'просят', 'просите',
+    'требую', 'требуем', 'требуют', 'требуется', 'требуются',
+    'необходим', 'необходимы', 'необходимо', 'необходима',
+    'хотелось бы', 'хотеться', 'хотят', 'хотим',
+    'выдели', 'выделите', 'предоставишь', 'можешь дать',
+    'помоги с', 'нужна помощь', 'помоги получить'
+]
+
+RESOURCE_REQUEST_PHRASES = [
+    'мне нужны', 'нужно мне', 'дайте мне', 'хочу получить',
+    'можно получить', 'могли бы дать', 'хотел бы получить',
+    'прошу тебя о', 'выдели мне', 'предоставь мне'
+]
+
+# Обязательные фрагменты регулярных выражений _is_war_declaration
+WAR_PATTERN_TRIGGERS = ['ты умр', 'ты сдохнешь', 'смерть', 'на ножах', 'к оружию']
+
+# Обязательные фрагменты регулярных выражений _is_insult_or_threat
+INSULT_PATTERN_TRIGGERS = [
+    'теб', 'ешь', 'чтоб', 'нахуй', 'заткни',
+    'сдохнешь', 'подыхаешь', 'сгниёшь', 'исчезнешь',
+    'убью', 'уничтожу', 'раздавлю'
+]
+
+# {намерение: слова, хотя бы одно из которых нужно предикату _is_<намерение>}
+INTENT_TRIGGERS = {
+    'context_reset': CONTEXT_RESET_KEYWORDS + CONTEXT_RESET_PHRASES,
+    'how_are_you_social': HOW_ARE_YOU_KEYWORDS,
+    'what_do_you_think': WHAT_DO_YOU_THINK_KEYWORDS,
+    'relationship_status_inquiry': RELATIONSHIP_STATUS_KEYWORDS,
+    'relation_check': RELATION_CHECK_KEYWORDS,
+    'improve_relations_request': IMPROVE_RELATIONS_KEYWORDS,
+    'resource_inquiry': RESOURCE_INQUIRY_WORDS,
+    'insult_or_threat': INSULT_KEYWORDS + THREAT_KEYWORDS + INSULT_PATTERN_TRIGGERS,
+    'status_inquiry': STATUS_INQUIRY_KEYWORDS,
+    'alliance_proposal': ALLIANCE_KEYWORDS,
+    'peace_proposal': PEACE_KEYWORDS,
+    'war_declaration': WAR_KEYWORDS + WAR_THREAT_WORDS + WAR_PATTERN_TRIGGERS,
+    'provocation': PROVOCATION_KEYWORDS,
+    'relationship_break': RELATIONSHIP_BREAK_KEYWORDS,
+    'resource_request': RESOURCE_REQUEST_WORDS + RESOURCE_REQUEST_PHRASES,
+}
+
+# Намерения в порядке приоритета: (намерение, обработчик, дополнительные аргументы).
+# Обработчик вызывается как handler(message, faction, *аргументы).
+DIALOG_DISPATCH = [
+    ('how_are_you_social', '_handle_how_are_you_social', ('relation_level',)),
+    ('what_do_you_think', '_handle_what_do_you_think', ('relation_level',)),
+    ('relationship_status_inquiry', '_handle_relationship_status_inquiry', ('relation_level', 'status')),
+    ('relation_check', '_handle_relation_check', ('relation_level', 'status')),
+    ('improve_relations_request', '_handle_improve_relations_request', ('relation_level',)),
+    ('resource_inquiry', '_handle_resource_inquiry', ('relation_level',)),
+    ('insult_or_threat', '_handle_insult_or_threat', ('relation_level',)),
+    ('status_inquiry', '_handle_status_inquiry', ('relation_level',)),
+    ('alliance_proposal', '_handle_alliance_proposal', ('relation_level',)),
+    ('peace_proposal', '_handle_peace_proposal', ()),
+    ('war_declaration', '_handle_war_declaration', ()),
+    ('provocation', '_handle_provocation', ('relation_level',)),
+    ('relationship_break', '_handle_relationship_break', ()),
+    ('resource_request', '_handle_resource_request', ('relation_level',)),
+]
+
+
+class DialogClassifier:
+    """Кандидаты в намерения за один проход по сообщению."""
+
+    def __init__(self, triggers=None):
+        self._automaton = KeywordAutomaton()
+        for intent, words in (triggers or INTENT_TRIGGERS).items():
+            for word in words:
+                self._automaton.add(word, intent)
+
+    def candidates(self, message):
+        """
+        :param message: Сообщение игрока.
+        :return: Множество намерений, предикаты которых стоит проверить.
+        """
+        return set(self._automaton.scan(message.lower()))
+
+
+_classifier = None
+
+
+def get_dialog_classifier():
+    global _classifier
+    if _classifier is None:
+        _classifier = DialogClassifier()
+    return _classifier
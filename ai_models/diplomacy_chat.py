@@ -16,7 +16,17 @@ from kivy.metrics import dp
 from kivy.clock import Clock
 from datetime import datetime
 
+from army_strength import get_army_strength
+
 from .manipulation_strategy import ManipulationStrategy
+from .dialog_intents import (
+    ALLIANCE_KEYWORDS, CONTEXT_RESET_KEYWORDS, CONTEXT_RESET_PHRASES, DIALOG_DISPATCH,
+    HOW_ARE_YOU_KEYWORDS, IMPROVE_RELATIONS_KEYWORDS, INSULT_KEYWORDS, PEACE_KEYWORDS,
+    PROVOCATION_KEYWORDS, RELATION_CHECK_KEYWORDS, RELATIONSHIP_BREAK_KEYWORDS,
+    RELATIONSHIP_STATUS_KEYWORDS, RESOURCE_INQUIRY_WORDS, RESOURCE_REQUEST_PHRASES,
+    RESOURCE_REQUEST_WORDS, STATUS_INQUIRY_KEYWORDS, THREAT_KEYWORDS, WAR_KEYWORDS,
+    WAR_THREAT_WORDS, WHAT_DO_YOU_THINK_KEYWORDS, get_dialog_classifier,
+)
 import platform
 from .android_keyboard import AndroidKeyboardHelper
 
@@ -343,7 +353,7 @@ class EnhancedDiplomacyChat():
         message_lower = message.lower().strip()
 
         # Ключевые слова для вопросов
-        question_words = ['че по', 'че с', 'сколько', 'как много', 'какое количество', 'есть ли', 'хватает ли', 'что с', 'есть']
+        question_words = RESOURCE_INQUIRY_WORDS
         has_question = any(word in message_lower for word in question_words)
 
         if not has_question:
@@ -1068,12 +1078,22 @@ class EnhancedDiplomacyChat():
         relation_level = int(relation_data.get("relation_level", 50))
         status = relation_data.get('status', 'нейтралитет')
 
-        message_lower = player_message.lower()
+        # Один проход по сообщению: намерения, предикаты которых могут сработать
+        candidates = get_dialog_classifier().candidates(player_message)
+
+        checked = {}
+
+        def matches(intent):
+            if intent not in candidates:
+                return False
+            if intent not in checked:
+                checked[intent] = getattr(self, f"_is_{intent}")(player_message)
+            return checked[intent]
 
         # ===== ПЕРВЫЙ ПРИОРИТЕТ: Проверка на плохие отношения =====
         if relation_level < 20:
             # Если отношения очень плохие, проверяем на оскорбления/угрозы
-            if self._is_insult_or_threat(player_message):
+            if matches("insult_or_threat"):
                 # Усиливаем агрессию в ответ
                 hostile_responses = [
                     "Ах ты сучий потрох! Да я тебя самого в мясо порублю! Война!",
@@ -1105,7 +1125,7 @@ class EnhancedDiplomacyChat():
                     return random.choice(hostile_responses)
 
             # При плохих отношениях на любой запрос ресурсов/армии - хамство
-            if self._is_resource_request(player_message) or self._is_status_inquiry(player_message):
+            if matches("resource_request") or matches("status_inquiry"):
                 rude_responses = [
                     "Ты что, совсем охренел?! Ресурсы у меня просить?! Иди к чёрту!",
                     "Ресурсы? Да ты совсем рехнулся! Убирайся, пока цел!",
@@ -1116,7 +1136,7 @@ class EnhancedDiplomacyChat():
                 return random.choice(rude_responses)
 
         # Проверяем на сброс контекста (добавляем в самое начало)
-        if self._is_context_reset(player_message):
+        if matches("context_reset"):
             return self._handle_context_reset(player_message, target_faction)
 
         # 1. Проверяем контекст переговоров
@@ -1134,123 +1154,12 @@ class EnhancedDiplomacyChat():
             if forced:
                 return forced
 
-        # 2. Проверка на социальные вопросы "Как дела?"
-        if self._is_how_are_you_social(player_message):
-            return self._handle_how_are_you_social(player_message, target_faction, relation_level)
-
-        # 3. Проверка на другие социальные вопросы
-        if self._is_what_do_you_think(player_message):
-            return self._handle_what_do_you_think(player_message, target_faction, relation_level)
-
-        if self._is_relationship_status_inquiry(player_message):
-            return self._handle_relationship_status_inquiry(player_message, target_faction, relation_level, status)
-
-        # 4. Проверка запроса о текущих отношениях (числовой уровень)
-        if self._is_relation_check(player_message):
-            return self._handle_relation_check(player_message, target_faction, relation_level, status)
-
-        # 5. Проверка на запрос улучшения отношений
-        if self._is_improve_relations_request(player_message):
-            return self._handle_improve_relations_request(player_message, target_faction, relation_level)
-
-        # 6. ПРОВЕРКА НА ВОПРОСЫ О РЕСУРСАХ (ТОЧНЫЕ ЦИФРЫ)
-        if self._is_resource_inquiry(player_message):
-            return self._handle_resource_inquiry(player_message, target_faction, relation_level)
-
-        # 7. ПРОВЕРКА НА ОСКОРБЛЕНИЯ И УГРОЗЫ (ПЕРЕД ВОЙНОЙ)
-        if self._is_insult_or_threat(player_message):
-            return self._handle_insult_or_threat(player_message, target_faction, relation_level)
-
-        # 8. ПРОВЕРКА НА ВОПРОСЫ О ДЕЛАХ/СОСТОЯНИИ/РЕСУРСАХ/АРМИИ (общие)
-        if self._is_status_inquiry(player_message):
-            # При плохих отношениях - хамим на запросы о ресурсах/армии
-            if relation_level < 20:
-                rude_responses = [
-                    "Тебя не касается что у меня с ресурсами! Убирайся!",
-                    "Хватит выспрашивать! Мои дела - не твои дела!",
-                    "Иди к чёрту со своими вопросами о ресурсах!",
-                    "Ты что, шпион? Заткнись уже!",
-                    "Не твоё собачье дело что у меня есть! Пошёл вон!",
-                    "Хватит лезть в мои дела! Проваливай!"
-                ]
-                return random.choice(rude_responses)
-            # При хороших отношениях - нормальный ответ
-            else:
-                return self._generate_status_response(target_faction)
-
-        # 9. ПРОВЕРКА НА ПРЕДЛОЖЕНИЯ СОЮЗА
-        if self._is_alliance_proposal(player_message):
-            return self._handle_alliance_proposal(player_message, target_faction, relation_level)
-
-        # 10. ПРОВЕРКА НА ПРЕДЛОЖЕНИЯ МИРА
-        if self._is_peace_proposal(player_message):
-            return self._handle_peace_proposal(player_message, target_faction)
-
-        # 11. ПРОВЕРКА НА ОБЪЯВЛЕНИЕ ВОЙНЫ
-        if self._is_war_declaration(player_message):
-            return self._handle_war_declaration(player_message, target_faction)
-
-        # 12. ПРОВЕРКА НА ПОДСТРЕКАТЕЛЬСТВО/ПРОВОКАЦИЮ
-        if self._is_provocation(player_message):
-            return self._handle_provocation(player_message, target_faction, relation_level)
-
-        # 13. ПРОВЕРКА НА РАЗРЫВ ОТНОШЕНИЙ
-        if self._is_relationship_break(player_message):
-            return self._handle_relationship_break(player_message, target_faction)
-
-        # 14. НОВАЯ ЛОГИКА: Определяем запрос ресурсов БЕЗ указания типа/количества
-        is_resource_request = self._is_resource_request(player_message)
-
-        if is_resource_request:
-            # При плохих отношениях - сразу хамим на запросы ресурсов
-            if relation_level < 20:
-                rude_responses = [
-                    "Ты что, совсем охренел?! Ресурсы у меня просить?!",
-                    "Ресурсы? Да ты совсем рехнулся! Убирайся!",
-                    "Какие ещё нахрен ресурсы?! Пошёл вон!",
-                    "Ресурсы? Для тебя? Ты мне насрал в борщ!",
-                    "Хватит попрошайничать! Исчезни!",
-                    "Тебе нужны ресурсы? А мне нужен мир без тебя! Убирайся!"
-                ]
-                return random.choice(rude_responses)
-
-            # Извлекаем упоминания ресурсов (очищенные от общих слов)
-            resource_mentions = self._extract_resource_mentions(player_message)
-            amount = self._extract_number(player_message)
-
-            print(
-                f"DEBUG: is_resource_request={is_resource_request}, resource_mentions={resource_mentions}, amount={amount}")
-
-            # Случай 1: Общий запрос без указания типа ("мне нужны ресурсы")
-            if not resource_mentions:
-                # Инициируем уточнение типа ресурса
-                self.negotiation_context[target_faction] = {
-                    "stage": "ask_resource_type",
-                    "counter_offers": 0
-                }
-                return ("Если тебе нужны ресурсы то что именно: Кроны (деньги), Кристаллы (минералы) или Рабочие ("
-                        "люди)? Если ты хотел что то другое, то попробуй перефразировать.")
-
-            # Случай 2: Указан тип ресурса, но не количество ("мне нужны деньги")
-            elif resource_mentions and not amount:
-                resource_type = resource_mentions[0]
-                self.negotiation_context[target_faction] = {
-                    "stage": "ask_resource_amount",
-                    "resource": resource_type,
-                    "counter_offers": 0
-                }
-                return f"Сколько {resource_type} тебе нужно?"
-
-            # Случай 3: Указан тип и количество ("дай 1000 крон")
-            elif resource_mentions and amount:
-                resource_type = resource_mentions[0]
-                self.negotiation_context[target_faction] = {
-                    "stage": "ask_player_offer",
-                    "resource": resource_type,
-                    "amount": amount,
-                    "counter_offers": 0
-                }
-                return f"Хочешь {amount:,} {resource_type}? Что предлагаешь взамен?"
+        # 2-14. Намерения в порядке приоритета (см. DIALOG_DISPATCH)
+        handler_args = {"relation_level": relation_level, "status": status}
+        for intent, handler_name, extra_args in DIALOG_DISPATCH:
+            if matches(intent):
+                return getattr(self, handler_name)(
+                    player_message, target_faction, *(handler_args[name] for name in extra_args))
 
         # 15. Старый метод как запасной вариант для прямых запросов
         trade_offer = self._extract_trade_offer(player_message)
@@ -1292,11 +1201,7 @@ class EnhancedDiplomacyChat():
 
     def _is_what_do_you_think(self, message):
         """Определяет, является ли сообщение вопросом 'Что думаешь?'"""
-        think_keywords = [
-            'что думаешь', 'что скажешь', 'как считаешь', 'как думаешь',
-            'твоё мнение', 'ты как', 'что на это скажешь', 'что скажешь по поводу',
-            'как тебе', 'что думаешь о', 'что скажешь насчёт', 'твои мысли'
-        ]
+        think_keywords = WHAT_DO_YOU_THINK_KEYWORDS
 
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in think_keywords)
@@ -1342,17 +1247,7 @@ class EnhancedDiplomacyChat():
 
     def _is_relationship_status_inquiry(self, message):
         """Определяет, является ли сообщение запросом о статусе отношений (друзья/приятели и т.д.)"""
-        status_keywords = [
-            'мы друзья', 'друзья ли мы', 'мы с тобой друзья', 'дружим ли мы',
-            'мы приятели', 'приятели ли мы', 'мы с тобой приятели',
-            'мы партнеры', 'партнеры ли мы', 'мы с тобой партнеры',
-            'как ты меня считаешь', 'кто я для тебя', 'ты меня как воспринимаешь',
-            'ты меня как считаешь', 'какой у нас статус', 'какой наш статус',
-            'ты мой друг', 'я тебе друг', 'ты мне друг',
-            'ты мой приятель', 'я тебе приятель', 'ты мне приятель',
-            'ты мой партнер', 'я тебе партнер', 'ты мне партнер',
-            'кем я для тебя являюсь', 'кем ты меня считаешь'
-        ]
+        status_keywords = RELATIONSHIP_STATUS_KEYWORDS
 
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in status_keywords)
@@ -1449,12 +1344,7 @@ class EnhancedDiplomacyChat():
 
     def _is_how_are_you_social(self, message):
         """Определяет, является ли сообщение чисто социальным вопросом 'Как дела?' без запроса о ресурсах/армии"""
-        social_keywords = [
-            'как дела', 'как ты', 'как ваши дела', 'что нового', 'как твои дела',
-            'как поживаешь', 'как жизнь', 'как успехи', 'как сам', 'как ты там',
-            'как оно', 'как делишки', 'что по жизни', 'как настроение',
-            'как здоровье', 'как ты себя чувствуешь'
-        ]
+        social_keywords = HOW_ARE_YOU_KEYWORDS
 
         # Исключаем слова, связанные с ресурсами/армией
         exclude_keywords = [
@@ -2201,30 +2091,13 @@ class EnhancedDiplomacyChat():
         message_lower = message.lower().strip()
 
         # Список слов для запросов (расширенный)
-        request_words = [
-            'нужен', 'нужны', 'нужно', 'нуждаюсь', 'нуждается',
-            'дай', 'дайте', 'предоставь', 'предоставьте', 'отдай', 'отдайте',
-            'подкинь', 'скинь', 'переведи',
-            'хочу', 'хотел', 'хотела', 'хотелось', 'желаю', 'желаем',
-            'получить', 'получать', 'достать', 'надо', 'надобно',
-            'можно', 'мог бы', 'могла бы', 'могли бы',
-            'прошу', 'просим', 'просят', 'просите',
-            'требую', 'требуем', 'требуют', 'требуется', 'требуются',
-            'необходим', 'необходимы', 'необходимо', 'необходима',
-            'хотелось бы', 'хотеться', 'хотят', 'хотим',
-            'выдели', 'выделите', 'предоставишь', 'можешь дать',
-            'помоги с', 'нужна помощь', 'помоги получить'
-        ]
+        request_words = RESOURCE_REQUEST_WORDS
 
         # Проверяем наличие слов запроса
         has_request = any(req_word in message_lower for req_word in request_words)
 
         # Проверяем специальные фразы
-        special_phrases = [
-            'мне нужны', 'нужно мне', 'дайте мне', 'хочу получить',
-            'можно получить', 'могли бы дать', 'хотел бы получить',
-            'прошу тебя о', 'выдели мне', 'предоставь мне'
-        ]
+        special_phrases = RESOURCE_REQUEST_PHRASES
 
         has_special_phrase = any(phrase in message_lower for phrase in special_phrases)
 
@@ -2722,12 +2595,7 @@ class EnhancedDiplomacyChat():
 
     def _is_relation_check(self, message):
         """Определяет, является ли сообщение запросом о текущих отношениях"""
-        relation_keywords = [
-            'какие отношения', 'как ты ко мне относишься', 'как наши отношения',
-            'отношения с', 'что думаешь о', 'как воспринимаешь',
-            'наши взаимоотношения', 'как обстоят дела между нами',
-            'что скажешь о наших отношениях', 'как мы ладим'
-        ]
+        relation_keywords = RELATION_CHECK_KEYWORDS
 
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in relation_keywords)
@@ -3352,14 +3220,78 @@ class EnhancedDiplomacyChat():
         if any(word in message_lower for word in resource_words):
             return False
 
-        inquiry_keywords = [
-            'как дела', 'как ты', 'как ваши дела', 'что нового', 'как твои дела', 'ты как',
-            'как поживаешь', 'как жизнь', 'как успехи', 'что по войскам',
-            'как армия', 'сила армии', 'мощь', 'могущество', 'состояние',
-            'положение', 'обстановка', 'ситуация'
-        ]
+        inquiry_keywords = STATUS_INQUIRY_KEYWORDS
         return any(keyword in message_lower for keyword in inquiry_keywords)
 
+    def _handle_status_inquiry(self, message, faction, relation_level):
+        """Обрабатывает общий вопрос о делах/состоянии/армии"""
+        # При плохих отношениях - хамим на запросы о ресурсах/армии
+        if relation_level < 20:
+            rude_responses = [
+                "Тебя не касается что у меня с ресурсами! Убирайся!",
+                "Хватит выспрашивать! Мои дела - не твои дела!",
+                "Иди к чёрту со своими вопросами о ресурсах!",
+                "Ты что, шпион? Заткнись уже!",
+                "Не твоё собачье дело что у меня есть! Пошёл вон!",
+                "Хватит лезть в мои дела! Проваливай!"
+            ]
+            return random.choice(rude_responses)
+        # При хороших отношениях - нормальный ответ
+        else:
+            return self._generate_status_response(faction)
+
+    def _handle_resource_request(self, message, faction, relation_level):
+        """Обрабатывает запрос ресурсов (с уточнением типа и количества)"""
+        # При плохих отношениях - сразу хамим на запросы ресурсов
+        if relation_level < 20:
+            rude_responses = [
+                "Ты что, совсем охренел?! Ресурсы у меня просить?!",
+                "Ресурсы? Да ты совсем рехнулся! Убирайся!",
+                "Какие ещё нахрен ресурсы?! Пошёл вон!",
+                "Ресурсы? Для тебя? Ты мне насрал в борщ!",
+                "Хватит попрошайничать! Исчезни!",
+                "Тебе нужны ресурсы? А мне нужен мир без тебя! Убирайся!"
+            ]
+            return random.choice(rude_responses)
+
+        # Извлекаем упоминания ресурсов (очищенные от общих слов)
+        resource_mentions = self._extract_resource_mentions(message)
+        amount = self._extract_number(message)
+
+        print(
+            f"DEBUG: is_resource_request=True, resource_mentions={resource_mentions}, amount={amount}")
+
+        # Случай 1: Общий запрос без указания типа ("мне нужны ресурсы")
+        if not resource_mentions:
+            # Инициируем уточнение типа ресурса
+            self.negotiation_context[faction] = {
+                "stage": "ask_resource_type",
+                "counter_offers": 0
+            }
+            return ("Если тебе нужны ресурсы то что именно: Кроны (деньги), Кристаллы (минералы) или Рабочие ("
+                    "люди)? Если ты хотел что то другое, то попробуй перефразировать.")
+
+        # Случай 2: Указан тип ресурса, но не количество ("мне нужны деньги")
+        elif resource_mentions and not amount:
+            resource_type = resource_mentions[0]
+            self.negotiation_context[faction] = {
+                "stage": "ask_resource_amount",
+                "resource": resource_type,
+                "counter_offers": 0
+            }
+            return f"Сколько {resource_type} тебе нужно?"
+
+        # Случай 3: Указан тип и количество ("дай 1000 крон")
+        elif resource_mentions and amount:
+            resource_type = resource_mentions[0]
+            self.negotiation_context[faction] = {
+                "stage": "ask_player_offer",
+                "resource": resource_type,
+                "amount": amount,
+                "counter_offers": 0
+            }
+            return f"Хочешь {amount:,} {resource_type}? Что предлагаешь взамен?"
+
     def _generate_status_response(self, faction):
         """Генерирует ответ о состоянии дел фракции"""
         try:
@@ -3409,51 +3341,14 @@ class EnhancedDiplomacyChat():
     def _calculate_army_strength(self, faction):
         """Рассчитывает силу армии фракции"""
         try:
-            cursor = self.db_connection.cursor()
-
-            cursor.execute("""
-                SELECT g.unit_name, g.unit_count, u.attack, u.defense, u.durability, u.unit_class 
-                FROM garrisons g
-                JOIN units u ON g.unit_name = u.unit_name
-                WHERE u.faction = ?
-            """, (faction,))
-            units_data = cursor.fetchall()
-
-            total_strength = 0
-            class_1_count = 0
-            hero_bonus = 0
-            others_stats = 0
-
-            for unit_name, unit_count, attack, defense, durability, unit_class in units_data:
-                stats_sum = attack + defense + durability
-
-                if unit_class == "1":
-                    class_1_count += unit_count
-                    total_strength += stats_sum * unit_count
-                elif unit_class in ("2", "3"):
-                    hero_bonus += stats_sum * unit_count
-                else:
-                    others_stats += stats_sum * unit_count
-
-            if class_1_count > 0:
-                total_strength += hero_bonus * class_1_count
-
-            total_strength += others_stats
-
-            return total_strength
-
+            return get_army_strength(self.db_connection).pooled_power(faction)
         except Exception as e:
             print(f"Ошибка при расчете силы армии: {e}")
             return 0
 
     def _is_alliance_proposal(self, message):
         """Определяет, является ли сообщение предложением союза"""
-        alliance_keywords = [
-            'союз', 'альянс', 'объединиться', 'сотрудничать',
-            'вместе', 'союзники', 'дружить', 'помогать друг другу',
-            'заключить союз', 'создать альянс', 'стать союзниками',
-            'общий союз', 'военный союз', 'договор о союзе'
-        ]
+        alliance_keywords = ALLIANCE_KEYWORDS
 
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in alliance_keywords)
@@ -3659,11 +3554,7 @@ class EnhancedDiplomacyChat():
 
     def _is_peace_proposal(self, message):
         """Определяет, является ли сообщение предложением мира"""
-        peace_keywords = [
-            'мир', 'перемирие', 'закончить войну', 'прекратить войну',
-            'договор о мире', 'заключить мир', 'прекратить боевые действия',
-            'остановить войну', 'мирный договор', 'примирение'
-        ]
+        peace_keywords = PEACE_KEYWORDS
 
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in peace_keywords)
@@ -3829,16 +3720,7 @@ class EnhancedDiplomacyChat():
         }
 
         # Ключевые слова для подстрекательства (расширенные)
-        provocation_keywords = [
-            'напади', 'атакуй', 'уничтожь', 'разгроми', 'бей', 'вреж', 'ударь',
-            'воевать', 'воюй', 'сражайся', 'воевал', 'воевать с', 'воюй с',
-            'устрани', 'ликвидируй', 'уничтожить', 'раздави', 'сотри', 'стереть',
-            'напасть', 'атаковать', 'нападение', 'атака', 'вторжение',
-            'подстрека', 'спровоцируй', 'спровоцировать', 'провоцируй',
-            'объяви войну', 'объявить войну', 'объявляй войну',
-            'иди войной', 'иди на', 'иди против', 'выступи против',
-            'уничтожь их', 'разбей их', 'победи их', 'расправься с'
-        ]
+        provocation_keywords = PROVOCATION_KEYWORDS
 
         # Проверяем наличие ключевых слов провокации
         has_provocation = any(keyword in message_lower for keyword in provocation_keywords)
@@ -4206,12 +4088,7 @@ class EnhancedDiplomacyChat():
 
     def _is_relationship_break(self, message):
         """Определяет, является ли сообщение разрывом отношений"""
-        break_keywords = [
-            'разорвать', 'прекратить', 'конец', 'хватит',
-            'достало', 'надоело', 'закончить', 'покончить',
-            'больше не', 'не хочу', 'не буду', 'хватит общаться',
-            'прекращаю', 'заканчиваю', 'прощай навсегда'
-        ]
+        break_keywords = RELATIONSHIP_BREAK_KEYWORDS
 
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in break_keywords)
@@ -4336,13 +4213,7 @@ class EnhancedDiplomacyChat():
 
     def _is_improve_relations_request(self, message):
         """Определяет, является ли сообщение запросом на улучшение отношений"""
-        improve_keywords = [
-            'улучшить отношения', 'наладить отношения', 'налаживать отношения',
-            'подружиться', 'стать друзьями', 'укрепить отношения',
-            'наладить связи', 'улучшить контакт', 'наладить диалог',
-            'сблизиться', 'наладить дружбу', 'улучшить взаимопонимание',
-            'построить мосты', 'наладить сотрудничество'
-        ]
+        improve_keywords = IMPROVE_RELATIONS_KEYWORDS
 
         message_lower = message.lower()
         return any(keyword in message_lower for keyword in improve_keywords)
@@ -4576,28 +4447,12 @@ class EnhancedDiplomacyChat():
 
     def _is_context_reset(self, message):
         """Определяет, является ли сообщение командой сброса контекста"""
-        reset_keywords = [
-            'забудь', 'забей', 'обнули', 'сбрось', 'начнем заново', 'отстань', 'отвали',
-            'очисти', 'удали контекст', 'стереть', 'забудь все',
-            'сбросить контекст', 'забудь что было', 'начни сначала',
-            'рестарт', 'перезагрузка', 'очистить историю',
-            'сбросим', 'забудем', 'начать с начала',
-            'очистить чат', 'стереть память', 'новый диалог',
-            'сбрось все', 'забудь предыдущее', 'очисти разговор'
-        ]
+        reset_keywords = CONTEXT_RESET_KEYWORDS
 
         message_lower = message.lower()
 
         # Также проверяем комбинации с дополнениями
-        reset_phrases = [
-            'забудь все что было',
-            'сбрось контекст чата',
-            'очисти историю разговора',
-            'начнем диалог заново',
-            'забудь предыдущий разговор',
-            'стереть память о чате',
-            'новый разговор'
-        ]
+        reset_phrases = CONTEXT_RESET_PHRASES
 
         # Проверяем отдельные слова
         if any(keyword in message_lower for keyword in reset_keywords):
@@ -4611,28 +4466,7 @@ class EnhancedDiplomacyChat():
 
     def _is_war_declaration(self, message):
         """Определяет, является ли сообщение объявлением войны - УЛУЧШЕННАЯ ВЕРСИЯ"""
-        war_keywords = [
-            'война', 'объявляю войну', 'нападу', 'нападем', 'нападете', 'напасть',
-            'атаковать', 'атакую', 'атакуем', 'атакуете',
-            'вторгнуться', 'вторгнусь', 'вторгнемся', 'вторгнетесь',
-            'воевать', 'буду воевать', 'будем воевать', 'будете воевать',
-            'военные действия', 'начать войну', 'развязать войну',
-            'уничтожить', 'уничтожу', 'уничтожим', 'уничтожите',
-            'разгромить', 'разгромлю', 'разгромим', 'разгромите',
-            'сокрушить', 'сокрушу', 'сокрушим', 'сокрушите',
-            'убить', 'убью', 'убьем', 'убьете',
-            'ликвидировать', 'ликвидирую', 'ликвидируем', 'ликвидируете',
-            'стереть с лица земли', 'стереть с карты',
-            'конец', 'конец нашему миру', 'конец переговорам',
-            'умри', 'сдохни', 'погибни', 'пропади',
-            'ненавижу', 'ненавидим', 'ненавидите',
-            'уничтожу тебя', 'убью тебя', 'раздавлю тебя',
-            'в моих глазах ты уже мертв', 'ты труп',
-            'готовься к бою', 'готовься к войне', 'готовься умирать',
-            'между нами война', 'сейчас будет война',
-            'твоя смерть близка', 'ваша гибель неизбежна',
-            'кровопролитие', 'кровь прольется', 'будет кровь'
-        ]
+        war_keywords = WAR_KEYWORDS
 
         message_lower = message.lower()
 
@@ -4661,7 +4495,7 @@ class EnhancedDiplomacyChat():
         has_aggressive_patterns = any(re.search(pattern, message_lower) for pattern in aggressive_patterns)
 
         # Проверяем комбинацию угроз с упоминанием войны
-        threat_words = ['убью', 'уничтожу', 'раздавлю', 'сотру', 'стеру', 'сожгу', 'разорву']
+        threat_words = WAR_THREAT_WORDS
         war_words = ['война', 'сражение', 'битва', 'бой', 'конфликт', 'войну', 'воевать', 'драться', 'дратся', 'подеремся', 'подраться']
 
         has_threat = any(threat in message_lower for threat in threat_words)
@@ -4802,60 +4636,9 @@ class EnhancedDiplomacyChat():
 
     def _is_insult_or_threat(self, message):
         """Определяет, является ли сообщение оскорблением или угрозой - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
-        insult_keywords = [
-            'дурак', 'идиот', 'дебил', 'кретин', 'тупица', 'олух',
-            'мудак', 'козел', 'сволочь', 'подонок', 'ублюдок', 'сука',
-            'тварь', 'скотина', 'жмот', 'жадина', 'трус',
-            'ничтожество', 'отброс', 'мусор', 'гнида', 'паразит',
-            'уебок', 'пидор', 'педик', 'гомик', 'педераст',
-            'задницу', 'жопу', 'хую', 'хуюшки', 'петух',
-            'выебать тебя', 'выебали тебя', 'тебя выебал',
-            'тебя выебать',
-            'гандон', 'уебан', 'пидр', 'охуел', 'ебало',
-            'шлюха', 'блядь', 'проститутка', 'шалава',
-            'выродок', 'урод', 'калека', 'инвалид',
-            'сучонок', 'сучий потрох', 'пёс', 'собака',
-            'свинья', 'осёл', 'кобыла', 'жеребец',
-            'хуй', 'пизда', 'ебать', 'блять', 'еблище', 'ебанашка',
-            'хуило', 'долбоеб', 'тебе пиздец', 'ебло', 'петух', 'пидарасина',
-            'ебало', 'вагина', 'ебасосина', 'пиздабол', 'петушара', 'петуш',
-            'пошёл нахуй', 'иди нахуй', 'пошёл ты', 'пошла ты',
-            'заткнись', 'заткни пасть', 'завались', 'отстань',
-            'отъебись', 'отвали', 'проваливай', 'съеби',
-            'сдохни', 'подыхай', 'сгинь', 'исчезни',
-            'чтоб ты сдох', 'чтоб ты подавился', 'чтоб ты сгнил',
-            'гнилой', 'прогнивший', 'вонючий', 'воняешь',
-            'тупой', 'безмозглый', 'бездарность', 'неудачник',
-            'жалкий', 'жалкое', 'ничтожный', 'мелкий',
-            'тряпка', 'сопляк', 'молокосос', 'щенок',
-            'предатель', 'изменник', 'иуда', 'Иуда',
-            'вор', 'жулик', 'мошенник', 'аферист',
-            'лжец', 'лгун', 'врун', 'обманщик',
-            'трус', 'боязливый', 'пугливый', 'трусливый',
-            'жадный', 'жадина', 'скряга', 'скупой'
-        ]
+        insult_keywords = INSULT_KEYWORDS
 
-        threat_keywords = [
-            'убью', 'убить', 'уничтожу', 'уничтожить',
-            'раздавлю', 'раздавить', 'сотру', 'стереть',
-            'сожгу', 'сжечь', 'разорву', 'разорвать',
-            'повешу', 'повесить', 'казню', 'казнить',
-            'запорю', 'запороть', 'зарежу', 'зарезать',
-            'застрелю', 'застрелить', 'задушу', 'задушить',
-            'покалечу', 'покалечить', 'изувечу', 'изувечить',
-            'изнасилую', 'изнасиловать', 'надругаюсь', 'надругаться',
-            'опущу', 'опустить', 'унижу', 'унизить',
-            'отомщу', 'отомстить', 'отплачу', 'отплатить',
-            'накажу', 'наказать', 'покараю', 'покарать',
-            'покончу', 'покончить', 'прикончу', 'прикончить',
-            'сотру с лица земли', 'стереть с карты',
-            'вырежу', 'вырезать', 'выжгу', 'выжечь',
-            'превращу в пепел', 'в пыль', 'в труху',
-            'не оставлю камня на камне', 'камня на камне не оставлю',
-            'сотру в порошок', 'в порошок сотру',
-            'сделаю из тебя фарш', 'фарш сделаю',
-            'костей не соберёшь', 'не соберёшь костей'
-        ]
+        threat_keywords = THREAT_KEYWORDS
 
         message_lower = message.lower()
 
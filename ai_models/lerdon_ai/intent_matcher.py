@@ -0,0 +1,186 @@
+"""
+Скомпилированный поиск ключевых слов для UltraLightDiplomacyAI.
+
+Раньше каждое сообщение проверялось отдельной проверкой `keyword in text`
+для каждого ключевого слова намерений, каждого выученного паттерна, слов
+настроения, ресурсов и фракций — время ответа росло вместе со словарём,
+который пополняет learn_from_feedback.
+
+KeywordAutomaton — автомат Ахо–Корасик: все ключевые слова ищутся за один
+проход по тексту, независимо от их числа. Новые слова добавляются в бор
+сразу, а суффиксные ссылки пересчитываются лениво, при следующем поиске.
+IntentMatcher собирает в один автомат все словари ИИ и за тот же проход
+выделяет числа из сообщения.
+"""
+
+from collections import deque
+
+# Группы ключевых слов
+GROUP_INTENT = 'intent'
+GROUP_LEARNED = 'learned'
+GROUP_POSITIVE = 'positive'
+GROUP_NEGATIVE = 'negative'
+GROUP_RESOURCE = 'resource'
+GROUP_FACTION = 'faction'
+
+POSITIVE_WORDS = ['спасибо', 'благодарю', 'рад', 'отличн', 'прекрасн', 'замечательн']
+NEGATIVE_WORDS = ['война', 'угроз', 'уничтож', 'ненавижу', 'враг', 'смерть']
+RESOURCE_WORDS = ["золот", "кристал", "еда", "пищ", "ресурс", "материал"]
+FACTION_WORDS = ["север", "эльф", "вампир", "адепт", "элин", "мятежник"]
+
+
+class KeywordAutomaton:
+    """Автомат Ахо–Корасик: поиск всех вхождений набора строк за один проход."""
+
+    def __init__(self):
+        self._goto = [{}]       # Переходы бора: [{символ: узел}]
+        self._fail = [0]        # Суффиксные ссылки
+        self._output = [[]]     # Метки слов, оканчивающихся в узле
+        self._dict_link = [0]   # Ближайший по суффиксным ссылкам узел с метками
+        self._dirty = False
+
+    def add(self, word, label):
+        """Добавляет слово; label возвращается при каждом найденном вхождении."""
+        if not word:
+            return
+        node = 0
+        for ch in word:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._dict_link.append(0)
+                self._goto[node][ch] = next_node
+            node = next_node
+        self._output[node].append(label)
+        self._dirty = True
+
+    def remove(self, word, label):
+        """Убирает метку слова (узлы бора остаются, на поиск это не влияет)."""
+        node = 0
+        for ch in word:
+            node = self._goto[node].get(ch)
+            if node is None:
+                return
+        if label in self._output[node]:
+            self._output[node].remove(label)
+
+    def _build_links(self):
+        goto, fail, output, dict_link = self._goto, self._fail, self._output, self._dict_link
+        queue = deque()
+        for child in goto[0].values():
+            fail[child] = 0
+            dict_link[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                link = goto[state].get(ch, 0)
+                fail[child] = link if link != child else 0
+                dict_link[child] = fail[child] if output[fail[child]] else dict_link[fail[child]]
+                queue.append(child)
+        self._dirty = False
+
+    def scan(self, text, on_digits=None):
+        """
+        Находит ключевые слова в тексте.
+        :param on_digits: Вызывается для каждой последовательности цифр в тексте.
+        :return: {метка: число вхождений}.
+        """
+        if self._dirty:
+            self._build_links()
+        goto, fail, output, dict_link = self._goto, self._fail, self._output, self._dict_link
+        found = {}
+        node = 0
+        digits_start = None
+        for position, ch in enumerate(text):
+            if on_digits is not None:
+                if ch.isdecimal():
+                    if digits_start is None:
+                        digits_start = position
+                elif digits_start is not None:
+                    on_digits(text[digits_start:position])
+                    digits_start = None
+
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            state = node if output[node] else dict_link[node]
+            while state:
+                for label in output[state]:
+                    found[label] = found.get(label, 0) + 1
+                state = dict_link[state]
+        if on_digits is not None and digits_start is not None:
+            on_digits(text[digits_start:])
+        return found
+
+
+class IntentMatcher:
+    """Все словари UltraLightDiplomacyAI в одном автомате."""
+
+    def __init__(self, keyword_patterns, learned_patterns):
+        """
+        :param keyword_patterns: {намерение: {"keywords": [...], "weight": ...}}.
+        :param learned_patterns: {паттерн: данные} — выученные паттерны.
+        """
+        self._automaton = KeywordAutomaton()
+        self._learned = {}  # {паттерн: порядковый номер} — порядок как в learned_patterns
+        self._learned_seq = 0
+        # Порядок намерений — как при прежнем последовательном переборе
+        self._intent_order = {intent: i for i, intent in enumerate(keyword_patterns)}
+        for intent, data in keyword_patterns.items():
+            for position, keyword in enumerate(data["keywords"]):
+                # Повтор слова в списке намерения считается, как и раньше, дважды
+                self._automaton.add(keyword, (GROUP_INTENT, intent, position))
+        for group, words in ((GROUP_POSITIVE, POSITIVE_WORDS), (GROUP_NEGATIVE, NEGATIVE_WORDS),
+                             (GROUP_RESOURCE, RESOURCE_WORDS), (GROUP_FACTION, FACTION_WORDS)):
+            for word in words:
+                self._automaton.add(word, (group, word))
+        for pattern in learned_patterns:
+            self.add_learned(pattern)
+
+    def add_learned(self, pattern):
+        if pattern not in self._learned:
+            self._learned_seq += 1
+            self._learned[pattern] = self._learned_seq
+            self._automaton.add(pattern, (GROUP_LEARNED, pattern))
+
+    def remove_learned(self, pattern):
+        if self._learned.pop(pattern, None) is not None:
+            self._automaton.remove(pattern, (GROUP_LEARNED, pattern))
+
+    def match(self, text):
+        """
+        Один проход по тексту (уже в нижнем регистре).
+        :return: Словарь:
+            intent_hits — {намерение: число найденных ключевых слов},
+            learned — найденные выученные паттерны (в порядке обучения),
+            positive / negative — число найденных слов настроения,
+            resources / targets — найденные ресурсы и фракции (в порядке словарей),
+            numbers — числа из текста.
+        """
+        numbers = []
+        found = self._automaton.scan(text, on_digits=lambda digits: numbers.append(int(digits)))
+
+        hit_counts = {}
+        for label in found:
+            if label[0] == GROUP_INTENT:
+                hit_counts[label[1]] = hit_counts.get(label[1], 0) + 1
+        labels = set(found)
+        return {
+            "intent_hits": {intent: hit_counts[intent]
+                            for intent in sorted(hit_counts, key=self._intent_order.get)},
+            "learned": sorted((label[1] for label in labels if label[0] == GROUP_LEARNED),
+                              key=self._learned.get),
+            "positive": sum(1 for word in POSITIVE_WORDS if (GROUP_POSITIVE, word) in labels),
+            "negative": sum(1 for word in NEGATIVE_WORDS if (GROUP_NEGATIVE, word) in labels),
+            "resources": [word for word in RESOURCE_WORDS if (GROUP_RESOURCE, word) in labels],
+            "targets": [word for word in FACTION_WORDS if (GROUP_FACTION, word) in labels],
+            "numbers": numbers,
+        }
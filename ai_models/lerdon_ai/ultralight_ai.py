@@ -1,6 +1,5 @@
 import json
 import os
-import re
 import random
 from datetime import datetime
 from collections import defaultdict, Counter
@@ -9,6 +8,8 @@ import gzip
 from typing import Dict, List, Optional, Tuple
 import sqlite3
 
+from ai_models.lerdon_ai.intent_matcher import IntentMatcher
+
 class UltraLightDiplomacyAI:
     """Самый легковесный дипломатический ИИ - полностью на Python, без зависимостей"""
 
@@ -21,6 +22,7 @@ class UltraLightDiplomacyAI:
         self.response_templates = {}    # Намерения → шаблоны ответов
         self.conversation_memory = []   # Краткая память диалога
         self.learned_patterns = {}      # Выученные паттерны от игрока
+        self._matcher = None            # Автомат ключевых слов (строится при первом анализе)
         self.personality = self._get_faction_personality(faction)
 
         # Состояние
@@ -319,30 +321,34 @@ class UltraLightDiplomacyAI:
 
     # ========== ОСНОВНАЯ ЛОГИКА ==========
 
+    def _get_matcher(self) -> IntentMatcher:
+        """Автомат по всем словарям; пересобирается только после замены словарей"""
+        if self._matcher is None:
+            self._matcher = IntentMatcher(self.keyword_patterns, self.learned_patterns)
+        return self._matcher
+
+    def _invalidate_matcher(self):
+        self._matcher = None
+
     def analyze_message(self, message: str) -> Dict:
         """Анализирует сообщение игрока - САМАЯ БЫСТРАЯ РЕАЛИЗАЦИЯ"""
 
         message_lower = message.lower().strip()
 
+        # Один проход по тексту: намерения, выученные паттерны, настроение и сущности
+        hits = self._get_matcher().match(message_lower)
+
         # 1. Определяем намерение по ключевым словам (УЛЬТРА-БЫСТРО)
         intent_scores = {}
 
-        for intent, data in self.keyword_patterns.items():
-            score = 0
-            keywords = data["keywords"]
-            weight = data["weight"]
-
-            for keyword in keywords:
-                if keyword in message_lower:
-                    score += 1
-
-            if score > 0:
-                intent_scores[intent] = score * weight
+        for intent, score in hits["intent_hits"].items():
+            intent_scores[intent] = score * self.keyword_patterns[intent]["weight"]
 
         # 2. Проверяем выученные паттерны
-        for pattern, intent in self.learned_patterns.items():
-            if pattern in message_lower:
-                intent_scores[intent] = intent_scores.get(intent, 0) + 2.0  # Бонус за выученное
+        for pattern in hits["learned"]:
+            data = self.learned_patterns[pattern]
+            intent = data["intent"] if isinstance(data, dict) else data
+            intent_scores[intent] = intent_scores.get(intent, 0) + 2.0  # Бонус за выученное
 
         # 3. Определяем победителя
         if intent_scores:
@@ -351,10 +357,10 @@ class UltraLightDiplomacyAI:
             best_intent = "default"
 
         # 4. Быстрый анализ настроения
-        sentiment = self._quick_sentiment(message_lower)
+        sentiment = self._quick_sentiment(message_lower, hits)
 
         # 5. Извлекаем сущности (быстро)
-        entities = self._extract_entities_fast(message_lower)
+        entities = self._extract_entities_fast(message_lower, hits)
 
         return {
             "intent": best_intent,
@@ -364,13 +370,12 @@ class UltraLightDiplomacyAI:
             "timestamp": datetime.now().isoformat()
         }
 
-    def _quick_sentiment(self, text: str) -> str:
+    def _quick_sentiment(self, text: str, hits: Dict = None) -> str:
         """Сверхбыстрый анализ настроения"""
-        positive = {'спасибо', 'благодарю', 'рад', 'отличн', 'прекрасн', 'замечательн'}
-        negative = {'война', 'угроз', 'уничтож', 'ненавижу', 'враг', 'смерть'}
-
-        pos_count = sum(1 for word in positive if word in text)
-        neg_count = sum(1 for word in negative if word in text)
+        if hits is None:
+            hits = self._get_matcher().match(text)
+        pos_count = hits["positive"]
+        neg_count = hits["negative"]
 
         if pos_count > neg_count:
             return "positive"
@@ -379,32 +384,16 @@ class UltraLightDiplomacyAI:
         else:
             return "neutral"
 
-    def _extract_entities_fast(self, text: str) -> Dict:
+    def _extract_entities_fast(self, text: str, hits: Dict = None) -> Dict:
         """Быстрое извлечение сущностей"""
-        entities = {
-            "resources": [],
-            "numbers": [],
-            "targets": []
+        if hits is None:
+            hits = self._get_matcher().match(text)
+        return {
+            "resources": list(hits["resources"]),
+            "numbers": list(hits["numbers"]),
+            "targets": list(hits["targets"])
         }
 
-        # Ищем числа
-        numbers = re.findall(r'\d+', text)
-        entities["numbers"] = [int(n) for n in numbers]
-
-        # Ищем ресурсы
-        resource_keywords = ["золот", "кристал", "еда", "пищ", "ресурс", "материал"]
-        for word in resource_keywords:
-            if word in text:
-                entities["resources"].append(word)
-
-        # Ищем названия фракций (упрощенно)
-        factions = ["север", "эльф", "вампир", "адепт", "элин", "мятежник"]
-        for faction in factions:
-            if faction in text:
-                entities["targets"].append(faction)
-
-        return entities
-
     def generate_response(self, analysis: Dict, game_context: Dict = None) -> str:
         """Генерирует ответ на основе анализа"""
 
@@ -567,6 +556,7 @@ class UltraLightDiplomacyAI:
             pattern = f"{key_words[0]} {key_words[1]}"
 
             # Запоминаем
+            self._get_matcher().add_learned(pattern)
             self.learned_patterns[pattern] = {
                 "intent": intent,
                 "response_pattern": response[:50],  # Сохраняем часть ответа
@@ -576,32 +566,29 @@ class UltraLightDiplomacyAI:
 
     def _reinforce_pattern(self, message: str, intent: str):
         """Усиливает существующий паттерн"""
-        for pattern in list(self.learned_patterns.keys()):
-            if pattern in message:
-                data = self.learned_patterns[pattern]
-                data["strength"] = min(5.0, data["strength"] + 0.5)  # Максимум сила 5.0
+        for pattern in self._get_matcher().match(message)["learned"]:
+            data = self.learned_patterns[pattern]
+            data["strength"] = min(5.0, data["strength"] + 0.5)  # Максимум сила 5.0
 
     def _weaken_pattern(self, message: str, intent: str):
         """Ослабляет паттерн"""
-        for pattern in list(self.learned_patterns.keys()):
-            if pattern in message:
-                data = self.learned_patterns[pattern]
-                data["strength"] = max(0.1, data["strength"] - 1.0)
+        matcher = self._get_matcher()
+        for pattern in matcher.match(message)["learned"]:
+            data = self.learned_patterns[pattern]
+            data["strength"] = max(0.1, data["strength"] - 1.0)
 
-                # Если сила упала ниже 0.5, удаляем паттерн
-                if data["strength"] < 0.5:
-                    del self.learned_patterns[pattern]
+            # Если сила упала ниже 0.5, удаляем паттерн
+            if data["strength"] < 0.5:
+                del self.learned_patterns[pattern]
+                matcher.remove_learned(pattern)
 
     def _learn_mistake(self, message: str, wrong_intent: str):
         """Запоминает ошибку"""
         # Находим правильные ключевые слова в сообщении
-        for correct_intent, data in self.keyword_patterns.items():
+        for correct_intent in self._get_matcher().match(message)["intent_hits"]:
             if correct_intent != wrong_intent:
-                for keyword in data["keywords"]:
-                    if keyword in message:
-                        # Добавляем этот ключевое слово с бОльшим весом
-                        self.keyword_patterns[correct_intent]["weight"] += 0.1
-                        break
+                # Добавляем этот ключевое слово с бОльшим весом
+                self.keyword_patterns[correct_intent]["weight"] += 0.1
 
     # ========== ИНТЕГРАЦИЯ С ИГРОЙ ==========
 
@@ -695,6 +682,7 @@ class UltraLightDiplomacyAI:
             self.keyword_patterns = model_data["keyword_patterns"]
             self.response_templates = model_data["response_templates"]
             self.learned_patterns = model_data["learned_patterns"]
+            self._invalidate_matcher()
 
             if "state" in model_data:
                 self.mood = model_data["state"].get("mood", 50)
@@ -436,6 +436,7 @@ def start_army_mode(faction, game_area, class_faction, conn):
     right_container = FloatLayout(size_hint=(1, 1))
 
     # Карусель
+    from kivy.uix.carousel import Carousel
     carousel = Carousel(
         direction='right',
         size_hint=(1, 1),
@@ -0,0 +1,386 @@
+"""
+Сила армий по городам и фракциям в памяти.
+
+Раньше рейтинг армии (звёзды над городами) пересчитывался раз в секунду,
+а каждый расчёт силы (рейтинг армий в politic, решения AIController,
+дипломатический чат) делал свой проход garrisons JOIN units, даже если с
+прошлого раза ничего не менялось.
+
+ArmyStrengthTable хранит суммы по гарнизону каждого города для каждой
+фракции юнитов (GarrisonStrength), их итоги по фракциям, наличие героев и
+данные городов, нужные для звёзд. Все формулы силы игры считаются из этих
+сумм без запросов к БД.
+
+Временные (TEMP) триггеры основного соединения отмечают «грязными» города,
+гарнизоны которых изменились (найм, перемещение, бой, голод), а изменения
+юнитов, городов и политических систем помечают таблицу целиком. refresh()
+перечитывает только грязные города, а подписчики add_army_strength_listener
+узнают о том, что таблица устарела, без опроса по таймеру.
+
+Триггеры ставятся только на основное соединение игры (UnitOfWorkConnection):
+на снимках параллельного хода ИИ создание триггеров выглядело бы как
+запись в схему. Для остальных соединений таблица перечитывается целиком,
+если с прошлого чтения изменился conn.total_changes. После подмены
+содержимого БД целиком (сброс партии через backup API) таблицу нужно
+сбросить invalidate_army_strength().
+"""
+
+import ast
+import threading
+
+from db_manager import UnitOfWorkConnection
+
+# Коэффициенты атаки по классу юнита
+CLASS_COEFFICIENTS = {
+    "1": 1.3,
+    "2": 1.7,
+    "3": 2.0,
+    "4": 3.0,
+    "5": 4.0
+}
+
+# Классы героев (отображаются красной звездой)
+HERO_CLASSES = ("2", "3", "4")
+
+# SQL-функция, через которую триггеры сообщают об изменениях
+CHANGE_FUNCTION = 'lerdon_army_changed'
+
+# При большем числе грязных городов таблица перечитывается целиком
+MAX_PARTIAL_REFRESH = 200
+
+_TRIGGERS = {
+    'lerdon_army_garrison_insert': f"AFTER INSERT ON garrisons BEGIN SELECT {CHANGE_FUNCTION}(NEW.city_name); END",
+    'lerdon_army_garrison_update': f"AFTER UPDATE ON garrisons BEGIN SELECT {CHANGE_FUNCTION}(OLD.city_name), {CHANGE_FUNCTION}(NEW.city_name); END",
+    'lerdon_army_garrison_delete': f"AFTER DELETE ON garrisons BEGIN SELECT {CHANGE_FUNCTION}(OLD.city_name); END",
+    'lerdon_army_city_insert': f"AFTER INSERT ON cities BEGIN SELECT {CHANGE_FUNCTION}(NEW.name); END",
+    'lerdon_army_city_update': f"AFTER UPDATE ON cities BEGIN SELECT {CHANGE_FUNCTION}(OLD.name), {CHANGE_FUNCTION}(NEW.name); END",
+    'lerdon_army_city_delete': f"AFTER DELETE ON cities BEGIN SELECT {CHANGE_FUNCTION}(OLD.name); END",
+    # Характеристики юнитов и идеологии влияют на все города сразу
+    'lerdon_army_unit_insert': f"AFTER INSERT ON units BEGIN SELECT {CHANGE_FUNCTION}(NULL); END",
+    'lerdon_army_unit_update': f"AFTER UPDATE ON units BEGIN SELECT {CHANGE_FUNCTION}(NULL); END",
+    'lerdon_army_unit_delete': f"AFTER DELETE ON units BEGIN SELECT {CHANGE_FUNCTION}(NULL); END",
+    'lerdon_army_politics_insert': f"AFTER INSERT ON political_systems BEGIN SELECT {CHANGE_FUNCTION}(NULL); END",
+    'lerdon_army_politics_update': f"AFTER UPDATE ON political_systems BEGIN SELECT {CHANGE_FUNCTION}(NULL); END",
+    'lerdon_army_politics_delete': f"AFTER DELETE ON political_systems BEGIN SELECT {CHANGE_FUNCTION}(NULL); END",
+}
+
+
+def unit_strength(attack, defense, durability, unit_class):
+    """Сила одного юнита."""
+    return attack * CLASS_COEFFICIENTS.get(unit_class, 1.0) + defense + durability
+
+
+class GarrisonStrength:
+    """Суммы по юнитам одной фракции (в гарнизоне города или по всей фракции)."""
+
+    __slots__ = ('rows', 'strength', 'class_1_count', 'class_1_stats',
+                 'hero_stats', 'hero_unit_stats', 'others_stats')
+
+    def __init__(self):
+        self.rows = 0              # Строк гарнизонов
+        self.strength = 0          # Сила с коэффициентами классов (unit_strength * число)
+        self.class_1_count = 0     # Число юнитов 1 класса
+        self.class_1_stats = 0     # Атака + защита + живучесть юнитов 1 класса (на число)
+        self.hero_stats = 0        # То же для героев 2 и 3 класса (на число)
+        self.hero_unit_stats = 0   # То же для героев 2 и 3 класса (по одному на строку)
+        self.others_stats = 0      # То же для юнитов 4 класса и выше (на число)
+
+    def add_unit(self, count, attack, defense, durability, unit_class):
+        stats_sum = attack + defense + durability
+        self.rows += 1
+        self.strength += unit_strength(attack, defense, durability, unit_class) * count
+        if unit_class == "1":
+            self.class_1_count += count
+            self.class_1_stats += stats_sum * count
+        elif unit_class in ("2", "3"):
+            self.hero_stats += stats_sum * count
+            self.hero_unit_stats += stats_sum
+        else:
+            self.others_stats += stats_sum * count
+
+    def add(self, other):
+        for name in GarrisonStrength.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def local_power(self):
+        """Сила с бонусом героев 2 и 3 класса к юнитам 1 класса этих же юнитов."""
+        power = self.others_stats
+        if self.class_1_count > 0:
+            power += self.class_1_stats + self.hero_stats * self.class_1_count
+        return power
+
+
+class FactionStrength(GarrisonStrength):
+    """Итоги фракции по всем гарнизонам."""
+
+    __slots__ = ('owned_strength', 'garrison_power')
+
+    def __init__(self):
+        super().__init__()
+        self.owned_strength = 0    # strength только в городах фракции
+        self.garrison_power = 0    # Сумма local_power по гарнизонам (бонусы внутри города)
+
+
+_EMPTY = FactionStrength()
+
+
+class ArmyStrengthTable:
+    def __init__(self, conn, track=True):
+        """
+        :param conn: Соединение с базой данных.
+        :param track: Следить за изменениями триггерами (иначе — по conn.total_changes).
+        """
+        self.conn = conn
+        self.track = track
+        self.cities = {}            # {город: (фракция, icon_coordinates, kf_crystal)}
+        self.garrisons = {}         # {город: {фракция юнитов: GarrisonStrength}}
+        self.heroes = set()         # Города, где есть юниты 2-4 класса
+        self.factions = {}          # {фракция юнитов: FactionStrength}
+        self.ideologies = {}        # {фракция: политическая система}
+        self.version = 0            # Растёт при каждом пересчёте
+        self._dirty_all = True
+        self._dirty_cities = set()
+        self._loaded_changes = None
+        if track:
+            self._install_triggers()
+
+    # --- Отслеживание изменений ---
+    def _install_triggers(self):
+        self.conn.create_function(CHANGE_FUNCTION, 1, self._on_change)
+        cursor = self.conn.cursor()
+        for name, body in _TRIGGERS.items():
+            cursor.execute(f"CREATE TEMP TRIGGER IF NOT EXISTS {name} {body}")
+
+    def _triggers_installed(self):
+        cursor = self.conn.execute(
+            "SELECT COUNT(*) FROM sqlite_temp_master WHERE type = 'trigger' AND name LIKE 'lerdon_army_%'")
+        return cursor.fetchone()[0] == len(_TRIGGERS)
+
+    def _on_change(self, city_name):
+        was_clean = not self._dirty_all and not self._dirty_cities
+        if city_name is None:
+            self._dirty_all = True
+        elif not self._dirty_all:
+            self._dirty_cities.add(city_name)
+        if was_clean and self.track:
+            _notify_listeners()
+        return None
+
+    @property
+    def dirty(self):
+        return self._dirty_all or bool(self._dirty_cities)
+
+    def mark_dirty(self, city_name=None):
+        """Помечает город (или всю таблицу) для пересчёта."""
+        self._on_change(city_name)
+
+    # --- Пересчёт ---
+    def refresh(self):
+        """
+        Перечитывает грязные города.
+        :return: True, если данные пересчитывались.
+        """
+        if self.track:
+            # Откат транзакции, в которой создавались триггеры, удаляет и их
+            if not self._triggers_installed():
+                self._install_triggers()
+                self._dirty_all = True
+        elif self._loaded_changes != self.conn.total_changes:
+            self._dirty_all = True
+
+        if not self.dirty:
+            return False
+
+        if self._dirty_all or len(self._dirty_cities) > MAX_PARTIAL_REFRESH:
+            self._load(None)
+        else:
+            self._load(sorted(self._dirty_cities))
+        self._dirty_all = False
+        self._dirty_cities.clear()
+        self._loaded_changes = self.conn.total_changes
+        self.version += 1
+        return True
+
+    def _load(self, city_names):
+        cursor = self.conn.cursor()
+        if city_names is None:
+            where, params = "", ()
+            self.cities.clear()
+            self.garrisons.clear()
+            self.heroes.clear()
+            cursor.execute("SELECT faction, system FROM political_systems")
+            self.ideologies = dict(cursor.fetchall())
+        else:
+            where = f"WHERE {{column}} IN ({', '.join('?' for _ in city_names)})"
+            params = tuple(city_names)
+            for name in city_names:
+                self.cities.pop(name, None)
+                self.garrisons.pop(name, None)
+                self.heroes.discard(name)
+
+        cursor.execute(f"SELECT name, faction, icon_coordinates, kf_crystal FROM cities "
+                       f"{where.format(column='name')}", params)
+        for name, faction, icon_coordinates, kf_crystal in cursor.fetchall():
+            self.cities[name] = (faction, icon_coordinates, kf_crystal)
+
+        cursor.execute(f"""
+            SELECT g.city_name, g.unit_count, u.attack, u.defense, u.durability, u.unit_class, u.faction
+            FROM garrisons g
+            JOIN units u ON g.unit_name = u.unit_name
+            {where.format(column='g.city_name')}
+        """, params)
+        for city_name, count, attack, defense, durability, unit_class, faction in cursor.fetchall():
+            by_faction = self.garrisons.setdefault(city_name, {})
+            garrison = by_faction.get(faction)
+            if garrison is None:
+                garrison = by_faction[faction] = GarrisonStrength()
+            garrison.add_unit(count, attack, defense, durability, unit_class)
+            if unit_class in HERO_CLASSES:
+                self.heroes.add(city_name)
+
+        # Итоги по фракциям пересобираются из сумм по городам
+        factions = {}
+        for city_name, by_faction in self.garrisons.items():
+            city = self.cities.get(city_name)
+            for faction, garrison in by_faction.items():
+                total = factions.get(faction)
+                if total is None:
+                    total = factions[faction] = FactionStrength()
+                total.add(garrison)
+                total.garrison_power += garrison.local_power()
+                if city is not None and city[0] == faction:
+                    total.owned_strength += garrison.strength
+        self.factions = factions
+
+    # --- Данные ---
+    def faction(self, faction):
+        """Итоги фракции (FactionStrength, пустые, если юнитов нет)."""
+        return self.factions.get(faction, _EMPTY)
+
+    def strength_in_city(self, city_name, faction):
+        """Сила юнитов фракции в городе (с коэффициентами классов)."""
+        garrison = self.garrisons.get(city_name, {}).get(faction)
+        return garrison.strength if garrison is not None else 0
+
+    def owned_strength(self, faction):
+        """Сила юнитов фракции во всех её городах (с коэффициентами классов)."""
+        return self.faction(faction).owned_strength
+
+    def army_strength(self):
+        """
+        Сила армий всех фракций с коэффициентами классов, во всех гарнизонах.
+        :return: {фракция: сила} для фракций, у которых есть юниты.
+        """
+        return {faction: total.strength for faction, total in self.factions.items() if faction}
+
+    def garrison_power(self, faction):
+        """
+        Сила фракции с бонусами внутри гарнизонов: герои 2 и 3 класса
+        усиливают только юнитов 1 класса своего города.
+        """
+        return self.faction(faction).garrison_power
+
+    def garrison_powers(self):
+        """{фракция: garrison_power} для фракций, у которых есть юниты."""
+        return {faction: total.garrison_power for faction, total in self.factions.items() if faction}
+
+    def pooled_power(self, faction):
+        """
+        Сила фракции, где герои 2 и 3 класса всех гарнизонов (с учётом
+        числа) усиливают всех юнитов 1 класса фракции.
+        """
+        return self.faction(faction).local_power()
+
+    def total_power(self, faction):
+        """
+        Общая мощь фракции: каждый отряд героев 2 и 3 класса (без учёта
+        числа) усиливает всех юнитов 1 класса фракции.
+        """
+        total = self.faction(faction)
+        return total.class_1_stats + total.hero_unit_stats * total.class_1_count + total.others_stats
+
+    def has_hero(self, city_name):
+        return city_name in self.heroes
+
+    def star_level(self, city_name):
+        """
+        Звёзды силы гарнизона (0–3): доля силы города в общей силе фракции-владельца.
+        """
+        city = self.cities.get(city_name)
+        if city is None:
+            return 0
+        total = self.owned_strength(city[0])
+        strength = self.strength_in_city(city_name, city[0])
+        if total <= 0 or strength <= 0:
+            return 0
+        percent = strength / total * 100
+        if percent < 35:
+            return 1
+        if percent < 65:
+            return 2
+        return 3
+
+    def icon_position(self, city_name):
+        """Координаты иконки города или None."""
+        city = self.cities.get(city_name)
+        if city is None or city[1] is None:
+            return None
+        try:
+            icon_x, icon_y = ast.literal_eval(city[1])
+        except (ValueError, SyntaxError, TypeError) as e:
+            print(f"[ARMY] Ошибка парсинга icon_coordinates для {city_name}: {e}")
+            return None
+        return icon_x, icon_y
+
+
+_army_strength = None
+_untracked = threading.local()  # Таблица для соединения без триггеров, своя у каждого потока
+_listeners = []
+
+
+def get_army_strength(conn):
+    """
+    Возвращает таблицу силы армий для соединения (с актуальными данными).
+    Основное соединение игры отслеживается триггерами; для остальных
+    (снимки хода ИИ, утилиты) таблица пересчитывается после любых записей.
+    """
+    global _army_strength
+    if isinstance(conn, UnitOfWorkConnection):
+        table = _army_strength
+        if table is None or table.conn is not conn:
+            table = _army_strength = ArmyStrengthTable(conn)
+    else:
+        table = getattr(_untracked, 'table', None)
+        if table is None or table.conn is not conn:
+            table = _untracked.table = ArmyStrengthTable(conn, track=False)
+    table.refresh()
+    return table
+
+
+def invalidate_army_strength():
+    """Помечает таблицу для полного пересчёта (БД подменена целиком)."""
+    if _army_strength is not None:
+        _army_strength.mark_dirty()
+
+
+def _notify_listeners():
+    for callback in list(_listeners):
+        try:
+            callback()
+        except Exception as e:
+            print(f"[ARMY] Ошибка в обработчике изменения армий: {e}")
+
+
+def add_army_strength_listener(callback):
+    """
+    Подписывает callback() на изменения армий. Вызывается один раз, когда
+    чистая таблица становится грязной, — прямо из SQL-триггера, поэтому
+    обработчик не должен обращаться к БД (например, Clock.create_trigger).
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def remove_army_strength_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
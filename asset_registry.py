@@ -0,0 +1,157 @@
+"""
+Реестр графических ресурсов и атласы текстур.
+
+Карта и экраны армии рисуют много мелких PNG (звёзды, иконки идеологии,
+бонуса кристаллов, крепости фракций, иконки ResourceBox) и перед каждой
+отрисовкой проверяли их через os.path.exists, а каждая иконка была
+отдельной текстурой.
+
+build_atlas.py упаковывает эти иконки в атласы Kivy (files/atlas/*.atlas)
+и записывает manifest.json: какой файл в каком атласе лежит. Во время игры
+AssetRegistry:
+- один раз обходит каталог files/ и дальше отвечает на exists() из памяти;
+- в source() подменяет путь к упакованной иконке на адрес в атласе
+  (atlas://...), так что иконки одного атласа используют одну текстуру.
+
+Если атласы не собраны (запуск из исходников), source() возвращает
+исходный путь к файлу.
+"""
+
+import json
+import os
+
+ASSET_ROOT = 'files'
+ATLAS_DIR = 'files/atlas'
+MANIFEST_PATH = os.path.join(ATLAS_DIR, 'manifest.json')
+
+# Атласы: {имя атласа: [шаблоны файлов]}
+ATLAS_GROUPS = {
+    # Иконки, которые рисуются на карте для каждого города
+    'map': [
+        'files/status/army_in_city/*.png',
+        'files/status/city_bonus/*.png',
+        'files/status/ideology/*.png',
+        'files/status/choise.png',
+        'files/buildings/*.png',
+    ],
+    # Иконки интерфейса (ResourceBox, специализации героев в гарнизоне)
+    'ui': [
+        'files/status/resource_box/*.png',
+        'files/pict/hero_type/*.png',
+    ],
+}
+
+
+def _normalize(path):
+    return os.path.normpath(path).replace('\\', '/')
+
+
+def atlas_id(path):
+    """
+    Идентификатор файла внутри атласа — как его строит kivy.atlas с
+    use_path=True: путь без расширения, '/' заменены на '_'.
+    """
+    uid = os.path.splitext(path)[0].lstrip('./\\')
+    return uid.replace('/', '_').replace('\\', '_')
+
+
+class AssetRegistry:
+    def __init__(self, root=ASSET_ROOT, manifest_path=MANIFEST_PATH):
+        """
+        :param root: Каталог с ресурсами (относительно рабочего каталога игры).
+        :param manifest_path: manifest.json, записанный build_atlas.py.
+        """
+        self.root = root
+        self.manifest_path = manifest_path
+        self.known = set()      # Пути всех файлов в root
+        self.atlas = {}         # {путь: atlas://...}
+        self._other = {}        # {путь вне root: существует ли}
+        self._load()
+
+    def _load(self):
+        for dir_path, _dirs, files in os.walk(self.root):
+            for name in files:
+                self.known.add(_normalize(os.path.join(dir_path, name)))
+        self._load_manifest()
+        print(f"[ASSETS] Известных файлов: {len(self.known)}, в атласах: {len(self.atlas)}")
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[ASSETS] Не удалось прочитать {self.manifest_path}: {e}")
+            return
+
+        for atlas_name, paths in manifest.get('atlases', {}).items():
+            atlas_base = f"{ATLAS_DIR}/{atlas_name}"
+            try:
+                with open(atlas_base + '.atlas', 'r', encoding='utf-8') as f:
+                    pages = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[ASSETS] Атлас {atlas_name} недоступен ({e}), используются файлы")
+                continue
+            if not all(_normalize(os.path.join(ATLAS_DIR, page)) in self.known for page in pages):
+                print(f"[ASSETS] Не хватает страниц атласа {atlas_name}, используются файлы")
+                continue
+            ids = {uid for page in pages.values() for uid in page}
+            for path in paths:
+                uid = atlas_id(path)
+                if uid in ids:
+                    self.atlas[path] = f"atlas://{atlas_base}/{uid}"
+
+    def exists(self, path):
+        """Существует ли файл ресурса (без обращения к файловой системе для files/)."""
+        if not path:
+            return False
+        path = _normalize(path)
+        if path in self.known:
+            return True
+        if path.startswith(self.root + '/'):
+            return False
+        exists = self._other.get(path)
+        if exists is None:
+            exists = self._other[path] = os.path.exists(path)
+        return exists
+
+    def source(self, path, default=None):
+        """
+        Источник текстуры для Image/Rectangle: адрес в атласе, путь к файлу
+        или default, если файла нет.
+        """
+        if not path:
+            return default
+        normalized = _normalize(path)
+        atlas_source = self.atlas.get(normalized)
+        if atlas_source is not None:
+            return atlas_source
+        if self.exists(normalized):
+            return path
+        return default
+
+
+_registry = None
+
+
+def get_asset_registry():
+    """Возвращает реестр ресурсов, строит его при первом обращении."""
+    global _registry
+    if _registry is None:
+        _registry = AssetRegistry()
+    return _registry
+
+
+def invalidate_asset_registry():
+    """Сбрасывает реестр (например, после пересборки атласов)."""
+    global _registry
+    _registry = None
+
+
+def asset_exists(path):
+    return get_asset_registry().exists(path)
+
+
+def asset_source(path, default=None):
+    return get_asset_registry().source(path, default)
@@ -0,0 +1,228 @@
+"""
+Безголовый симулятор боёв и бенчмарк для fight.fight().
+
+Работает без Kivy и без всплывающих окон: бои проводятся на копии
+game_data.db в памяти, армии генерируются синтетически (в формате
+units_stats, как в old/unit_tests.py).
+
+Отчёт: боёв в секунду, задержка p50/p99 и число SQL-запросов на бой.
+
+Запуск:
+    python battle_simulator.py --battles 2000 --stacks 6 --seed 42 --output bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sqlite3
+import time
+
+from fight import fight
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'game_data.db')
+
+# Города-заглушки, на которых проводятся симулированные бои
+SIM_ATTACKING_CITY = "Симуляция-Атака"
+SIM_DEFENDING_CITY = "Симуляция-Оборона"
+
+# Инфраструктура обороняющегося города (чтобы damage_to_infrastructure работал как в игре)
+SIM_BUILDINGS = {'Больница': 40, 'Фабрика': 40}
+
+
+def create_memory_db(source_path=DEFAULT_DB_PATH):
+    """
+    Копирует базу игры в память через SQLite backup API.
+    :param source_path: Путь к исходной базе.
+    :return: Соединение с копией в памяти (row_factory = sqlite3.Row, как в игре).
+    """
+    source = sqlite3.connect(source_path)
+    conn = sqlite3.connect(':memory:')
+    try:
+        source.backup(conn)
+    finally:
+        source.close()
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def make_unit(name, count, damage=100, health=100, armor=100, unit_class='1'):
+    """
+    Создаёт синтетический юнит в формате, который принимает fight().
+    """
+    return {
+        'unit_name': name,
+        'unit_count': count,
+        'unit_image': f'files/army/{name}.jpg',
+        'units_stats': {
+            'Урон': damage,
+            'Живучесть': health,
+            'Защита': armor,
+            'Класс юнита': unit_class
+        }
+    }
+
+
+def load_unit_pool(conn):
+    """
+    Загружает юниты из таблицы units, сгруппированные по фракциям.
+    :return: Словарь {faction: [(unit_name, attack, defense, durability, unit_class), ...]}.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT faction, unit_name, attack, defense, durability, unit_class
+        FROM units
+    """)
+    pool = {}
+    for faction, unit_name, attack, defense, durability, unit_class in cursor.fetchall():
+        pool.setdefault(faction, []).append((unit_name, attack, defense, durability, str(unit_class)))
+    return pool
+
+
+def random_army(rng, units, stacks, max_count=5000):
+    """
+    Собирает случайную армию из stacks отрядов.
+    Герои (класс 2+) всегда в количестве 1, обычные отряды — от 1 до max_count.
+    """
+    army = []
+    for _ in range(stacks):
+        unit_name, attack, defense, durability, unit_class = rng.choice(units)
+        count = 1 if int(unit_class) >= 2 else rng.randint(1, max_count)
+        army.append(make_unit(unit_name, count, damage=attack, health=durability,
+                              armor=defense, unit_class=unit_class))
+    return army
+
+
+def reset_battlefield(conn, attacking_army):
+    """
+    Возвращает симуляционные города в исходное состояние перед боем.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM garrisons WHERE city_name IN (?, ?)",
+                   (SIM_ATTACKING_CITY, SIM_DEFENDING_CITY))
+    cursor.execute("DELETE FROM buildings WHERE city_name = ?", (SIM_DEFENDING_CITY,))
+    cursor.executemany("""
+        INSERT INTO buildings (city_name, faction, building_type, count)
+        VALUES (?, '', ?, ?)
+    """, [(SIM_DEFENDING_CITY, building, count) for building, count in SIM_BUILDINGS.items()])
+    cursor.executemany("""
+        INSERT INTO garrisons (city_name, unit_name, unit_count, unit_image)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(city_name, unit_name) DO UPDATE SET unit_count = unit_count + excluded.unit_count
+    """, [(SIM_ATTACKING_CITY, u['unit_name'], u['unit_count'], u['unit_image']) for u in attacking_army])
+    conn.commit()
+
+
+def percentile(sorted_values, pct):
+    """
+    Перцентиль методом ближайшего ранга по отсортированному списку.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_benchmark(battles=1000, stacks=6, seed=None, db_source=DEFAULT_DB_PATH, verbose=False):
+    """
+    Проводит серию боёв и собирает статистику.
+    :param battles: Количество боёв.
+    :param stacks: Число отрядов в каждой армии.
+    :param seed: Зерно генератора армий (для воспроизводимости).
+    :param db_source: Путь к базе, копия которой используется для боёв.
+    :param verbose: Не подавлять отладочный вывод fight().
+    :return: Словарь с результатами.
+    """
+    rng = random.Random(seed)
+    conn = create_memory_db(db_source)
+    pool = load_unit_pool(conn)
+    factions = [f for f in pool if pool[f]]
+    if len(factions) < 2:
+        raise RuntimeError("В таблице units недостаточно фракций для симуляции.")
+
+    # Счётчик SQL-запросов на текущий бой
+    statements = {'count': 0}
+    conn.set_trace_callback(lambda _sql: statements.__setitem__('count', statements['count'] + 1))
+
+    latencies = []
+    sql_per_battle = []
+    wins = {'attacking': 0, 'defending': 0}
+
+    with open(os.devnull, 'w') as devnull:
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)
+        with output:
+            for _ in range(battles):
+                attacking_fraction, defending_fraction = rng.sample(factions, 2)
+                attacking_army = random_army(rng, pool[attacking_fraction], stacks)
+                defending_army = random_army(rng, pool[defending_fraction], stacks)
+                reset_battlefield(conn, attacking_army)
+
+                statements['count'] = 0
+                started = time.perf_counter()
+                result = fight(
+                    attacking_city=SIM_ATTACKING_CITY,
+                    defending_city=SIM_DEFENDING_CITY,
+                    defending_army=defending_army,
+                    attacking_army=attacking_army,
+                    attacking_fraction=attacking_fraction,
+                    defending_fraction=defending_fraction,
+                    conn=conn,
+                    show_report=False
+                )
+                latencies.append(time.perf_counter() - started)
+                sql_per_battle.append(statements['count'])
+                wins[result['winner']] += 1
+
+    conn.set_trace_callback(None)
+    conn.close()
+
+    total_time = sum(latencies)
+    latencies_ms = sorted(t * 1000.0 for t in latencies)
+    return {
+        'battles': battles,
+        'stacks': stacks,
+        'seed': seed,
+        'battles_per_sec': round(battles / total_time, 2) if total_time else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies_ms, 50), 3),
+            'p99': round(percentile(latencies_ms, 99), 3),
+            'max': round(latencies_ms[-1], 3) if latencies_ms else 0.0,
+        },
+        'sql_per_battle': {
+            'mean': round(sum(sql_per_battle) / len(sql_per_battle), 2) if sql_per_battle else 0.0,
+            'max': max(sql_per_battle) if sql_per_battle else 0,
+        },
+        'wins': wins,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Безголовый бенчмарк боевой системы")
+    parser.add_argument('--battles', type=int, default=1000, help="Количество боёв")
+    parser.add_argument('--stacks', type=int, default=6, help="Отрядов в каждой армии")
+    parser.add_argument('--seed', type=int, default=None, help="Зерно генератора армий")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Путь к game_data.db")
+    parser.add_argument('--output', default=None, help="Сохранить результаты в JSON")
+    parser.add_argument('--verbose', action='store_true', help="Показывать вывод fight()")
+    args = parser.parse_args()
+
+    report = run_benchmark(battles=args.battles, stacks=args.stacks, seed=args.seed,
+                           db_source=args.db, verbose=args.verbose)
+
+    print(f"Боёв: {report['battles']} (отрядов в армии: {report['stacks']})")
+    print(f"Боёв/сек: {report['battles_per_sec']}")
+    print(f"Задержка, мс: p50={report['latency_ms']['p50']} p99={report['latency_ms']['p99']} "
+          f"max={report['latency_ms']['max']}")
+    print(f"SQL-запросов на бой: среднее={report['sql_per_battle']['mean']} "
+          f"max={report['sql_per_battle']['max']}")
+    print(f"Победы: атака={report['wins']['attacking']} оборона={report['wins']['defending']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
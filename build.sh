@@ -1,7 +1,7 @@
 APP_VERSION="1.8.1"
 
 
-rm -rf bin && buildozer android clean && git pull && clear && buildozer android release
+rm -rf bin && buildozer android clean && git pull && python3 build_atlas.py && clear && buildozer android release
 cd ~/LL/bin
 ANDROID_BUILD_TOOLS="$HOME/.buildozer/android/platform/android-sdk/build-tools/36.0.0"
 
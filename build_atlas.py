@@ -0,0 +1,141 @@
+"""
+Сборка атласов текстур для иконок карты и интерфейса.
+
+Упаковывает файлы из asset_registry.ATLAS_GROUPS в атласы Kivy
+(files/atlas/<имя>.atlas и страницы <имя>-N.png) и записывает
+files/atlas/manifest.json со списком упакованных файлов и отпечатками
+исходников (размер и время изменения). AssetRegistry во время игры
+берёт иконки из атласов, если они собраны.
+
+Нужны Kivy и Pillow. Запускается перед сборкой APK (build.sh):
+    python build_atlas.py
+    python build_atlas.py --size 1024
+    python build_atlas.py --check   # код 1, если атласы устарели
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+from asset_registry import ATLAS_DIR, ATLAS_GROUPS, MANIFEST_PATH, atlas_id
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Размер страницы атласа: 2048 поддерживают все мобильные GPU
+DEFAULT_ATLAS_SIZE = 2048
+DEFAULT_PADDING = 2
+
+
+def collect_sources():
+    """
+    Файлы каждого атласа.
+    :return: {имя атласа: [пути]} (пути относительно корня проекта).
+    """
+    sources = {}
+    for atlas_name, patterns in ATLAS_GROUPS.items():
+        paths = []
+        for pattern in patterns:
+            for path in sorted(glob.glob(pattern)):
+                path = path.replace('\\', '/')
+                if path not in paths:
+                    paths.append(path)
+        sources[atlas_name] = paths
+    return sources
+
+
+def _fingerprint(paths):
+    fingerprint = {}
+    for path in paths:
+        stat = os.stat(path)
+        fingerprint[path] = [stat.st_size, int(stat.st_mtime)]
+    return fingerprint
+
+
+def _check_ids(atlas_name, paths):
+    """Идентификаторы должны быть уникальны, иначе иконки перепутаются."""
+    ids = {}
+    for path in paths:
+        uid = atlas_id(path)
+        if uid in ids:
+            raise ValueError(f"Атлас {atlas_name}: {path} и {ids[uid]} дают одинаковый id {uid}")
+        ids[uid] = path
+
+
+def is_up_to_date(sources):
+    """Собраны ли атласы из текущих версий файлов."""
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get('atlases') != sources:
+        return False
+    all_paths = [path for paths in sources.values() for path in paths]
+    if manifest.get('sources') != _fingerprint(all_paths):
+        return False
+    return all(os.path.exists(os.path.join(ATLAS_DIR, f"{name}.atlas")) for name in sources)
+
+
+def build(size=DEFAULT_ATLAS_SIZE, padding=DEFAULT_PADDING):
+    """
+    Собирает все атласы и manifest.json.
+    :return: Манифест (словарь).
+    """
+    from kivy.atlas import Atlas
+
+    sources = collect_sources()
+    os.makedirs(ATLAS_DIR, exist_ok=True)
+
+    # Старые страницы могли остаться от сборки с другим размером
+    for name in os.listdir(ATLAS_DIR):
+        if name.endswith('.atlas') or name.endswith('.png'):
+            os.remove(os.path.join(ATLAS_DIR, name))
+
+    built = {}
+    for atlas_name, paths in sources.items():
+        if not paths:
+            print(f"[ATLAS] {atlas_name}: нет файлов, пропущен")
+            continue
+        _check_ids(atlas_name, paths)
+        result = Atlas.create(os.path.join(ATLAS_DIR, atlas_name), paths, size,
+                              padding=padding, use_path=True)
+        if not result:
+            raise RuntimeError(f"Не удалось собрать атлас {atlas_name} (страница {size}px)")
+        _filename, meta = result
+        built[atlas_name] = paths
+        print(f"[ATLAS] {atlas_name}: {len(paths)} файлов, страниц: {len(meta)}")
+
+    all_paths = [path for paths in built.values() for path in paths]
+    manifest = {
+        'size': size,
+        'atlases': built,
+        'sources': _fingerprint(all_paths),
+    }
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"[ATLAS] Манифест сохранён в {MANIFEST_PATH}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка атласов текстур")
+    parser.add_argument('--size', type=int, default=DEFAULT_ATLAS_SIZE, help="Размер страницы атласа, px")
+    parser.add_argument('--padding', type=int, default=DEFAULT_PADDING, help="Отступ между иконками, px")
+    parser.add_argument('--check', action='store_true', help="Только проверить, что атласы актуальны")
+    args = parser.parse_args()
+
+    # Пути в атласах и манифесте — относительно корня проекта
+    os.chdir(BASE_DIR)
+
+    if args.check:
+        up_to_date = is_up_to_date(collect_sources())
+        print("[ATLAS] Атласы актуальны" if up_to_date else "[ATLAS] Атласы нужно пересобрать")
+        sys.exit(0 if up_to_date else 1)
+
+    build(args.size, args.padding)
+
+
+if __name__ == '__main__':
+    main()
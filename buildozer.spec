@@ -10,7 +10,7 @@ package.name = lerdonlegends
 package.domain = com.lerdonlegends
 source.main = main.py
 source.dir = .
-source.include_exts = py,png,jpg,ttf,mp3,mp4,db,sqlite3,json,txt
+source.include_exts = py,png,jpg,atlas,ttf,mp3,mp4,db,sqlite3,json,txt
 source.include_patterns = assets/*, files/*, game_data.db, *.py
 icon.filename = %(source.dir)s/assets/icon.png
 presplash.filename = %(source.dir)s/assets/splash.png
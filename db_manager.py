@@ -1,4 +1,151 @@
+"""
+Соединение с базой данных и единицы работы (unit of work).
+
+UnitOfWorkConnection — соединение SQLite, на котором можно открыть единицу
+работы: одну явную транзакцию на весь ход (или фазу), вложенные единицы
+работы становятся точками сохранения (SAVEPOINT).
+
+Внутри единицы работы старый код продолжает вызывать conn.commit(),
+conn.rollback() и `with conn:` как раньше, но они больше не завершают
+транзакцию:
+- commit() только переносит точку отката на текущее место (без fsync);
+- rollback() откатывает изменения до последнего такого commit(), как и
+  раньше, но не трогает то, что было сделано до него;
+- настоящий COMMIT выполняется один раз при выходе из внешней единицы
+  работы, а при исключении вся единица откатывается целиком, поэтому
+  сбой посреди хода не оставляет сохранение наполовину обновлённым.
+
+Счётчики настоящих и подавленных commit/rollback доступны в uow_stats.
+"""
+
 import sqlite3
+from contextlib import contextmanager, nullcontext
+
+
+class UnitOfWorkConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._savepoints = []
+        self._savepoint_seq = 0
+        self.uow_stats = {
+            'units': 0,                 # Внешних единиц работы
+            'commits': 0,               # Настоящих COMMIT
+            'rollbacks': 0,             # Настоящих ROLLBACK
+            'suppressed_commits': 0,    # commit() внутри единицы работы
+            'savepoint_rollbacks': 0,   # Откатов до точки сохранения
+        }
+
+    @property
+    def in_unit_of_work(self):
+        return bool(self._savepoints)
+
+    # --- Единицы работы ---
+    @contextmanager
+    def unit_of_work(self, name=None):
+        """
+        Единица работы: внешняя — транзакция, вложенная — точка сохранения.
+        :param name: Название (для журнала).
+        """
+        outermost = not self._savepoints
+        if outermost:
+            if self.in_transaction:
+                self.commit()  # Незафиксированное до начала единицы работы
+            self.execute("BEGIN")
+            self.uow_stats['units'] += 1
+        self._savepoint_seq += 1
+        savepoint = f"uow_{self._savepoint_seq}"
+        self.execute(f"SAVEPOINT {savepoint}")
+        self._savepoints.append(savepoint)
+
+        try:
+            yield self
+        except BaseException as e:
+            self._savepoints.pop()
+            if outermost:
+                super().rollback()
+                self.uow_stats['rollbacks'] += 1
+            else:
+                self.execute(f"ROLLBACK TO {savepoint}")
+                self.execute(f"RELEASE {savepoint}")
+                self.uow_stats['savepoint_rollbacks'] += 1
+            print(f"[DB] Единица работы '{name or savepoint}' отменена: {e}")
+            raise
+        else:
+            self._savepoints.pop()
+            self.execute(f"RELEASE {savepoint}")
+            if outermost:
+                super().commit()
+                self.uow_stats['commits'] += 1
+            else:
+                # Завершение вложенной единицы — то же, что commit() в родительской
+                self._checkpoint()
+
+    def _checkpoint(self):
+        savepoint = self._savepoints[-1]
+        self.execute(f"RELEASE {savepoint}")
+        self.execute(f"SAVEPOINT {savepoint}")
+
+    def commit_now(self):
+        """
+        Фиксирует всё сделанное на диске, не выходя из единицы работы
+        (например, перед снимком БД через backup API, который не работает
+        при открытой транзакции).
+        """
+        if not self._savepoints:
+            self.commit()
+            return
+        super().commit()
+        self.uow_stats['commits'] += 1
+        self.execute("BEGIN")
+        for savepoint in self._savepoints:
+            self.execute(f"SAVEPOINT {savepoint}")
+
+    # --- Совместимость со старым кодом ---
+    def commit(self):
+        if self._savepoints:
+            self._checkpoint()
+            self.uow_stats['suppressed_commits'] += 1
+            return
+        if self.in_transaction:
+            self.uow_stats['commits'] += 1
+        super().commit()
+
+    def rollback(self):
+        if self._savepoints:
+            self.execute(f"ROLLBACK TO {self._savepoints[-1]}")
+            self.uow_stats['savepoint_rollbacks'] += 1
+            return
+        if self.in_transaction:
+            self.uow_stats['rollbacks'] += 1
+        super().rollback()
+
+    def __exit__(self, exc_type, exc, tb):
+        # Встроенный `with conn:` вызывает COMMIT в обход commit()
+        if self._savepoints:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+            return False
+        return super().__exit__(exc_type, exc, tb)
+
+
+def unit_of_work(conn, name=None):
+    """
+    Единица работы на соединении; для обычного sqlite3.Connection ничего не делает.
+    """
+    if isinstance(conn, UnitOfWorkConnection):
+        return conn.unit_of_work(name)
+    return nullcontext(conn)
+
+
+def commit_now(conn):
+    """Немедленная фиксация на диске, в том числе внутри единицы работы."""
+    if isinstance(conn, UnitOfWorkConnection):
+        conn.commit_now()
+    else:
+        conn.commit()
+
 
 class DBManager:
     _instance = None
@@ -7,7 +154,7 @@ class DBManager:
         if cls._instance is None:
             cls._instance = super(DBManager, cls).__new__(cls)
             cls._instance.db_path = db_path
-            cls._instance.conn = sqlite3.connect(db_path, check_same_thread=False)
+            cls._instance.conn = sqlite3.connect(db_path, check_same_thread=False, factory=UnitOfWorkConnection)
             cls._instance.conn.execute("PRAGMA journal_mode=WAL;")
             cls._instance.conn.execute("PRAGMA synchronous=NORMAL;")
             cls._instance.conn.execute("PRAGMA busy_timeout=5000;")
@@ -16,8 +163,14 @@ class DBManager:
     def get_connection(self):
         return self._instance.conn
 
+    def unit_of_work(self, name=None):
+        return self._instance.conn.unit_of_work(name)
+
+    def stats(self):
+        return dict(self._instance.conn.uow_stats)
+
     def close_all(self):
         if self._instance.conn:
             self._instance.conn.execute("PRAGMA wal_checkpoint(FULL);")
             self._instance.conn.execute("PRAGMA journal_mode=DELETE;")
-            self._instance.conn.close()
\ No newline at end of file
+            self._instance.conn.close()
@@ -0,0 +1,166 @@
+"""
+Микробенчмарк классификации сообщений дипломатического чата.
+
+Сравнивает два способа определить намерение сообщения игрока:
+- последовательный — все предикаты _is_* по порядку приоритета, пока один
+  не сработает (как generate_diplomatic_response работал раньше);
+- однопроходный — DialogClassifier находит кандидатов за один проход,
+  точные предикаты вызываются только для них.
+
+Корпус — сообщения игрока из negotiation_history (is_player = 1), а если
+их нет — встроенный набор типичных реплик. Оба способа обязаны давать одно
+и то же намерение; расхождения печатаются.
+
+Запуск:
+    python dialog_benchmark.py --repeat 20 --output dialog.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import statistics
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'game_data.db')
+
+SAMPLE_MESSAGES = [
+    "Привет! Как дела?",
+    "Как ты? Что нового?",
+    "Что думаешь о наших отношениях?",
+    "Мы друзья?",
+    "Какие отношения у нас сейчас?",
+    "Хочу улучшить отношения",
+    "Сколько у тебя крон?",
+    "Есть ли у тебя кристаллы?",
+    "Ты идиот",
+    "Я тебя уничтожу",
+    "Как армия? Какое положение?",
+    "Предлагаю союз против эльфов",
+    "Давай заключим мир",
+    "Объявляю войну!",
+    "Нападай на Север, они слабы",
+    "Хватит, больше не хочу с тобой говорить",
+    "Мне нужны ресурсы",
+    "Дай 1000 крон",
+    "Нужны рабочие, 500 человек",
+    "Могли бы дать немного кристаллов?",
+    "Забудь все что было",
+    "Спасибо за помощь",
+    "Ок",
+    "Хорошо, договорились",
+    "Слушай, а что у тебя с казной?",
+    "Давай торговать: моё золото на твои кристаллы",
+    "Ты мне друг или нет?",
+    "Пошёл ты",
+    "Привет, мне нужно 200 золота, могу дать взамен рабочих",
+    "Как обстоят дела между нами?",
+]
+
+# Фракция, от лица которой отвечает ИИ
+BENCHMARK_FACTION = 'Эльфы'
+
+
+def load_corpus(db_path, limit=2000):
+    """Сообщения игрока из истории переговоров (или встроенный набор)."""
+    messages = []
+    if db_path and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.execute("""
+                SELECT message FROM negotiation_history
+                WHERE is_player = 1 AND message IS NOT NULL
+                ORDER BY id DESC LIMIT ?
+            """, (limit,))
+            messages = [row[0] for row in cursor.fetchall() if row[0].strip()]
+        except sqlite3.Error as e:
+            print(f"Не удалось прочитать negotiation_history: {e}")
+        finally:
+            conn.close()
+    return messages or list(SAMPLE_MESSAGES)
+
+
+def _make_chat():
+    from ai_models.diplomacy_chat import EnhancedDiplomacyChat
+    # Предикатам нужна только фракция; окно чата и советник не создаются
+    chat = EnhancedDiplomacyChat.__new__(EnhancedDiplomacyChat)
+    chat.faction = BENCHMARK_FACTION
+    return chat
+
+
+def classify_sequential(chat, message):
+    from ai_models.dialog_intents import DIALOG_DISPATCH
+    for intent in ['context_reset'] + [intent for intent, _handler, _args in DIALOG_DISPATCH]:
+        if getattr(chat, f"_is_{intent}")(message):
+            return intent
+    return None
+
+
+def classify_single_pass(chat, message):
+    from ai_models.dialog_intents import DIALOG_DISPATCH, get_dialog_classifier
+    candidates = get_dialog_classifier().candidates(message)
+    for intent in ['context_reset'] + [intent for intent, _handler, _args in DIALOG_DISPATCH]:
+        if intent in candidates and getattr(chat, f"_is_{intent}")(message):
+            return intent
+    return None
+
+
+def _time_per_message(classify, chat, corpus, repeat):
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for message in corpus:
+            classify(chat, message)
+        runs.append((time.perf_counter() - started) / len(corpus) * 1e6)
+    return {
+        'median_us': round(statistics.median(runs), 2),
+        'min_us': round(min(runs), 2),
+    }
+
+
+def run_benchmark(db_path=DEFAULT_DB_PATH, repeat=10):
+    chat = _make_chat()
+    corpus = load_corpus(db_path)
+
+    # Предикаты печатают отладочный вывод — в замер он не попадает
+    with contextlib.redirect_stdout(io.StringIO()):
+        mismatches = [message for message in corpus
+                      if classify_sequential(chat, message) != classify_single_pass(chat, message)]
+        sequential = _time_per_message(classify_sequential, chat, corpus, repeat)
+        single_pass = _time_per_message(classify_single_pass, chat, corpus, repeat)
+
+    return {
+        'messages': len(corpus),
+        'repeat': repeat,
+        'sequential': sequential,
+        'single_pass': single_pass,
+        'speedup': round(sequential['median_us'] / single_pass['median_us'], 2) if single_pass['median_us'] else None,
+        'mismatches': mismatches[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк классификации сообщений дипломатического чата")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="БД с историей переговоров")
+    parser.add_argument('--repeat', type=int, default=10, help="Прогонов корпуса")
+    parser.add_argument('--output', default=None, help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.db, args.repeat)
+    print(f"Сообщений: {report['messages']}, прогонов: {report['repeat']}")
+    print(f"  последовательно: {report['sequential']['median_us']} мкс/сообщение")
+    print(f"  за один проход:  {report['single_pass']['median_us']} мкс/сообщение (x{report['speedup']})")
+    if report['mismatches']:
+        print(f"  РАСХОЖДЕНИЯ ({len(report['mismatches'])}): {report['mismatches']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ from kivy.graphics import Color, RoundedRectangle
 from kivy.utils import get_color_from_hex
 import random
 import sqlite3
+from map_index import invalidate_city_owners
 
 # --- Цветовая палитра ---
 BACKGROUND_COLOR = get_color_from_hex("#121212")
@@ -662,6 +663,7 @@ def execute_diversion_operation(conn, player_faction, op_name, op_info, target_f
         ]
 
         cursor.execute("UPDATE cities SET faction = 'Мятежники' WHERE name = ?", (target_city,))
+        invalidate_city_owners()
         cursor.execute("DELETE FROM garrisons WHERE city_name = ?", (target_city,))
         for unit in rebel_units_to_add:
             unit_name = unit["name"]
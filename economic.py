@@ -888,59 +888,52 @@ class Faction:
         уменьшая количество юнитов на 15% от их числа.
         """
         try:
-            self.current_consumption = 0
-            # Шаг 1: Выгрузка всех гарнизонов
-            self.cursor.execute("SELECT city_name, unit_name, unit_count FROM garrisons")
-            garrisons = self.cursor.fetchall()
-
-            # Шаг 2: Для каждого гарнизона получаем данные юнита
-            faction_units = {}
-            for garrison in garrisons:
-                city_name, unit_name, unit_count = garrison
-
-                if unit_name not in faction_units:
-                    self.cursor.execute("SELECT consumption, faction FROM units WHERE unit_name = ?", (unit_name,))
-                    unit_data = self.cursor.fetchone()
-                    if unit_data:
-                        consumption, unit_faction = unit_data
-                        faction_units[unit_name] = {'consumption': consumption, 'faction': unit_faction}
-                    else:
-                        continue
-
-                if faction_units[unit_name]['faction'] == self.faction:
-                    self.current_consumption += faction_units[unit_name]['consumption'] * unit_count
+            # Шаг 1: Суммарное потребление гарнизонов фракции одним запросом
+            self.cursor.execute("""
+                SELECT SUM(g.unit_count * u.consumption)
+                FROM garrisons g
+                JOIN units u ON u.unit_name = g.unit_name
+                WHERE u.faction = ?
+            """, (self.faction,))
+            self.current_consumption = self.cursor.fetchone()[0] or 0
 
+            # Шаг 2: Голод — сокращаем отряды на 15% по порядку, пока потребление не уложится в лимит
             starving_units = []
             if self.current_consumption > self.max_army_limit:
                 excess_consumption = self.current_consumption - self.max_army_limit
 
-                for garrison in garrisons:
-                    city_name, unit_name, unit_count = garrison
-
-                    if unit_count <= 0 or faction_units[unit_name]['faction'] != self.faction:
-                        continue
-
+                self.cursor.execute("""
+                    SELECT g.city_name, g.unit_name, g.unit_count, u.consumption
+                    FROM garrisons g
+                    JOIN units u ON u.unit_name = g.unit_name
+                    WHERE u.faction = ? AND g.unit_count > 0
+                    ORDER BY g.id
+                """, (self.faction,))
+
+                reductions = []
+                removed = []
+                for city_name, unit_name, unit_count, consumption in self.cursor.fetchall():
                     reduction = max(1, int(unit_count * 0.15))
-
-                    self.cursor.execute("""
-                        UPDATE garrisons
-                        SET unit_count = unit_count - ?
-                        WHERE city_name = ? AND unit_name = ?
-                    """, (reduction, city_name, unit_name))
-
-                    new_unit_count = unit_count - reduction
+                    reductions.append((reduction, city_name, unit_name))
                     starving_units.append((unit_name, reduction))
 
-                    if new_unit_count <= 0:
-                        self.cursor.execute("DELETE FROM garrisons WHERE city_name = ? AND unit_name = ?",
-                                            (city_name, unit_name))
+                    if unit_count - reduction <= 0:
+                        removed.append((city_name, unit_name))
                     else:
-                        self.current_consumption -= faction_units[unit_name]['consumption'] * reduction
-                        excess_consumption -= faction_units[unit_name]['consumption'] * reduction
+                        self.current_consumption -= consumption * reduction
+                        excess_consumption -= consumption * reduction
 
                     if excess_consumption <= 0:
                         break
 
+                # Сокращение применяется пакетно в той же транзакции, что и сохранение ресурсов
+                self.cursor.executemany("""
+                    UPDATE garrisons
+                    SET unit_count = unit_count - ?
+                    WHERE city_name = ? AND unit_name = ?
+                """, reductions)
+                self.cursor.executemany("DELETE FROM garrisons WHERE city_name = ? AND unit_name = ?", removed)
+
             # Шаг 3: Обновляем досье
             total_starved = sum(reduction for _, reduction in starving_units)
 
@@ -0,0 +1,138 @@
+"""
+Каталог событий с предвычисленными таблицами выборки.
+
+Таблица events читается и разбирается (json.loads) один раз. События
+раскладываются по корзинам: обычные события хода (active + passive) и
+события кармы (sequences) с положительным (kf > 1) и отрицательным
+(kf < 1) эффектом. Для каждой корзины строится таблица псевдонимов
+(alias method Уолкера/Воуза), поэтому случайное событие выбирается за O(1)
+независимо от размера каталога.
+
+Вес события берётся из столбца events.weight, если он есть, иначе все
+события равновероятны. Генератор случайных чисел можно зафиксировать
+(seed или переменная окружения LERDON_EVENT_SEED) для воспроизводимых
+прогонов.
+"""
+
+import copy
+import json
+import os
+import random
+
+# Корзины каталога
+BUCKET_REGULAR = 'regular'
+BUCKET_SEQUENCE_POSITIVE = 'posi'
+BUCKET_SEQUENCE_NEGATIVE = 'negat'
+
+
+class AliasTable:
+    """Выборка из дискретного распределения за O(1) (метод псевдонимов)."""
+
+    def __init__(self, weights):
+        """
+        :param weights: Неотрицательные веса элементов (хотя бы один больше нуля).
+        """
+        count = len(weights)
+        total = float(sum(weights))
+        if count == 0 or total <= 0:
+            raise ValueError("Для таблицы псевдонимов нужен хотя бы один положительный вес.")
+
+        scaled = [w * count / total for w in weights]
+        self.probability = [0.0] * count
+        self.alias = [0] * count
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            small_index = small.pop()
+            large_index = large.pop()
+            self.probability[small_index] = scaled[small_index]
+            self.alias[small_index] = large_index
+            scaled[large_index] = (scaled[large_index] + scaled[small_index]) - 1.0
+            if scaled[large_index] < 1.0:
+                small.append(large_index)
+            else:
+                large.append(large_index)
+        # Остатки из-за погрешности округления
+        for i in large + small:
+            self.probability[i] = 1.0
+
+    def __len__(self):
+        return len(self.probability)
+
+    def sample(self, rng):
+        """Индекс выбранного элемента."""
+        column = rng.randrange(len(self.probability))
+        return column if rng.random() < self.probability[column] else self.alias[column]
+
+
+class EventCatalog:
+    def __init__(self, conn, seed=None):
+        """
+        :param conn: Соединение с базой данных.
+        :param seed: Зерно генератора (по умолчанию — из LERDON_EVENT_SEED, иначе случайное).
+        """
+        if seed is None and os.environ.get('LERDON_EVENT_SEED', '') != '':
+            seed = int(os.environ['LERDON_EVENT_SEED'])
+        self.rng = random.Random(seed)
+        self._events = {}   # {корзина: [событие, ...]}
+        self._tables = {}   # {корзина: AliasTable}
+        self._load(conn)
+
+    def _load(self, conn):
+        cursor = conn.cursor()
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(events)").fetchall()]
+        weight_column = ", weight" if 'weight' in columns else ", 1"
+        cursor.execute(f"""
+            SELECT id, description, event_type, effects, option_1_description, option_2_description{weight_column}
+            FROM events
+            ORDER BY id
+        """)
+
+        weights = {}
+        for event_id, description, event_type, effects_json, option_1, option_2, weight in cursor.fetchall():
+            try:
+                effects = json.loads(effects_json)
+            except (TypeError, ValueError) as e:
+                print(f"[EVENTS] Событие {event_id} пропущено: некорректные effects ({e})")
+                continue
+
+            if event_type in ('active', 'passive'):
+                bucket = BUCKET_REGULAR
+            elif event_type == 'sequences':
+                kf = effects.get('kf')
+                if not isinstance(kf, (int, float)) or kf == 1.0:
+                    continue
+                bucket = BUCKET_SEQUENCE_POSITIVE if kf > 1.0 else BUCKET_SEQUENCE_NEGATIVE
+            else:
+                continue
+
+            if weight is None or weight <= 0:
+                continue
+            self._events.setdefault(bucket, []).append({
+                'id': event_id,
+                'description': description,
+                'event_type': event_type,
+                'effects': effects,
+                'option_1_description': option_1,
+                'option_2_description': option_2,
+            })
+            weights.setdefault(bucket, []).append(weight)
+
+        self._tables = {bucket: AliasTable(bucket_weights) for bucket, bucket_weights in weights.items()}
+        summary = ", ".join(f"{bucket}={len(events)}" for bucket, events in self._events.items())
+        print(f"[EVENTS] Каталог событий: {summary}")
+
+    def count(self, bucket):
+        return len(self._events.get(bucket, ()))
+
+    def sample(self, bucket):
+        """
+        Случайное событие корзины с учётом весов.
+        :return: Словарь события (effects — копия, её можно изменять) или None.
+        """
+        table = self._tables.get(bucket)
+        if table is None:
+            return None
+        event = self._events[bucket][table.sample(self.rng)]
+        return dict(event, effects=copy.deepcopy(event['effects']))
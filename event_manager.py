@@ -1,5 +1,6 @@
 from lerdon_libraries import *
 from db_lerdon_connect import *
+from event_catalog import EventCatalog, BUCKET_REGULAR, BUCKET_SEQUENCE_POSITIVE, BUCKET_SEQUENCE_NEGATIVE
 
 def format_number(number):
     """Форматирует число с добавлением приставок (тыс., млн., млрд., трлн.)"""
@@ -44,6 +45,8 @@ class EventManager:
         self.game_screen = game_screen  # Ссылка на экран игры для отображения событий
         self.db_connection = conn # Используем единую сессию с БД
         self.economics = class_faction_economic  # Экономический модуль
+        self.catalog = EventCatalog(conn)  # События разобраны один раз, выборка за O(1)
+        self.rng = self.catalog.rng
 
     def generate_event(self, current_turn):
         """
@@ -57,24 +60,17 @@ class EventManager:
             return  # Если событие sequences сгенерировано — выходим
 
         # Иначе генерируем обычное событие (active или passive)
-        cursor = self.db_connection.cursor()
-        cursor.execute("""
-            SELECT id, description, event_type, effects, option_1_description, option_2_description
-            FROM events
-            WHERE event_type IN ('active', 'passive')
-            ORDER BY RANDOM()
-            LIMIT 1
-        """)
-        event = cursor.fetchone()
+        event = self.catalog.sample(BUCKET_REGULAR)
         if not event:
             print("События не найдены в базе данных.")
             return
 
         # Распаковываем данные события
-        event_id, description, event_type, effects, option_1_description, option_2_description = event
-        effects = json.loads(effects)  # Преобразуем JSON-строку в словарь
-        effects["option_1_description"] = option_1_description
-        effects["option_2_description"] = option_2_description
+        description = event['description']
+        event_type = event['event_type']
+        effects = event['effects']
+        effects["option_1_description"] = event['option_1_description']
+        effects["option_2_description"] = event['option_2_description']
 
         # Обрабатываем событие в зависимости от его типа
         if event_type == "active":
@@ -111,7 +107,7 @@ class EventManager:
         turns_since_last_check = current_turn - last_check_turn
 
         # Проверяем, прошло ли достаточно ходов для нового "среза"
-        if turns_since_last_check < random.randint(10, 15):  # ↑ увеличили интервал
+        if turns_since_last_check < self.rng.randint(10, 15):  # ↑ увеличили интервал
             return False
 
         # Обновляем last_check_turn, чтобы избежать повторной попытки в ближайших ходах
@@ -159,24 +155,15 @@ class EventManager:
         Генерирует событие sequences с учётом типа кармы.
         :param karma_type: 'posi' или 'negat'
         """
-        kf_condition = "> 1.0" if karma_type == "posi" else "< 1.0"
-        query = f"""
-            SELECT id, description, effects 
-            FROM events
-            WHERE event_type = 'sequences'
-              AND json_extract(effects, '$.kf') {kf_condition}
-            ORDER BY RANDOM()
-            LIMIT 1
-        """
-        cursor = self.db_connection.cursor()
-        cursor.execute(query)
-        event = cursor.fetchone()
+        bucket = BUCKET_SEQUENCE_POSITIVE if karma_type == "posi" else BUCKET_SEQUENCE_NEGATIVE
+        event = self.catalog.sample(bucket)
         if not event:
+            kf_condition = "> 1.0" if karma_type == "posi" else "< 1.0"
             print(f"[WARN] Нет подходящих событий для '{karma_type}' (kf {kf_condition})")
             return False
 
-        event_id, description, effects_json = event
-        effects = json.loads(effects_json)
+        description = event['description']
+        effects = event['effects']
 
         # Получаем тип ресурса и коэффициент
         resource_type = effects.get("resource", None)
@@ -1,5 +1,6 @@
-from db_lerdon_connect import *
+import sqlite3
 import random
+import threading
 from battle_enhancements import (
     ENHANCED_TYPE_EFFECTIVENESS, 
     ELEMENT_EFFECTIVENESS,
@@ -17,6 +18,7 @@ from battle_enhancements import (
     STATUS_POISONED,
     STATUS_STUNNED,
 )
+from map_index import invalidate_city_owners
 
 # Константы для типов войск
 UNIT_TYPE_INFANTRY = "Пехота"
@@ -28,6 +30,70 @@ UNIT_TYPE_SIEGE = "Осадные"
 # Используем улучшенную матрицу из battle_enhancements.py
 TYPE_EFFECTIVENESS = ENHANCED_TYPE_EFFECTIVENESS
 
+# Урон, необходимый для разрушения одного здания
+DAMAGE_PER_BUILDING = 45900
+# Приоритетные типы зданий для уничтожения
+PRIORITY_BUILDINGS = ['Больница', 'Фабрика']
+
+# Кэш справочника юнитов: {unit_name: {'faction', 'unit_type', 'element', 'abilities'}}.
+# Загружается одним запросом при первом обращении и живёт до тех пор, пока
+# SeasonManager._recalculate_all_units не перепишет таблицу units.
+# Кэш свой у каждого потока (ход ИИ на снимках БД в parallel_ai не вытесняет
+# справочник основного соединения), а сброс действует на все потоки через номер поколения.
+_unit_catalog = threading.local()
+_unit_catalog_generation = 0
+
+
+def load_unit_catalog(conn):
+    """
+    Загружает справочник юнитов из таблицы units одним запросом.
+    :param conn: Соединение с базой данных.
+    :return: Словарь {unit_name: {'faction', 'unit_type', 'element', 'abilities'}}.
+    """
+    generation = _unit_catalog_generation
+    catalog = {}
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT unit_name, faction, unit_type, element, abilities FROM units")
+        for unit_name, faction, unit_type, element, abilities in cursor.fetchall():
+            catalog[unit_name] = {
+                'faction': faction,
+                'unit_type': unit_type or UNIT_TYPE_INFANTRY,
+                'element': element,
+                'abilities': abilities.split(',') if abilities else []
+            }
+        cursor.close()
+    except Exception as e:
+        print(f"[WARNING] Не удалось загрузить справочник юнитов: {e}")
+        return catalog
+
+    _unit_catalog.catalog = catalog
+    _unit_catalog.conn = conn
+    _unit_catalog.generation = generation
+    return catalog
+
+
+def get_unit_catalog(conn):
+    """
+    Возвращает закэшированный справочник юнитов, загружая его при необходимости.
+    :param conn: Соединение с базой данных.
+    :return: Словарь {unit_name: {...}} (пустой, если conn не передан).
+    """
+    if not conn:
+        return {}
+    if (getattr(_unit_catalog, 'conn', None) is not conn
+            or _unit_catalog.generation != _unit_catalog_generation):
+        return load_unit_catalog(conn)
+    return _unit_catalog.catalog
+
+
+def invalidate_unit_catalog():
+    """
+    Сбрасывает кэш справочника юнитов. Вызывается после перезаписи таблицы units.
+    """
+    global _unit_catalog_generation
+    _unit_catalog_generation += 1
+
 
 def merge_units(army):
     """
@@ -453,9 +519,10 @@ def cleanup_equipment_after_battle(conn):
 
 
 def fight(attacking_city, defending_city, defending_army, attacking_army,
-          attacking_fraction, defending_fraction, conn):
+          attacking_fraction, defending_fraction, conn, show_report=True):
     """
     Основная функция боя между двумя армиями.
+    :param show_report: Показывать ли окно отчёта игроку (False — для безголовых симуляций).
     """
 
     print('Армия attacking_army:', attacking_army)
@@ -471,41 +538,24 @@ def fight(attacking_city, defending_city, defending_army, attacking_army,
         print(f"[ERROR] Не удалось получить фракцию игрока: {e}")
         user_faction = None
 
+    cursor.close()
+
+    # Справочник юнитов загружается один раз и переиспользуется всеми боями
+    unit_catalog = get_unit_catalog(conn)
+
     is_user_involved = False
     if user_faction:
-        for unit in attacking_army:
+        for unit in attacking_army + defending_army:
             if isinstance(unit, dict) and 'unit_name' in unit:
                 unit_name = unit['unit_name']
             elif isinstance(unit, (list, tuple)) and len(unit) > 0:
                 unit_name = unit[0]
             else:
                 continue
-            try:
-                cursor.execute("SELECT faction FROM units WHERE unit_name = ?", (unit_name,))
-                result = cursor.fetchone()
-                if result and result[0] == user_faction:
-                    is_user_involved = True
-                    break
-            except sqlite3.Error as e:
-                print(f"[ERROR] Не удалось проверить фракцию для '{unit_name}': {e}")
-
-        if not is_user_involved:
-            for unit in defending_army:
-                if isinstance(unit, dict) and 'unit_name' in unit:
-                    unit_name = unit['unit_name']
-                elif isinstance(unit, (list, tuple)) and len(unit) > 0:
-                    unit_name = unit[0]
-                else:
-                    continue
-                try:
-                    cursor.execute("SELECT faction FROM units WHERE unit_name = ?", (unit_name,))
-                    result = cursor.fetchone()
-                    if result and result[0] == user_faction:
-                        is_user_involved = True
-                        break
-                except sqlite3.Error as e:
-                    print(f"[ERROR] Не удалось проверить фракцию для '{unit_name}': {e}")
-    cursor.close()
+            unit_info = unit_catalog.get(unit_name)
+            if unit_info and unit_info['faction'] == user_faction:
+                is_user_involved = True
+                break
 
     # Объединяем одинаковые юниты
     merged_attacking = merge_units(attacking_army)
@@ -586,6 +636,9 @@ def fight(attacking_city, defending_city, defending_army, attacking_army,
     modified_attacking.sort(key=priority)
     modified_defending.sort(key=priority)
 
+    # Урон по зданиям копится за весь бой и применяется одной транзакцией
+    infrastructure_damage = {'buildings': 0}
+
     # Бой
     # Цепочка боя: один атакующий может атаковать несколько целей, но только если убивает каждую
     for atk in modified_attacking:
@@ -602,7 +655,8 @@ def fight(attacking_city, defending_city, defending_army, attacking_army,
             # Проводим бой
             atk_copy = atk.copy()
             df_copy = df.copy()
-            atk_new, df_new = battle_chain(atk_copy, df_copy, defending_city, user_faction, conn)
+            atk_new, df_new = battle_chain(atk_copy, df_copy, defending_city, user_faction, conn,
+                                           infrastructure_damage)
 
             # Обновляем данные
             atk['unit_count'] = atk_new['unit_count']
@@ -615,6 +669,8 @@ def fight(attacking_city, defending_city, defending_army, attacking_army,
                 # Защитник жив — больше не можем атаковать других
                 break
 
+    apply_infrastructure_damage(defending_city, infrastructure_damage['buildings'], conn)
+
     # Потери
     for u in modified_attacking + modified_defending:
         u['killed_count'] = u['initial_count'] - u['unit_count']
@@ -659,7 +715,7 @@ def fight(attacking_city, defending_city, defending_army, attacking_army,
     } for u in modified_defending]
 
     # Отображаем отчет
-    if is_user_involved:
+    if is_user_involved and show_report:
         report_data = generate_battle_report(
             final_report_attacking,
             final_report_defending,
@@ -682,7 +738,12 @@ def fight(attacking_city, defending_city, defending_army, attacking_army,
     }
 
 
-def battle_chain(attacker, defender, city, user_faction, conn):
+def battle_chain(attacker, defender, city, user_faction, conn, infrastructure_damage=None):
+    """
+    Проводит одну стычку двух отрядов.
+    :param infrastructure_damage: Накопитель урона по зданиям ({'buildings': N}).
+        Если передан, урон не пишется в БД сразу, а суммируется для fight().
+    """
     attack_power = calculate_unit_power(attacker, is_attacking=True)
     defense_power = calculate_unit_power(defender, is_attacking=False)
 
@@ -692,7 +753,10 @@ def battle_chain(attacker, defender, city, user_faction, conn):
     total_attack = attack_power * attacker['unit_count']
     total_defense = defense_power * defender['unit_count']
 
-    damage_to_infrastructure(total_attack, city, user_faction, conn)
+    if infrastructure_damage is not None:
+        infrastructure_damage['buildings'] += buildings_destroyed_by_damage(total_attack)
+    else:
+        damage_to_infrastructure(total_attack, city, user_faction, conn)
 
     if total_attack > total_defense:
         remaining_power = total_attack - total_defense
@@ -729,19 +793,9 @@ def get_unit_type_from_db(unit_name, conn=None):
     :param conn: Соединение с базой данных.
     :return: Тип юнита как строка.
     """
-    if not conn:
-        return UNIT_TYPE_INFANTRY
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT unit_type FROM units WHERE unit_name = ?", (unit_name,))
-        result = cursor.fetchone()
-        cursor.close()
-        if result and result[0]:
-            return result[0]
-    except Exception as e:
-        print(f"[WARNING] Не удалось получить тип юнита {unit_name}: {e}")
-    
+    unit_info = get_unit_catalog(conn).get(unit_name)
+    if unit_info:
+        return unit_info['unit_type']
     return UNIT_TYPE_INFANTRY
 
 
@@ -841,21 +895,13 @@ def calculate_unit_power(unit, is_attacking, conn=None):
     # Получаем тип юнита
     unit_type = get_unit_type_from_db(unit['unit_name'], conn)
     
-    # Получаем элемент и способности из БД
+    # Получаем элемент и способности из справочника юнитов
     element = None
     abilities = []
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT element, abilities FROM units WHERE unit_name = ?", (unit['unit_name'],))
-            result = cursor.fetchone()
-            if result:
-                element = result[0]
-                if result[1]:
-                    abilities = result[1].split(',')
-            cursor.close()
-        except Exception as e:
-            print(f"[WARNING] Не удалось получить элемент/способности для {unit['unit_name']}: {e}")
+    unit_info = get_unit_catalog(conn).get(unit['unit_name'])
+    if unit_info:
+        element = unit_info['element']
+        abilities = unit_info['abilities']
     
     # Базовый расчет
     if is_attacking:
@@ -897,23 +943,9 @@ def calculate_unit_power_with_matchup(attacker, defender, conn=None):
     defender_type = get_unit_type_from_db(defender['unit_name'], conn)
     
     # Получаем элементы
-    attacker_element = None
-    defender_element = None
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT element FROM units WHERE unit_name = ?", (attacker['unit_name'],))
-            result = cursor.fetchone()
-            if result:
-                attacker_element = result[0]
-            
-            cursor.execute("SELECT element FROM units WHERE unit_name = ?", (defender['unit_name'],))
-            result = cursor.fetchone()
-            if result:
-                defender_element = result[0]
-            cursor.close()
-        except Exception as e:
-            print(f"[WARNING] Не удалось получить элементы: {e}")
+    unit_catalog = get_unit_catalog(conn)
+    attacker_element = unit_catalog.get(attacker['unit_name'], {}).get('element')
+    defender_element = unit_catalog.get(defender['unit_name'], {}).get('element')
     
     # Получаем множитель эффективности типов (используем улучшенную функцию)
     type_multiplier = get_type_effectiveness_enhanced(attacker_type, defender_type)
@@ -960,6 +992,7 @@ def update_garrisons_after_battle(winner, attacking_city, defending_city,
                     ))
             # обновляем фракцию
             cursor.execute("UPDATE cities SET faction = ? WHERE name = ?", (attacking_fraction, defending_city))
+            invalidate_city_owners()
 
             # Обновляем фракцию зданий
             cursor.execute("UPDATE buildings SET faction = ? WHERE city_name = ?", (attacking_fraction, defending_city))
@@ -1014,6 +1047,15 @@ def update_garrisons_after_battle(winner, attacking_city, defending_city,
 
 #------------------------------------
 
+def buildings_destroyed_by_damage(all_damage):
+    """
+    Сколько зданий разрушает один удар с указанным уроном.
+    :param all_damage: Урон удара.
+    :return: Количество разрушенных зданий (int).
+    """
+    return int(all_damage // DAMAGE_PER_BUILDING)
+
+
 def damage_to_infrastructure(all_damage, city_name, user_faction, conn):
     """
     Вычисляет урон по инфраструктуре города и обновляет данные в базе данных.
@@ -1021,88 +1063,70 @@ def damage_to_infrastructure(all_damage, city_name, user_faction, conn):
     :param all_damage: Общий урон, который нужно нанести.
     :param city_name: Название города, по которому наносится урон.
     """
+    apply_infrastructure_damage(city_name, buildings_destroyed_by_damage(all_damage), conn)
 
-    # Константа для урона, необходимого для разрушения одного здания
-    global damage_info
-    DAMAGE_PER_BUILDING = 45900
 
-    # Подключение к базе данных
-    try:
-        cursor = conn.cursor()
+def apply_infrastructure_damage(city_name, destroyed_buildings, conn):
+    """
+    Разрушает здания города одной транзакцией.
+    Урон всех стычек боя суммируется в fight() и применяется здесь один раз;
+    итоговое количество зданий совпадает с поочерёдным применением каждого удара.
 
-        # Загрузка данных о зданиях для указанного города
-        cursor.execute('''
-            SELECT building_type, count 
-            FROM buildings 
-            WHERE city_name = ? AND count > 0
-        ''', (city_name,))
-        rows = cursor.fetchall()
-
-        # Преобразование данных в словарь
-        city_data = {}
-        for row in rows:
-            building_type, count = row
-            city_data[building_type] = count
-
-        if not city_data:
-            return
-
-        print(f"Данные инфраструктуры до удара: {city_data}")
-
-        effective_weapon_damage = all_damage
-        print(f"Эффективный урон по инфраструктуре: {effective_weapon_damage}")
-
-        # Подсчет общего числа зданий
-        total_buildings = sum(city_data.values())
-        if total_buildings == 0:
-            print("В городе нет зданий для нанесения урона.")
-            return
-
-        # Сколько зданий может быть разрушено этим уроном
-        potential_destroyed_buildings = int(effective_weapon_damage // DAMAGE_PER_BUILDING)
-        print(f"Максимально возможное количество разрушенных зданий: {potential_destroyed_buildings}")
-
-        # Уничтожаем здания, начиная с больниц и фабрик
-        damage_info = {}
-        priority_buildings = ['Больница', 'Фабрика']  # Приоритетные типы зданий для уничтожения
-
-        for building in priority_buildings:
-            if building in city_data and city_data[building] > 0:
-                count = city_data[building]
-                if potential_destroyed_buildings >= count:
-                    # Уничтожаем все здания этого типа
-                    damage_info[building] = count
-                    city_data[building] = 0
-                    potential_destroyed_buildings -= count
-
-                    # Обновляем данные в базе данных
-                    cursor.execute('''
-                        UPDATE buildings 
-                        SET count = 0 
-                        WHERE city_name = ? AND building_type = ?
-                    ''', (city_name, building))
-                else:
-                    # Уничтожаем часть зданий
-                    damage_info[building] = potential_destroyed_buildings
-                    city_data[building] -= potential_destroyed_buildings
-
-                    # Обновляем данные в базе данных
-                    cursor.execute('''
-                        UPDATE buildings 
-                        SET count = count - ? 
-                        WHERE city_name = ? AND building_type = ?
-                    ''', (potential_destroyed_buildings, city_name, building))
-
-                    potential_destroyed_buildings = 0
-
-                if potential_destroyed_buildings == 0:
-                    break
+    :param city_name: Название города, по которому наносится урон.
+    :param destroyed_buildings: Сколько зданий нужно разрушить.
+    :param conn: Соединение с базой данных.
+    """
+    if destroyed_buildings <= 0:
+        return
 
-        print(f"Данные инфраструктуры после удара: {city_data}")
+    try:
+        with conn:  # BEGIN + commit() / rollback() автоматически
+            cursor = conn.cursor()
 
-        # Сохраняем изменения в базе данных
-        conn.commit()
-        print('Обновленная инфраструктура сохранена.')
+            # Загрузка данных о зданиях для указанного города
+            cursor.execute('''
+                SELECT building_type, count 
+                FROM buildings 
+                WHERE city_name = ? AND count > 0
+            ''', (city_name,))
+            rows = cursor.fetchall()
+
+            # Преобразование данных в словарь
+            city_data = {}
+            for row in rows:
+                building_type, count = row
+                city_data[building_type] = count
+
+            if not city_data:
+                return
+
+            print(f"Данные инфраструктуры до удара: {city_data}")
+            print(f"Максимально возможное количество разрушенных зданий: {destroyed_buildings}")
+
+            # Уничтожаем здания, начиная с больниц и фабрик
+            damage_info = {}
+            updates = []
+            for building in PRIORITY_BUILDINGS:
+                if destroyed_buildings <= 0:
+                    break
+                count = city_data.get(building, 0)
+                if count <= 0:
+                    continue
+                destroyed = min(count, destroyed_buildings)
+                damage_info[building] = destroyed
+                city_data[building] = count - destroyed
+                destroyed_buildings -= destroyed
+                updates.append((city_data[building], city_name, building))
+
+            # Обновляем данные в базе данных
+            cursor.executemany('''
+                UPDATE buildings 
+                SET count = ? 
+                WHERE city_name = ? AND building_type = ?
+            ''', updates)
+
+            print(f"Данные инфраструктуры после удара: {city_data}")
+            print(f'Обновленная инфраструктура сохранена: {damage_info}')
 
     except Exception as e:
         print(f"Ошибка при работе с базой данных: {e}")
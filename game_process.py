@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from kivy.graphics import Triangle
 
 from ai_models.lerdon_ai.ultralight_ai import DiplomacyAIFactory
@@ -14,6 +15,12 @@ from seasons import SeasonManager
 from nobles_generator import generate_initial_nobles
 from nobles_generator import process_nobles_turn
 from ui_components import TutorialHint
+from turn_profiler import TurnProfiler
+from parallel_ai import run_ai_turns_parallel
+from world_state import TurnWorldState
+from db_manager import unit_of_work
+from army_strength import add_army_strength_listener, get_army_strength, remove_army_strength_listener
+from asset_registry import asset_exists, asset_source
 
 
 # Новые кастомные виджеты
@@ -27,36 +34,6 @@ class ResourceCard(BoxLayout):
     bg_color = ListProperty([0.16, 0.20, 0.27, 0.9])
 
 
-def parse_formatted_number(formatted_str):
-    """Преобразует отформатированную строку с приставкой обратно в число"""
-    # Словарь множителей для приставок
-    multipliers = {
-        'тыс': 1e3,
-        'млн': 1e6,
-        'млрд': 1e9,
-        'трлн': 1e12
-    }
-
-    try:
-        # Удаляем лишние символы и разбиваем на части
-        parts = formatted_str.replace(',', '.').replace('.', '', 1).split()
-        number_part = parts[0]
-        suffix = parts[1].rstrip('.').lower() if len(parts) > 1 else ''
-
-        # Парсим числовую часть
-        base_value = float(number_part)
-
-        # Находим соответствующий множитель
-        for key in multipliers:
-            if suffix.startswith(key.lower()):
-                return base_value * multipliers[key]
-
-        return base_value
-
-    except (ValueError, IndexError, AttributeError):
-        return float('nan')  # Возвращаем NaN при ошибке парсинга
-
-
 # Список всех фракций
 FACTIONS = ["Север", "Эльфы", "Вампиры", "Элины", "Адепты"]
 global_resource_manager = {}
@@ -229,6 +206,41 @@ class ResourceBox(BoxLayout):
         "Лимит Армии": "files/status/resource_box/army_limit.png",
     }
 
+    RESOURCE_INFO = {
+        "Кроны": (
+            "Кроны нужны для найма армии и героев, создания и покупки артефактов.\n"
+            "Ведения дипломатии(заключения союзов, договоров культ. обмена и мира)\n"
+            "Так же кроны пригодятся для тайной службы(Ваша разведка)\n"
+            "Основной источник: налоги.\n"
+            "Можно получить: продав Кристаллы на рынке или от дружественных стран при торговле."
+        ),
+        "Рабочие": (
+            "Работоспособное население,\nспособное работать на фабриках или служить в армии.\n"
+            "Чем больше больниц — тем больше рабочих. Их число растет если растет население\n"
+            "Без них нельзя нанять армию\n"
+        ),
+        "Кристаллы": (
+            "Потребляемый ресурс,\n"
+            "Его добычу надо налаживать с первого хода. Вкладка Развитие и выбор соотношения стройки\n"
+            "Кристаллы нужны для поддержания армии и населения.\n"
+            "Добыча зависит от количества фабрик. Уровень добычи влияет на то растет население или голодает"
+        ),
+        "Население": (
+            "Платят налоги\n"
+            "Перерабатывают Кристаллы в Кристаллическое сырье 1к1 для питания себя и армии.\n"
+            "Растёт при наличии Кристаллов.\n"
+            "Умирают если нет кристаллов. Когда население иссякнет - конец игры"
+        ),
+        "Потребление": (
+            "Уровень потребления Кристаллического сырья армией(Кристаллы).\n"
+            "Если превышает лимит армии — армия умирает от голода."
+        ),
+        "Лимит Армии": (
+            "Текущий максимальный лимит,\nпотребления армией Кристаллического сырья.\n"
+            "Зависит от текущего количества городов расы."
+        )
+    }
+
     def __init__(self, resource_manager, overlay, **kwargs):
         super(ResourceBox, self).__init__(**kwargs)
         self.resource_manager = resource_manager
@@ -248,6 +260,12 @@ class ResourceBox(BoxLayout):
         # spacing = 0, поскольку сами рисуем разделители
         self.spacing = 0
 
+        # Размеры строк
+        self.row_h = dp(32)
+        self.icon_size = dp(24)
+        self.colon_w = dp(6)
+        self.gap = dp(8)
+
         # фон с закруглёнными углами
         with self.canvas.before:
             Color(0.11, 0.15, 0.21, 0.9)
@@ -255,159 +273,63 @@ class ResourceBox(BoxLayout):
 
         self.bind(pos=self._update_bg, size=self._update_bg)
 
-        # Словарь, чтобы хранить метки значений (обновлять при tick)
-        self._label_values = {}
+        # Строки строятся один раз; при обновлении меняются только текст и цвет
+        self._label_values = {}   # {ресурс: метка значения}
+        self._row_names = ()      # Ресурсы, для которых построены строки
 
         # Сразу строим содержимое
         self.update_resources()
 
-        # При изменении высоты/ширины пересобираем (нужно для корректного рисования линий)
-        self.bind(size=lambda *a: self.update_resources())
+        # Ширина меток значений зависит от ширины контейнера
+        self.bind(width=self._update_value_width)
 
     def _update_bg(self, *args):
         self._bg_rect.pos = self.pos
         self._bg_rect.size = self.size
 
-    def update_resources(self, delta=None):
-        if delta is None:
-            delta = {}
-        # --- Отменить предыдущую анимацию бонуса, если она была ---
-        if self.scheduled_animate_event:
-            Clock.unschedule(self.scheduled_animate_event)
-            self.scheduled_animate_event = None
-
-        self.clear_widgets()
-        self._label_values.clear()
-
-        resources = self.resource_manager.get_resources()
-
-        parsed = {}
-        for name, val in resources.items():
-            try:
-                parsed[name] = parse_formatted_number(val)
-            except Exception:
-                parsed[name] = None
-
-        row_h = dp(32)
-        icon_size = dp(24)
-        colon_w = dp(6)
-        gap = dp(8)
-        val_w = self.width - (self.padding[0] + self.padding[2] + icon_size + gap + colon_w + dp(4))
-
-        widgets = []
-
-        def show_tooltip(res_name):
-            info_text = {
-                "Кроны": (
-                    "Кроны нужны для найма армии и героев, создания и покупки артефактов.\n"
-                    "Ведения дипломатии(заключения союзов, договоров культ. обмена и мира)\n"
-                    "Так же кроны пригодятся для тайной службы(Ваша разведка)\n"
-                    "Основной источник: налоги.\n"
-                    "Можно получить: продав Кристаллы на рынке или от дружественных стран при торговле."
-                ),
-                "Рабочие": (
-                    "Работоспособное население,\nспособное работать на фабриках или служить в армии.\n"
-                    "Чем больше больниц — тем больше рабочих. Их число растет если растет население\n"
-                    "Без них нельзя нанять армию\n"
-                ),
-                "Кристаллы": (
-                    "Потребляемый ресурс,\n"
-                    "Его добычу надо налаживать с первого хода. Вкладка Развитие и выбор соотношения стройки\n"
-                    "Кристаллы нужны для поддержания армии и населения.\n"
-                    "Добыча зависит от количества фабрик. Уровень добычи влияет на то растет население или голодает"
-                ),
-                "Население": (
-                    "Платят налоги\n"
-                    "Перерабатывают Кристаллы в Кристаллическое сырье 1к1 для питания себя и армии.\n"
-                    "Растёт при наличии Кристаллов.\n"
-                    "Умирают если нет кристаллов. Когда население иссякнет - конец игры"
-                ),
-                "Потребление": (
-                    "Уровень потребления Кристаллического сырья армией(Кристаллы).\n"
-                    "Если превышает лимит армии — армия умирает от голода."
-                ),
-                "Лимит Армии": (
-                    "Текущий максимальный лимит,\nпотребления армией Кристаллического сырья.\n"
-                    "Зависит от текущего количества городов расы."
-                )
-            }.get(res_name, "Информация о ресурсе недоступна.")
-
-            # Label с текстом информации
-            label = Label(
-                text=info_text,
-                font_size=sp(16),
-                color=(0.9, 0.9, 0.9, 1),
-                halign='left',
-                valign='top',
-                size_hint_y=None,
-                padding=[dp(15), dp(10)]
-            )
-
-            # Привязка высоты к размеру текста
-            label.bind(
-                width=lambda *x: label.setter('text_size')(label, (label.width, None)),
-                texture_size=lambda *x: label.setter('height')(label, label.texture_size[1])
-            )
-
-            # ScrollView для длинного текста
-            scroll_view = ScrollView(size_hint=(1, 1))
-            scroll_view.add_widget(label)
-
-            # Кнопка закрытия
-            close_btn = Button(
-                text="Закрыть",
-                size_hint=(1, None),
-                height=dp(50),
-                font_size=sp(18),
-                background_color=(0.2, 0.6, 0.8, 1),
-                background_normal='',
-                on_press=lambda btn: popup.dismiss()
-            )
+    def _value_width(self):
+        return self.width - (self.padding[0] + self.padding[2] + self.icon_size + self.gap + self.colon_w + dp(4))
 
-            # Общий контент попапа
-            content = BoxLayout(orientation='vertical', spacing=dp(10), padding=dp(10))
-            content.add_widget(scroll_view)
-            content.add_widget(close_btn)
+    def _update_value_width(self, *args):
+        val_w = self._value_width()
+        for lbl_val in self._label_values.values():
+            lbl_val.width = val_w
+            lbl_val.text_size = (val_w, self.row_h)
 
-            # Само окно Popup
-            popup = Popup(
-                title=res_name,
-                content=content,
-                size_hint=(0.8, 0.6),
-                title_size=sp(20),
-                title_align='center',
-                background_color=(0.1, 0.1, 0.1, 0.98),
-                separator_color=(0.3, 0.3, 0.3, 1),
-                auto_dismiss=False  # чтобы случайно не закрыть вне кнопки
-            )
+    def _separator(self):
+        """Горизонтальная линия между строками."""
+        line = Widget(size_hint=(1, None), height=dp(1))
+        with line.canvas:
+            Color(0.5, 0.5, 0.5, 1)
+            rect = Rectangle(pos=(self.x + self.padding[0], 0),
+                             size=(self.width - (self.padding[0] + self.padding[2]), dp(1)))
+            line.bind(pos=lambda inst, val: setattr(rect, 'pos', (self.x + self.padding[0], val[1])),
+                      size=lambda inst, sz: setattr(rect, 'size',
+                                                    (self.width - (self.padding[0] + self.padding[2]), dp(1))))
+        return line
 
-            # Привязываем закрытие к кнопке
-            close_btn.bind(on_release=popup.dismiss)
+    def _build_rows(self, names):
+        """Строит строки ресурсов (вызывается, только если изменился состав ресурсов)."""
+        self.clear_widgets()
+        self._label_values.clear()
 
-            # Открываем попап
-            popup.open()
+        row_h = self.row_h
+        icon_size = self.icon_size
+        colon_w = self.colon_w
+        gap = self.gap
+        val_w = self._value_width()
 
-        # --- Рендеринг строк ---
-        items = list(resources.items())
-        for idx, (res_name, formatted) in enumerate(items):
+        for res_name in names:
             # Разделитель сверху
-            line = Widget(size_hint=(1, None), height=dp(1))
-            with line.canvas:
-                Color(0.5, 0.5, 0.5, 1)
-                rect = Rectangle(pos=(self.x + self.padding[0], 0),
-                                 size=(self.width - (self.padding[0] + self.padding[2]), dp(1)))
-                line.bind(pos=lambda inst, val: setattr(rect, 'pos', (self.x + self.padding[0], val[1])),
-                          size=lambda inst, sz: setattr(rect, 'size',
-                                                        (self.width - (self.padding[0] + self.padding[2]), dp(1))))
-
-            widgets.append(line)
+            self.add_widget(self._separator())
 
             # Строка с ресурсом
             row = BoxLayout(orientation='horizontal', size_hint=(1, None), height=row_h, spacing=dp(4))
 
             icon_path = self.ICON_MAP.get(res_name)
             if icon_path:
-                img = Image(source=icon_path, size_hint=(None, None), size=(icon_size, icon_size), allow_stretch=True)
+                img = Image(source=asset_source(icon_path, icon_path), size_hint=(None, None),
+                            size=(icon_size, icon_size), allow_stretch=True)
             else:
                 img = Widget(size_hint=(None, None), size=(icon_size, icon_size))
 
@@ -422,14 +344,10 @@ class ResourceBox(BoxLayout):
             )
             lbl_colon.text_size = (colon_w, row_h)
 
-            num = parsed.get(res_name)
-            val_color = (1, 0, 0, 1) if (num is not None and num < 0) or (
-                    res_name == "Потребление" and num > parsed.get("Лимит Армии", 0)) else (1, 1, 1, 1)
-
             lbl_val = Label(
-                text=str(formatted),
+                text="",
                 font_size=sp(16),
-                color=val_color,
+                color=(1, 1, 1, 1),
                 size_hint=(None, None),
                 size=(val_w, row_h),
                 halign='left',
@@ -444,38 +362,48 @@ class ResourceBox(BoxLayout):
             row.add_widget(Widget(size_hint=(None, None), size=(gap, row_h)))
             row.add_widget(lbl_val)
 
-            # Если есть дельта — запускаем анимацию
-            if res_name in delta:
-                self.animate_resource(res_name, delta[res_name])
-
             # Добавляем обработчик тапа по строке для показа подсказки
             row.bind(
-                on_touch_down=lambda instance, touch, name=res_name: show_tooltip(name) if instance.collide_point(
+                on_touch_down=lambda instance, touch, name=res_name: self.show_tooltip(name) if instance.collide_point(
                     touch.x, touch.y) else False
             )
 
-            widgets.append(row)
+            self.add_widget(row)
 
         # Нижний разделитель
-        last_line = Widget(size_hint=(1, None), height=dp(1))
-        with last_line.canvas:
-            Color(0.5, 0.5, 0.5, 1)
-            rect = Rectangle(pos=(self.x + self.padding[0], 0),
-                             size=(self.width - (self.padding[0] + self.padding[2]), dp(1)))
-            last_line.bind(pos=lambda inst, val: setattr(rect, 'pos', (self.x + self.padding[0], val[1])),
-                           size=lambda inst, sz: setattr(rect, 'size',
-                                                         (self.width - (self.padding[0] + self.padding[2]), dp(1))))
+        self.add_widget(self._separator())
+        self._row_names = tuple(names)
 
-        widgets.append(last_line)
+    def update_resources(self, delta=None):
+        if delta is None:
+            delta = {}
+        # --- Отменить предыдущую анимацию бонуса, если она была ---
+        if self.scheduled_animate_event:
+            Clock.unschedule(self.scheduled_animate_event)
+            self.scheduled_animate_event = None
+
+        # Числа берутся прямо из словаря ресурсов фракции, без разбора отформатированных строк
+        resources = self.resource_manager.resources
+        if tuple(resources) != self._row_names:
+            self._build_rows(list(resources))
 
-        # Добавляем все виджеты
-        for w in widgets:
-            self.add_widget(w)
+        army_limit = resources.get("Лимит Армии", 0)
+        for res_name, num in resources.items():
+            is_number = isinstance(num, (int, float))
+            over_limit = (res_name == "Потребление" and is_number and isinstance(army_limit, (int, float))
+                          and num > army_limit)
+            lbl_val = self._label_values[res_name]
+            lbl_val.text = format_number(num)
+            lbl_val.color = (1, 0, 0, 1) if (is_number and num < 0) or over_limit else (1, 1, 1, 1)
+
+            # Если есть дельта — запускаем анимацию
+            if res_name in delta:
+                self.animate_resource(res_name, delta[res_name])
 
         # Расчёт высоты
-        num_rows = len(items)
+        num_rows = len(self._row_names)
         sep_h = dp(1)
-        rows_h = num_rows * row_h
+        rows_h = num_rows * self.row_h
         lines_h = (num_rows + 1) * sep_h
         total_h_raw = self.padding[1] + self.padding[3] + rows_h + lines_h
         max_bottom_y = Window.height * 0.35
@@ -483,6 +411,64 @@ class ResourceBox(BoxLayout):
         final_h = min(total_h_raw, max_allowed_h)
         self.height = final_h
 
+    def show_tooltip(self, res_name):
+        info_text = self.RESOURCE_INFO.get(res_name, "Информация о ресурсе недоступна.")
+
+        # Label с текстом информации
+        label = Label(
+            text=info_text,
+            font_size=sp(16),
+            color=(0.9, 0.9, 0.9, 1),
+            halign='left',
+            valign='top',
+            size_hint_y=None,
+            padding=[dp(15), dp(10)]
+        )
+
+        # Привязка высоты к размеру текста
+        label.bind(
+            width=lambda *x: label.setter('text_size')(label, (label.width, None)),
+            texture_size=lambda *x: label.setter('height')(label, label.texture_size[1])
+        )
+
+        # ScrollView для длинного текста
+        scroll_view = ScrollView(size_hint=(1, 1))
+        scroll_view.add_widget(label)
+
+        # Кнопка закрытия
+        close_btn = Button(
+            text="Закрыть",
+            size_hint=(1, None),
+            height=dp(50),
+            font_size=sp(18),
+            background_color=(0.2, 0.6, 0.8, 1),
+            background_normal='',
+            on_press=lambda btn: popup.dismiss()
+        )
+
+        # Общий контент попапа
+        content = BoxLayout(orientation='vertical', spacing=dp(10), padding=dp(10))
+        content.add_widget(scroll_view)
+        content.add_widget(close_btn)
+
+        # Само окно Popup
+        popup = Popup(
+            title=res_name,
+            content=content,
+            size_hint=(0.8, 0.6),
+            title_size=sp(20),
+            title_align='center',
+            background_color=(0.1, 0.1, 0.1, 0.98),
+            separator_color=(0.3, 0.3, 0.3, 1),
+            auto_dismiss=False  # чтобы случайно не закрыть вне кнопки
+        )
+
+        # Привязываем закрытие к кнопке
+        close_btn.bind(on_release=popup.dismiss)
+
+        # Открываем попап
+        popup.open()
+
     def animate_resource(self, res_name, delta_data):
         label = self._label_values.get(res_name)
         if not label:
@@ -629,6 +615,12 @@ class GameScreen(Screen):
         self.initialize_political_data()
         self.prev_diplomacy_state = {}
 
+        # Профилировщик фаз хода (включается через LERDON_TURN_PROFILE=1)
+        self.turn_profiler = TurnProfiler(
+            self.conn, os.path.join(os.path.dirname(db_path), 'turn_profile.jsonl'))
+        # Параллельное планирование ходов ИИ на снимке БД (включается через LERDON_PARALLEL_AI=1)
+        self.parallel_ai_turns = os.environ.get('LERDON_PARALLEL_AI', '') == '1'
+
         # Инициализируем таблицу season
         self.season_manager = SeasonManager()
 
@@ -674,7 +666,12 @@ class GameScreen(Screen):
 
         # --- Сохраняем объекты таймеров ---
         self.scheduled_events['update_cash'] = Clock.schedule_interval(self.update_cash, 1)
-        self.scheduled_events['update_army_rating'] = Clock.schedule_interval(self.update_army_rating, 1)
+        # Рейтинг армии пересчитывается только после изменения гарнизонов
+        self._army_rating_version = None
+        self._army_rating_trigger = Clock.create_trigger(self.update_army_rating, 0)
+        self.scheduled_events['update_army_rating'] = self._army_rating_trigger
+        add_army_strength_listener(self._army_rating_trigger)
+        self._army_rating_trigger()
         self.diplomacy_ai_factory = None
 
         # === Отслеживание дипломатии ===
@@ -1031,81 +1028,134 @@ class GameScreen(Screen):
         """
         Обработка хода игрока и ИИ.
         """
-        # Увеличиваем счетчик ходов
-        self.turn_counter += 1
-        # Обновляем метку с текущим ходом
-        self.turn_label.text = f"Текущий ход: {self.turn_counter}"
-        # Сохраняем текущее значение хода в таблицу turn
-        self.save_turn(self.selected_faction, self.turn_counter)
-        # Сохраняем историю ходов в таблицу turn_save
-        self.save_turn_history(self.selected_faction, self.turn_counter)
+        self.turn_profiler.begin_turn(self.turn_counter + 1)
+        try:
+            # Весь ход — одна транзакция: промежуточные commit() фаз не пишут на диск,
+            # а сбой посреди хода откатывает его целиком
+            with unit_of_work(self.conn, 'turn'):
+                self._process_turn_phases()
+        finally:
+            self.turn_profiler.end_turn()
+
+    @contextmanager
+    def _turn_phase(self, name, faction=None):
+        """
+        Фаза хода: замер turn_profiler и точка сохранения внутри транзакции хода.
+        """
+        with self.turn_profiler.phase(name, faction=faction):
+            with unit_of_work(self.conn, name):
+                yield
+
+    def _process_turn_phases(self):
+        """
+        Последовательность фаз хода. Каждая фаза замеряется turn_profiler
+        и выполняется в своей точке сохранения.
+        """
+        profile = self._turn_phase
+
+        with profile('save_turn'):
+            # Увеличиваем счетчик ходов
+            self.turn_counter += 1
+            # Обновляем метку с текущим ходом
+            self.turn_label.text = f"Текущий ход: {self.turn_counter}"
+            # Сохраняем текущее значение хода в таблицу turn
+            self.save_turn(self.selected_faction, self.turn_counter)
+            # Сохраняем историю ходов в таблицу turn_save
+            self.save_turn_history(self.selected_faction, self.turn_counter)
 
         # Проверяем переворот перед обработкой хода
-        if self.check_coup_and_trigger_defeat(self.conn):
-            return  # Игра закончена из-за переворота
+        with profile('check_coup'):
+            if self.check_coup_and_trigger_defeat(self.conn):
+                return  # Игра закончена из-за переворота
 
         # Обновляем сезонные бонусы артефактов
-        self.season_manager.apply_artifact_bonuses(self.conn)
+        with profile('artifact_bonuses'):
+            self.season_manager.apply_artifact_bonuses(self.conn)
 
-        # Обновляем ресурсы игрока и получаем прирост
-        profit_details = self.faction.update_resources()  # Теперь возвращает словарь
-        bonus_details = self.faction.apply_player_bonuses()  # Получаем бонусы
+        with profile('player_resources'):
+            # Обновляем ресурсы игрока и получаем прирост
+            profit_details = self.faction.update_resources()  # Теперь возвращает словарь
+            bonus_details = self.faction.apply_player_bonuses()  # Получаем бонусы
 
-        # Объединяем прирост и бонусы
-        delta_resources = {}
-        for res in profit_details:
-            base_gain = profit_details[res]
-            bonus_gain = bonus_details.get(res, 0)
-            delta_resources[res] = {"base": base_gain, "bonus": bonus_gain}
+            # Объединяем прирост и бонусы
+            delta_resources = {}
+            for res in profit_details:
+                base_gain = profit_details[res]
+                bonus_gain = bonus_details.get(res, 0)
+                delta_resources[res] = {"base": base_gain, "bonus": bonus_gain}
 
-        # Обновляем интерфейс и передаем дельту для подсветки
-        self.resource_box.update_resources(delta=delta_resources)
-        self.faction.save_resources_to_db()
+            # Обновляем интерфейс и передаем дельту для подсветки
+            self.resource_box.update_resources(delta=delta_resources)
+            self.faction.save_resources_to_db()
 
         # Проверяем, есть ли Мятежники в городах, и создаём ИИ для них
-        self.ensure_rebellion_ai_controller()
+        with profile('rebellion_check'):
+            self.ensure_rebellion_ai_controller()
 
         # Ход ИИ
-        for faction_name, ai_controller in self.ai_controllers.items():
-            ai_controller.make_turn()
+        if self.parallel_ai_turns:
+            with profile('ai_turns_parallel'):
+                run_ai_turns_parallel(self.conn, self.ai_controllers)
+        else:
+            # Все контроллеры читают общее состояние мира, загруженное один раз
+            with profile('world_state'):
+                world_state = TurnWorldState(self.conn).open()
+            try:
+                for faction_name, ai_controller in self.ai_controllers.items():
+                    ai_controller.world_state = world_state
+                    with profile('ai_turn', faction=faction_name):
+                        ai_controller.make_turn()
+            finally:
+                for ai_controller in self.ai_controllers.values():
+                    ai_controller.world_state = None
+                world_state.close()
 
         # Удаляем лишних героев 2, 3, 4 классов которых мог наплодить ИИ
-        self.enforce_garrison_hero_limits()
+        with profile('hero_limits'):
+            self.enforce_garrison_hero_limits()
 
-        # Обновляем статус уничтоженных фракций
-        self.update_destroyed_factions()
+        with profile('factions_status'):
+            # Обновляем статус уничтоженных фракций
+            self.update_destroyed_factions()
 
-        # Обновляем статус ходов
-        self.reset_check_attack_flags()
+            # Обновляем статус ходов
+            self.reset_check_attack_flags()
 
         # Обработка дворян
-        process_nobles_turn(self.conn, self.turn_counter)
+        with profile('nobles'):
+            process_nobles_turn(self.conn, self.turn_counter)
 
         # Инициализация перемещений
-        self.initialize_turn_check_move()
+        with profile('turn_check_move'):
+            self.initialize_turn_check_move()
 
-        # Обновляем текущий сезон
-        new_season = self.update_season(self.turn_counter)
-        self._update_season_display(new_season)
-        self.season_manager.update(self.current_idx, self.conn)
+        with profile('season'):
+            # Обновляем текущий сезон
+            new_season = self.update_season(self.turn_counter)
+            self._update_season_display(new_season)
+            self.season_manager.update(self.current_idx, self.conn)
 
-        # Сбрасываем характеристики отсутствующих юнитов 3 класса
-        self.season_manager.reset_absent_third_class_units(self.conn)
+            # Сбрасываем характеристики отсутствующих юнитов 3 класса
+            self.season_manager.reset_absent_third_class_units(self.conn)
 
         # Обновляем рейтинг армии и отрисовываем звёздочки
-        self.update_army_rating()
-
-        # Генерация случайных событий
-        self.event_now = random.randint(1, 100)
-        if self.turn_counter % self.event_now == 0:
-            print("Генерация события...")
-            self.event_manager.generate_event(self.turn_counter)
-        # === ПРОВЕРКА НОВЫХ ОБЪЯВЛЕНИЙ ВОЙНЫ ===
-        self.check_diplomacy_changes()
-        # Сбрасываем флаг уведомления для следующего хода
-        self.reset_war_notification_flag()
+        with profile('army_rating'):
+            self.update_army_rating()
+
+        with profile('events'):
+            # Генерация случайных событий (генератор каталога: при LERDON_EVENT_SEED ход воспроизводим)
+            self.event_now = self.event_manager.rng.randint(1, 100)
+            if self.turn_counter % self.event_now == 0:
+                print("Генерация события...")
+                self.event_manager.generate_event(self.turn_counter)
+            # === ПРОВЕРКА НОВЫХ ОБЪЯВЛЕНИЙ ВОЙНЫ ===
+            self.check_diplomacy_changes()
+            # Сбрасываем флаг уведомления для следующего хода
+            self.reset_war_notification_flag()
+
         # Проверяем условие завершения игры
-        game_continues, reason = self.faction.end_game()  # Получаем статус и причину завершения
+        with profile('end_game_check'):
+            game_continues, reason = self.faction.end_game()  # Получаем статус и причину завершения
         if not game_continues:
             print("Условия завершения игры выполнены.")
 
@@ -1118,7 +1168,8 @@ class GameScreen(Screen):
             # Запускаем модуль results_game для обработки результатов
             results_game_instance = ResultsGame(status, reason, self.conn)
             results_game_instance.show_results(self.selected_faction, status, reason)
-            App.get_running_app().restart_app()
+            # Перезапуск чистит БД, поэтому выполняется после фиксации транзакции хода
+            Clock.schedule_once(lambda dt: App.get_running_app().restart_app(), 0)
             return  # Прерываем выполнение дальнейших действий
         print(f"Ход {self.turn_counter} завершён")
 
@@ -1534,6 +1585,8 @@ class GameScreen(Screen):
             self.btn_advisor.cleanup()
 
         # 2. Отменить все запланированные события
+        if hasattr(self, '_army_rating_trigger'):
+            remove_army_strength_listener(self._army_rating_trigger)
         for event_name, event_obj in self.scheduled_events.items():
             if event_obj: # Проверяем, что объект не None
                 Clock.unschedule(event_obj)
@@ -1618,7 +1671,8 @@ class GameScreen(Screen):
                 # Создаем и показываем результаты игры
                 results_game_instance = ResultsGame(status, reason, conn)
                 results_game_instance.show_results(self.selected_faction, status, reason)
-                App.get_running_app().restart_app()
+                # Перезапуск чистит БД, поэтому выполняется после фиксации транзакции хода
+                Clock.schedule_once(lambda dt: App.get_running_app().restart_app(), 0)
                 return True
 
             return False
@@ -2384,9 +2438,17 @@ class GameScreen(Screen):
             print(f"Ошибка при сбросе флагов check_attack: {e}")
 
     def update_army_rating(self, dt=None):
-        """Обновляет рейтинг армии и отрисовывает звёзды над городами."""
+        """
+        Обновляет рейтинг армии и отрисовывает звёзды над городами.
+        Вызывается после изменения гарнизонов (подписка на army_strength)
+        и в конце хода; если таблица силы армий не менялась, ничего не делает.
+        """
+        strength = get_army_strength(self.conn)
+        if strength.version == self._army_rating_version and self.city_star_levels:
+            return
         self.update_city_military_status()
         self.draw_army_stars_on_map()
+        self._army_rating_version = strength.version
 
     def draw_army_stars_on_map(self):
         """
@@ -2406,21 +2468,25 @@ class GameScreen(Screen):
         player_choise_icon_path = 'files/status/choise.png' # Путь к иконке
         # Пути к иконкам идеологии теперь определяются в update_city_military_status
 
+        # Источники текстур (атлас или файл) из реестра ресурсов, без проверок файлов на диске
+        star_source = asset_source(star_img_path)
+        red_star_source = asset_source(red_star_img_path)
+        crystal_source = asset_source(crystal_icon_path)
+        player_choise_source = asset_source(player_choise_icon_path)
+
         # Проверяем существование файлов звёзд (если они обязательны)
-        if not os.path.exists(star_img_path):
+        if star_source is None:
             print(f"Файл звезды не найден: {star_img_path}")
-            # Можно вернуться, если звезды обязательны, или продолжить с иконками
-            # return
-        if not os.path.exists(red_star_img_path):
+            star_source = star_img_path
+        if red_star_source is None:
             print(f"Файл красной звезды не найден: {red_star_img_path}")
-            # Можно вернуться, если красная звезда обязательна, или продолжить
-            # return
+            red_star_source = red_star_img_path
         # Проверяем существование файла иконки кристалла
-        if not os.path.exists(crystal_icon_path):
+        if crystal_source is None:
             print(f"Файл иконки бонуса кристаллов не найден: {crystal_icon_path}")
             # Игра продолжит выполнение, но иконки кристаллов не будут отрисованы
         # Проверяем существование файла иконки выбора игрока
-        if not os.path.exists(player_choise_icon_path):
+        if player_choise_source is None:
             print(f"Файл иконки выбора игрока не найден: {player_choise_icon_path}")
             # Игра продолжит выполнение, но иконки выбора не будут отрисованы
 
@@ -2484,12 +2550,12 @@ class GameScreen(Screen):
 
                 # --- ОТРИСОВКА ИКОНКИ ВЫБОРА ИГРОКА ---
                 # Проверяем, является ли город городом игрока и существует ли файл
-                if is_player_city and os.path.exists(player_choise_icon_path):
+                if is_player_city and player_choise_source:
                     # Центрируем иконку относительно иконки города
                     choise_x = icon_x + (CITY_ICON_SIZE - PLAYER_CHOISE_ICON_SIZE) / 2
                     choise_y = icon_y + (CITY_ICON_SIZE - PLAYER_CHOISE_ICON_SIZE) / 2
                     Rectangle(
-                        source=player_choise_icon_path,
+                        source=player_choise_source,
                         pos=(choise_x, choise_y),
                         size=(PLAYER_CHOISE_ICON_SIZE, PLAYER_CHOISE_ICON_SIZE)
                     )
@@ -2506,9 +2572,10 @@ class GameScreen(Screen):
                     ideology_y = icon_center_y - IDEOLOGY_ICON_SIZE / 2
 
                     # Проверяем существование файла перед отрисовкой (еще раз на всякий)
-                    if os.path.exists(ideology_icon_path):
+                    ideology_source = asset_source(ideology_icon_path)
+                    if ideology_source:
                         Rectangle(
-                            source=ideology_icon_path,
+                            source=ideology_source,
                             pos=(ideology_x, ideology_y),
                             size=(IDEOLOGY_ICON_SIZE, IDEOLOGY_ICON_SIZE)
                         )
@@ -2517,7 +2584,7 @@ class GameScreen(Screen):
 
                 # --- ОТРИСОВКА ИКОНОК БОНУСА КРИСТАЛЛОВ ---
                 # Проверяем, есть ли иконки для отрисовки и существует ли файл
-                if crystal_icon_count > 0 and os.path.exists(crystal_icon_path):
+                if crystal_icon_count > 0 and crystal_source:
                     # Позиция Y для иконок кристаллов (с небольшим сдвигом вниз)
                     crystal_y = icon_y + CRYSTAL_ICON_Y_OFFSET
                     # Рисуем иконки в ряд справа от иконки города
@@ -2528,7 +2595,7 @@ class GameScreen(Screen):
                         # Третья: CITY_ICON_SIZE + START_OFFSET + (2 * (SIZE + SPACING))
                         crystal_x = icon_x + CITY_ICON_SIZE + CRYSTAL_ICON_START_OFFSET_X + i * (CRYSTAL_ICON_SIZE + CRYSTAL_ICON_SPACING)
                         Rectangle(
-                            source=crystal_icon_path,
+                            source=crystal_source,
                             pos=(crystal_x, crystal_y),
                             size=(CRYSTAL_ICON_SIZE, CRYSTAL_ICON_SIZE)
                         )
@@ -2541,7 +2608,7 @@ class GameScreen(Screen):
                 if has_hero:
                     red_star_y = icon_center_y + 20 + STAR_SIZE + SPACING  # чуть выше обычных звезд
                     Rectangle(
-                        source=red_star_img_path,
+                        source=red_star_source,
                         pos=(icon_center_x - STAR_SIZE / 2, red_star_y),  # Центрируем по иконке города
                         size=(STAR_SIZE, STAR_SIZE)
                     )
@@ -2560,17 +2627,17 @@ class GameScreen(Screen):
                     x_i = start_x + i * (STAR_SIZE + SPACING)
                     y_i = start_y
                     Rectangle(
-                        source=star_img_path,
+                        source=star_source,
                         pos=(x_i, y_i),
                         size=(STAR_SIZE, STAR_SIZE)
                     )
 
     def update_city_military_status(self):
         """
-        Для всех фракций:
-          1) Находим все города, где есть гарнизоны
-          2) Для каждой фракции считаем общую мощь армии
-          3) Для каждого города этой фракции считаем его мощь
+        По таблице силы армий (army_strength, без запросов по каждому городу):
+          1) Берём все города с координатами иконок
+          2) Для каждой фракции берём общую мощь армии
+          3) Для каждого города этой фракции берём его мощь
           4) Вычисляем star_level = 0–3
           5) Проверяем наличие юнитов 2-4 класса в гарнизоне
           6) Получаем идеологию фракции города и определяем иконку
@@ -2579,180 +2646,91 @@ class GameScreen(Screen):
           9) Сохраняем в self.city_star_levels:
              { city_name: (star_level, icon_x, icon_y, city_name, has_hero, ideology_icon_path, crystal_icon_count, is_player_city) }
         """
-        cursor = self.conn.cursor()
         try:
-            cursor.execute("""
-                SELECT name, faction, icon_coordinates, kf_crystal
-                FROM cities 
-                WHERE icon_coordinates IS NOT NULL
-            """)
-            raw_cities = cursor.fetchall()
+            strength = get_army_strength(self.conn)
         except sqlite3.Error as e:
-            print(f"Ошибка при получении городов с координатами и kf_crystal: {e}")
+            print(f"Ошибка при получении силы армий по городам: {e}")
             self.city_star_levels = {}
             return
 
+        raw_cities = [(city_name, faction, kf_crystal_val)
+                      for city_name, (faction, coords_str, kf_crystal_val) in strength.cities.items()
+                      if coords_str is not None]
         if not raw_cities:
             print("Нет городов с координатами.")
             self.city_star_levels = {}
             return
 
-        # --- Получаем идеологии всех фракций ---
+        # --- Идеологии всех фракций во внутреннем формате ---
         faction_ideologies = {}
-        try:
-            cursor.execute("SELECT faction, system FROM political_systems")
-            for faction_name, system in cursor.fetchall():
-                # Приводим к внутреннему формату
-                if system == "Смирение":
-                    faction_ideologies[faction_name] = "submission"
-                elif system == "Борьба":
-                    faction_ideologies[faction_name] = "struggle"
-        except sqlite3.Error as e:
-            print(f"Ошибка при получении идеологий фракций из БД: {e}")
-            # В случае ошибки, не отрисовываем иконки
-            faction_ideologies = {}
-
-        from collections import defaultdict
-        factions_cities = defaultdict(list)
-        # --- ИЗМЕНЕНО: Теперь сохраняем faction ---
-        for city_name, faction, coords_str, kf_crystal_val in raw_cities:
-            factions_cities[faction].append((city_name, coords_str, kf_crystal_val, faction))
+        for faction_name, system in strength.ideologies.items():
+            if system == "Смирение":
+                faction_ideologies[faction_name] = "submission"
+            elif system == "Борьба":
+                faction_ideologies[faction_name] = "struggle"
 
         new_dict = {}
-        for faction, cities_list in factions_cities.items():
-            total_strength = self.get_total_army_strength_by_faction(faction)
-            # if total_strength == 0: # Не будем пропускать фракции без армии, так как может быть герой
-            #     continue
-            # --- ИЗМЕНЕНО: Теперь распаковываем faction из списка ---
-            for city_name, coords_str, kf_crystal_val, city_faction in cities_list:
-                try:
-                    coords = eval(coords_str) # Лучше использовать ast.literal_eval
-                    icon_x, icon_y = coords
-                except Exception as ex:
-                    print(f"Ошибка парсинга icon_coordinates для {city_name}: {ex}")
-                    continue
-
-                # --- Проверка наличия героя (юнита 2-4 класса) ---
-                has_hero = False
-                try:
-                    cursor.execute("""
-                        SELECT 1
-                        FROM garrisons g
-                        JOIN units u ON g.unit_name = u.unit_name
-                        WHERE g.city_name = ? AND u.unit_class IN (2, 3, 4)
-                        LIMIT 1
-                    """, (city_name,))
-                    if cursor.fetchone():
-                        has_hero = True
-                except sqlite3.Error as e:
-                    print(f"Ошибка при проверке наличия героя в {city_name}: {e}")
-
-                # --- Расчет силы армии в городе ---
-                city_strength = self.get_city_army_strength_by_faction(city_name, faction)
-                star_level = 0  # По умолчанию 0 звезд
-                if total_strength > 0 and city_strength > 0:  # Избегаем деления на 0
-                    percent = (city_strength / total_strength) * 100
-                    if percent < 35:
-                        star_level = 1
-                    elif percent < 65:
-                        star_level = 2
-                    else:
-                        star_level = 3
-
-                # --- Определение иконки идеологии ---
-                ideology_icon_path = None
-                if self.player_ideology and faction in faction_ideologies:
-                    city_faction_ideology = faction_ideologies[faction]
-                    player_ideology_type = self.player_ideology.split('_')[1] # "submission" или "struggle"
-
-                    if city_faction_ideology == player_ideology_type:
-                        # Та же идеология
-                        ideology_icon_path = self.IDEOLOGY_ICONS[self.player_ideology]['same']
-                    else:
-                        # Другая идеология
-                        ideology_icon_path = self.IDEOLOGY_ICONS[self.player_ideology]['different']
-
-                    # Проверяем существование файла иконки
-                    if not os.path.exists(ideology_icon_path):
-                        print(f"Файл иконки идеологии не найден: {ideology_icon_path}")
-                        ideology_icon_path = None # Не отрисовываем, если файл не найден
-
-                # --- Логика для определения количества иконок бонуса кристаллов ---
-                crystal_icon_count = 0  # По умолчанию - 0 иконок
-                if kf_crystal_val is not None:
-                    kf_val = float(kf_crystal_val)
-                    if 1.0 <= kf_val < 1.2:
-                        crystal_icon_count = 1
-                    elif 1.8 <= kf_val < 3.0:
-                        crystal_icon_count = 2
-                    elif kf_val >= 3.0:
-                        crystal_icon_count = 3
+        for city_name, faction, kf_crystal_val in raw_cities:
+            position = strength.icon_position(city_name)
+            if position is None:
+                continue
+            icon_x, icon_y = position
+
+            # --- Наличие героя (юнита 2-4 класса) и звёзды силы гарнизона ---
+            has_hero = strength.has_hero(city_name)
+            star_level = strength.star_level(city_name)
+
+            # --- Определение иконки идеологии ---
+            ideology_icon_path = None
+            if self.player_ideology and faction in faction_ideologies:
+                city_faction_ideology = faction_ideologies[faction]
+                player_ideology_type = self.player_ideology.split('_')[1] # "submission" или "struggle"
+
+                if city_faction_ideology == player_ideology_type:
+                    # Та же идеология
+                    ideology_icon_path = self.IDEOLOGY_ICONS[self.player_ideology]['same']
                 else:
-                    print(f"Предупреждение: kf_crystal для города {city_name} равен NULL.")
-                # --- Конец логики бонуса кристаллов ---
+                    # Другая идеология
+                    ideology_icon_path = self.IDEOLOGY_ICONS[self.player_ideology]['different']
+
+                # Проверяем существование файла иконки
+                if not asset_exists(ideology_icon_path):
+                    print(f"Файл иконки идеологии не найден: {ideology_icon_path}")
+                    ideology_icon_path = None # Не отрисовываем, если файл не найден
+
+            # --- Логика для определения количества иконок бонуса кристаллов ---
+            crystal_icon_count = 0  # По умолчанию - 0 иконок
+            if kf_crystal_val is not None:
+                kf_val = float(kf_crystal_val)
+                if 1.0 <= kf_val < 1.2:
+                    crystal_icon_count = 1
+                elif 1.8 <= kf_val < 3.0:
+                    crystal_icon_count = 2
+                elif kf_val >= 3.0:
+                    crystal_icon_count = 3
+            else:
+                print(f"Предупреждение: kf_crystal для города {city_name} равен NULL.")
+            # --- Конец логики бонуса кристаллов ---
 
-                # --- Логика для определения, принадлежит ли город игроку ---
-                is_player_city = (city_faction == self.selected_faction)
-                # --- Конец логики принадлежности ---
-                new_dict[city_name] = (star_level, icon_x, icon_y, city_name, has_hero, ideology_icon_path, crystal_icon_count, is_player_city)
+            # --- Логика для определения, принадлежит ли город игроку ---
+            is_player_city = (faction == self.selected_faction)
+            # --- Конец логики принадлежности ---
+            new_dict[city_name] = (star_level, icon_x, icon_y, city_name, has_hero, ideology_icon_path, crystal_icon_count, is_player_city)
 
         self.city_star_levels = new_dict
 
     def get_total_army_strength_by_faction(self, faction):
         """Возвращает общую мощь армии фракции."""
-        cursor = self.conn.cursor()
-        class_coefficients = {
-            "1": 1.3,
-            "2": 1.7,
-            "3": 2.0,
-            "4": 3.0,
-            "5": 4.0
-        }
         try:
-            cursor.execute("""
-                SELECT g.unit_name, g.unit_count, u.attack, u.defense, u.durability, u.unit_class
-                FROM garrisons g
-                JOIN units u ON g.unit_name = u.unit_name
-                WHERE u.faction = ?
-                  AND g.city_name IN (SELECT name FROM cities WHERE faction = ?)
-            """, (faction, faction))
-            rows = cursor.fetchall()
-            total_strength = 0
-            for row in rows:
-                unit_name, count, attack, defense, durability, unit_class = row
-                coefficient = class_coefficients.get(unit_class, 1.0)
-                unit_strength = (attack * coefficient) + defense + durability
-                total_strength += unit_strength * count
-            return total_strength
+            return get_army_strength(self.conn).owned_strength(faction)
         except sqlite3.Error as e:
             print(f"Ошибка при подсчёте общей мощи армии: {e}")
             return 0
 
     def get_city_army_strength_by_faction(self, city_name, faction):
         """Возвращает мощь армии фракции в конкретном городе."""
-        cursor = self.conn.cursor()
-        class_coefficients = {
-            "1": 1.3,
-            "2": 1.7,
-            "3": 2.0,
-            "4": 3.0,
-            "5": 4.0
-        }
         try:
-            cursor.execute("""
-                SELECT g.unit_name, g.unit_count, u.attack, u.defense, u.durability, u.unit_class
-                FROM garrisons g
-                JOIN units u ON g.unit_name = u.unit_name
-                WHERE g.city_name = ? AND u.faction = ?
-            """, (city_name, faction))
-            rows = cursor.fetchall()
-            city_strength = 0
-            for row in rows:
-                unit_name, count, attack, defense, durability, unit_class = row
-                coefficient = class_coefficients.get(unit_class, 1.0)
-                unit_strength = (attack * coefficient) + defense + durability
-                city_strength += unit_strength * count
-            return city_strength
+            return get_army_strength(self.conn).strength_in_city(city_name, faction)
         except sqlite3.Error as e:
             print(f"Ошибка при подсчёте мощи города {city_name}: {e}")
             return 0
@@ -2806,6 +2784,8 @@ class GameScreen(Screen):
                 print("Обнаружено изменение идеологии, обновляем данные на карте...")
                 # Пересчитываем данные для отрисовки с новой идеологией
                 self.update_city_military_status() # Это обновит self.city_star_levels
+                self._army_rating_version = None
+                self._army_rating_trigger()  # Перерисовать звёзды и иконки
             else:
                 print("Идеология не изменилась.")
         else:
@@ -0,0 +1,246 @@
+"""
+Сброс данных партии перед новой игрой.
+
+Раньше новая игра готовилась построчным DELETE примерно по 30 таблицам и
+INSERT ... SELECT из таблиц *_default, и время сброса росло вместе с
+размером таблиц прошлой сессии. reset_game_data собирает чистую базу в
+памяти из шаблона (game_template.db рядом с рабочей БД), переносит в неё
+таблицы, которые живут между партиями (dossier, события, память ИИ и т.п.),
+и целиком подменяет содержимое рабочей БД одним вызовом SQLite backup API.
+
+Шаблон строится один раз из рабочей БД и пересобирается, только если
+схема рабочей БД изменилась. Если быстрый путь не сработал, выполняется
+прежний построчный сброс.
+"""
+
+import os
+import sqlite3
+import time
+
+from army_strength import invalidate_army_strength
+from db_manager import commit_now
+from map_index import invalidate_map_index
+
+# Таблицы, очищаемые перед новой игрой
+TABLES_TO_CLEAR = [
+    "buildings",
+    "cities",
+    "diplomacies",
+    "garrisons",
+    "resources",
+    "trade_agreements",
+    "turn",
+    "turn_save",
+    "armies",
+    "political_systems",
+    "karma",
+    "user_faction",
+    "units",
+    "results",
+    "auto_build_settings",
+    "interface_coord",
+    "hero_equipment",
+    "ai_hero_equipment",
+    "season",
+    "effects_seasons",
+    "nobles",
+    "noble_events",
+    "coup_attempts",
+    "artifacts",
+    "artifacts_ai",
+    "artifact_effects_log",
+    "player_allies",
+    "negotiation_history",
+]
+
+# (стандартная таблица, рабочая таблица)
+TABLES_TO_RESTORE = [
+    ("diplomacies_default", "diplomacies"),
+    ("relations_default", "relations"),
+    ("resources_default", "resources"),
+    ("units_default", "units"),
+    ("artifacts_default", "artifacts"),
+    ("artifacts_ai_default", "artifacts_ai")
+]
+
+# Все таблицы, содержимое которых берётся из шаблона
+RESET_TABLES = set(TABLES_TO_CLEAR) | {working for _default, working in TABLES_TO_RESTORE}
+
+TEMPLATE_FILE = 'game_template.db'
+
+# Шаблон в памяти: {путь к шаблону: соединение}
+_templates = {}
+
+
+def _columns(cursor, table):
+    return [row[1] for row in cursor.execute(f'PRAGMA table_info("{table}")').fetchall()]
+
+
+def _restore_table(cursor, default_table, working_table):
+    """
+    Переписывает рабочую таблицу из стандартной по общим столбцам.
+    Столбцы, которых нет в стандартной таблице (element, abilities и т.п.,
+    добавленные battle_enhancements), сохраняются по id.
+    """
+    working_columns = _columns(cursor, working_table)
+    default_columns = set(_columns(cursor, default_table))
+    common = [c for c in working_columns if c in default_columns]
+    extra = [c for c in working_columns if c not in default_columns]
+
+    kept = []
+    if extra and 'id' in common:
+        cursor.execute(f'SELECT {", ".join(extra)}, id FROM "{working_table}"')
+        kept = [tuple(row) for row in cursor.fetchall()]
+
+    cursor.execute(f'DELETE FROM "{working_table}"')
+    cursor.execute(f'INSERT INTO "{working_table}" ({", ".join(common)}) '
+                   f'SELECT {", ".join(common)} FROM "{default_table}"')
+    if kept:
+        assignments = ", ".join(f"{c} = ?" for c in extra)
+        cursor.executemany(f'UPDATE "{working_table}" SET {assignments} WHERE id = ?', kept)
+
+
+def restore_from_backup(conn):
+    """
+    Восстанавливает данные из стандартных таблиц в рабочие.
+    :param conn: Активное соединение с базой данных.
+    """
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("BEGIN IMMEDIATE")  # Блокируем на время восстановления
+
+        for default_table, working_table in TABLES_TO_RESTORE:
+            _restore_table(cursor, default_table, working_table)
+
+        conn.commit()
+        print("Данные успешно восстановлены из бэкапа.")
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Ошибка восстановления данных: {e}")
+
+
+def _schema(conn):
+    cursor = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE name NOT LIKE 'sqlite_%'
+        ORDER BY type, name
+    """)
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def _template_path(conn):
+    """Путь к шаблону рядом с файлом рабочей БД (None для БД в памяти)."""
+    for _seq, name, path in conn.execute("PRAGMA database_list").fetchall():
+        if name == 'main' and path:
+            return os.path.join(os.path.dirname(path), TEMPLATE_FILE)
+    return None
+
+
+def _reset_in_place(conn):
+    """
+    Построчный сброс: очистка таблиц партии и восстановление стандартных
+    данных. Стандартные таблицы восстанавливаются до очистки остальных,
+    чтобы не потерять их дополнительные столбцы.
+    """
+    cursor = conn.cursor()
+    restored = {working for _default, working in TABLES_TO_RESTORE}
+    for default_table, working_table in TABLES_TO_RESTORE:
+        _restore_table(cursor, default_table, working_table)
+    for table in TABLES_TO_CLEAR:
+        if table not in restored:
+            cursor.execute(f'DELETE FROM "{table}"')
+    conn.commit()
+
+
+def _build_template(conn):
+    """
+    Строит чистую базу из рабочей: построчный сброс на копии в памяти и VACUUM.
+    """
+    template = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.backup(template)
+    _reset_in_place(template)
+    template.execute("VACUUM")
+    return template
+
+
+def _get_template(conn):
+    """Шаблон в памяти, схема которого совпадает со схемой рабочей БД."""
+    path = _template_path(conn)
+    schema = _schema(conn)
+
+    template = _templates.get(path)
+    if template is not None and _schema(template) == schema:
+        return template
+
+    if path and os.path.exists(path):
+        template = sqlite3.connect(':memory:', check_same_thread=False)
+        source = sqlite3.connect(path)
+        try:
+            source.backup(template)
+        finally:
+            source.close()
+        if _schema(template) == schema:
+            _templates[path] = template
+            return template
+        print("[DB] Схема БД изменилась, шаблон новой игры будет пересобран")
+
+    template = _build_template(conn)
+    if path:
+        target = sqlite3.connect(path)
+        try:
+            template.backup(target)
+        finally:
+            target.close()
+    _templates[path] = template
+    return template
+
+
+def reset_game_data(conn):
+    """
+    Приводит рабочую БД к состоянию новой игры.
+    :param conn: Соединение с рабочей базой данных.
+    :return: Время сброса в миллисекундах.
+    """
+    # fight (справочник юнитов) нужен только здесь, не при старте приложения
+    from fight import invalidate_unit_catalog
+
+    started = time.perf_counter()
+    try:
+        # backup API не работает при открытой транзакции
+        commit_now(conn)
+        template = _get_template(conn)
+
+        fresh = sqlite3.connect(':memory:', check_same_thread=False)
+        template.backup(fresh)
+
+        # Таблицы, которые живут между партиями, переносим как есть
+        for _type, table, _sql in _schema(conn):
+            if _type != 'table' or table in RESET_TABLES:
+                continue
+            rows = [tuple(row) for row in conn.execute(f'SELECT * FROM "{table}"').fetchall()]
+            fresh.execute(f'DELETE FROM "{table}"')
+            if rows:
+                placeholders = ', '.join('?' for _ in rows[0])
+                fresh.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', rows)
+        fresh.commit()
+
+        fresh.backup(conn)
+        fresh.close()
+        invalidate_map_index()
+        invalidate_unit_catalog()
+        invalidate_army_strength()  # backup API не вызывает триггеры
+    except sqlite3.Error as e:
+        print(f"[DB] Быстрый сброс из шаблона не удался ({e}), выполняется построчный сброс")
+        try:
+            _reset_in_place(conn)
+            invalidate_map_index()
+            invalidate_unit_catalog()
+            invalidate_army_strength()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"[DB] Ошибка при сбросе данных: {e}")
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000.0, 2)
+    print(f"[DB] Данные новой игры подготовлены за {elapsed_ms} мс")
+    return elapsed_ms
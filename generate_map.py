@@ -1,5 +1,6 @@
 
 from lerdon_libraries import *
+from map_index import build_path_table, invalidate_map_index
 
 # Список доступных карт
 MAP_IMAGES_DIR = "files/map/generate"
@@ -40,6 +41,45 @@ MAX_DISTANCE_PX = 230   # Можно немного увеличить для б
 MAP_SIZE = (1200, 800)
 MARGIN = 100            # Лучше тоже чуть увеличить, чтобы города не прилипали к краям
 MANHATTAN_THRESHOLD = 250  # Синхронизируем с новым масштабом
+CANDIDATES_PER_POINT = 30  # Попыток разместить город вокруг активного (Poisson disk)
+MAX_MAP_ATTEMPTS = 50      # Перегенераций карты, после которых генерация прекращается
+
+
+class SpatialGrid:
+    """
+    Равномерная сетка точек: поиск соседей просматривает только ближайшие
+    ячейки, а не все размещённые точки.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}   # {(cx, cy): [индекс, ...]}
+        self.points = {}  # {индекс: (x, y)}
+
+    def _cell(self, point):
+        return int(point[0] // self.cell_size), int(point[1] // self.cell_size)
+
+    def add(self, index, point):
+        self.points[index] = point
+        self.cells.setdefault(self._cell(point), []).append(index)
+
+    def candidates(self, point, radius):
+        """
+        Индексы точек из ячеек, которые пересекает квадрат со стороной 2 * radius
+        вокруг point. Точное расстояние (евклидово или манхэттенское) проверяет
+        вызывающий код.
+        """
+        cells = self.cells
+        reach = int(math.ceil(radius / self.cell_size))
+        cx, cy = self._cell(point)
+        found = []
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                cell = cells.get((gx, gy))
+                if cell:
+                    found.extend(cell)
+        return found
+
 
 def generate_city_coords(prev_point=None):
     """Генерирует координаты следующего города относительно предыдущего"""
@@ -67,75 +107,84 @@ def generate_city_coords(prev_point=None):
             random.randint(MARGIN, MAP_SIZE[1] - MARGIN)
         )
 
-def select_faction_cities(positions):
-    """Выбирает 5 городов, все пары которых находятся на расстоянии >= 300 px друг от друга."""
+def select_faction_cities(positions, count=len(FACTIONS), min_required_distance=200, max_attempts=100):
+    """
+    Выбирает count городов, все пары которых находятся на расстоянии >= min_required_distance.
+    Города перебираются в случайном порядке и жадно добавляются, если рядом
+    нет уже выбранных (проверка по сетке), — попыток нужно гораздо меньше,
+    чем при случайной выборке сразу всех городов.
+    """
     n = len(positions)
-    min_required_distance = 200  # Минимальное расстояние между фракционными городами
-    attempts = 0
-    max_attempts = 100  # Максимум попыток подбора
-
-    while attempts < max_attempts:
-        # Случайно выбираем 5 индексов
-        candidate_indices = random.sample(range(n), 5)
-        valid = True
-
-        # Проверяем каждую пару
-        for i in range(5):
-            for j in range(i + 1, 5):
-                idx1 = candidate_indices[i]
-                idx2 = candidate_indices[j]
-                x1, y1 = positions[idx1]
-                x2, y2 = positions[idx2]
-                dist = math.hypot(x2 - x1, y2 - y1)
-                if dist < min_required_distance:
-                    valid = False
-                    break
-            if not valid:
-                break
 
-        if valid:
-            print(f"[INFO] Найдены 5 фракционных городов, все на расстоянии ≥ {min_required_distance} px.")
-            return candidate_indices
-
-        attempts += 1
+    for _attempt in range(max_attempts):
+        grid = SpatialGrid(min_required_distance)
+        chosen = []
+        for idx in random.sample(range(n), n):
+            x1, y1 = positions[idx]
+            if any(math.hypot(grid.points[j][0] - x1, grid.points[j][1] - y1) < min_required_distance
+                   for j in grid.candidates(positions[idx], min_required_distance)):
+                continue
+            grid.add(idx, positions[idx])
+            chosen.append(idx)
+            if len(chosen) == count:
+                print(f"[INFO] Найдены {count} фракционных городов, все на расстоянии ≥ {min_required_distance} px.")
+                return chosen
 
     # Если за max_attempts не нашлось подходящих — выбрасываем исключение
     raise RuntimeError(
-        f"Не удалось найти 5 городов, удовлетворяющих условию минимального расстояния {min_required_distance}px"
+        f"Не удалось найти {count} городов, удовлетворяющих условию минимального расстояния {min_required_distance}px"
     )
 
-def generate_all_cities():
-    """Генерирует города с гарантией связности и возможности выбрать 5 фракционных с расстоянием > 300px"""
-    while True:
-        cities = []
-        used_positions = set()
-        first_point = generate_city_coords()
-        cities.append(first_point)
-        used_positions.add(first_point)
-        attempts = 0
-        while len(cities) < TOTAL_CITIES and attempts < 1000:
-            base_point = random.choice(cities)
-            new_point = generate_city_coords(base_point)
-            if new_point in used_positions:
-                attempts += 1
+def _place_cities(total_cities, map_size):
+    """
+    Размещение городов в духе Poisson disk: новый город ставится на расстоянии
+    MIN_DISTANCE_PX..MAX_DISTANCE_PX от активного, не ближе MIN_DISTANCE_PX к
+    остальным и не дальше MANHATTAN_THRESHOLD (по манхэттену) хотя бы от одного.
+    Активный город, вокруг которого CANDIDATES_PER_POINT попыток не удались,
+    исключается, поэтому число попыток ограничено O(total_cities).
+    """
+    grid = SpatialGrid(MIN_DISTANCE_PX)
+    first_point = (random.randint(MARGIN, map_size[0] - MARGIN), random.randint(MARGIN, map_size[1] - MARGIN))
+    cities = [first_point]
+    grid.add(0, first_point)
+    active = [0]
+
+    while active and len(cities) < total_cities:
+        slot = random.randrange(len(active))
+        x_base, y_base = cities[active[slot]]
+        for _ in range(CANDIDATES_PER_POINT):
+            distance = random.randint(MIN_DISTANCE_PX, MAX_DISTANCE_PX)
+            angle = random.uniform(0, 2 * math.pi)
+            x = int(x_base + distance * math.cos(angle))
+            y = int(y_base + distance * math.sin(angle))
+            if not (MARGIN <= x <= map_size[0] - MARGIN and MARGIN <= y <= map_size[1] - MARGIN):
                 continue
-            too_close = any(
-                math.hypot(new_point[0] - p[0], new_point[1] - p[1]) < MIN_DISTANCE_PX
-                for p in cities
-            )
-            if too_close:
-                attempts += 1
+            new_point = (x, y)
+            if any(math.hypot(x - cities[j][0], y - cities[j][1]) < MIN_DISTANCE_PX
+                   for j in grid.candidates(new_point, MIN_DISTANCE_PX)):
                 continue
             # Проверяем, есть ли хотя бы одна связь по Манхэттену
-            if any(manhattan(new_point, p) <= MANHATTAN_THRESHOLD for p in cities):
-                cities.append(new_point)
-                used_positions.add(new_point)
-                attempts = 0  # сбрасываем попытки
-            else:
-                attempts += 1
-        if len(cities) == TOTAL_CITIES:
-            print(f"[SUCCESS] Сгенерировано {TOTAL_CITIES} уникальных городов.")
-            # Проверяем, можно ли выбрать 5 фракционных с нужным расстоянием
+            if not any(manhattan(new_point, cities[j]) <= MANHATTAN_THRESHOLD
+                       for j in grid.candidates(new_point, MANHATTAN_THRESHOLD)):
+                continue
+            grid.add(len(cities), new_point)
+            active.append(len(cities))
+            cities.append(new_point)
+            break
+        else:
+            active[slot] = active[-1]
+            active.pop()
+
+    return cities
+
+
+def generate_all_cities(total_cities=TOTAL_CITIES, map_size=MAP_SIZE):
+    """Генерирует города с гарантией связности и возможности выбрать фракционные с расстоянием >= 200px"""
+    for _attempt in range(MAX_MAP_ATTEMPTS):
+        cities = _place_cities(total_cities, map_size)
+        if len(cities) == total_cities:
+            print(f"[SUCCESS] Сгенерировано {total_cities} уникальных городов.")
+            # Проверяем, можно ли выбрать фракционные города с нужным расстоянием
             try:
                 select_faction_cities(cities)
                 return cities
@@ -144,22 +193,35 @@ def generate_all_cities():
         else:
             print("[WARN] Не удалось сгенерировать все города, пробуем заново...")
 
+    raise RuntimeError(
+        f"Не удалось сгенерировать карту из {total_cities} городов размером {map_size} "
+        f"за {MAX_MAP_ATTEMPTS} попыток"
+    )
+
 
 def build_city_graph(cities):
     """Строит граф связей между городами"""
-    graph = {i: [] for i in range(TOTAL_CITIES)}
+    total_cities = len(cities)
+    graph = {i: [] for i in range(total_cities)}
     positions = [city["position"] for city in cities]
+    grid = SpatialGrid(MAX_DISTANCE_PX)
+    for i, position in enumerate(positions):
+        grid.add(i, position)
+
+    def distance(i, j):
+        return math.hypot(positions[i][0] - positions[j][0], positions[i][1] - positions[j][1])
 
     # Список всех пар городов с расстоянием <= MAX_DISTANCE_PX
     edges = []
-    for i in range(TOTAL_CITIES):
-        for j in range(i + 1, TOTAL_CITIES):
-            d = math.hypot(positions[i][0] - positions[j][0], positions[i][1] - positions[j][1])
-            if d <= MAX_DISTANCE_PX:
-                edges.append((d, i, j))
+    for i in range(total_cities):
+        for j in grid.candidates(positions[i], MAX_DISTANCE_PX):
+            if j > i:
+                d = distance(i, j)
+                if d <= MAX_DISTANCE_PX:
+                    edges.append((d, i, j))
 
     # Алгоритм Краскала для MST (минимального связного дерева)
-    parent = list(range(TOTAL_CITIES))
+    parent = list(range(total_cities))
     def find(u):
         while parent[u] != u:
             parent[u] = parent[parent[u]]
@@ -189,20 +251,18 @@ def build_city_graph(cities):
                 graph[j].remove(i)
 
     # Добавляем дополнительные рёбра, чтобы все города имели 2–4 соседа
-    for i in range(TOTAL_CITIES):
+    for i in range(total_cities):
         current_neighbors = set(graph[i])
         needed = max(0, 2 - len(current_neighbors))  # хотим минимум 2 соседа
         if needed == 0:
             continue
         nearby = sorted(
-            [(j, math.hypot(positions[i][0] - positions[j][0], positions[i][1] - positions[j][1]))
-             for j in range(TOTAL_CITIES) if j != i and j not in current_neighbors],
-            key=lambda x: x[1]
+            [(j, distance(i, j)) for j in grid.candidates(positions[i], MAX_DISTANCE_PX)
+             if j != i and j not in current_neighbors and distance(i, j) <= MAX_DISTANCE_PX],
+            key=lambda x: (x[1], x[0])
         )
         added = 0
         for j, d in nearby:
-            if d > MAX_DISTANCE_PX:
-                break
             if (i, j) in mst_edges or (j, i) in mst_edges:
                 continue
             if j in current_neighbors:
@@ -223,10 +283,10 @@ def build_city_graph(cities):
         if len(faction_neighbors) < 2:
             missing = 2 - len(faction_neighbors)
             candidates = []
-            for i in range(TOTAL_CITIES):
+            for i in grid.candidates(positions[idx], MAX_DISTANCE_PX):
                 if i == idx or cities[i]["type"] != "neutral" or i in graph[idx]:
                     continue
-                d = math.hypot(positions[idx][0] - positions[i][0], positions[idx][1] - positions[i][1])
+                d = distance(idx, i)
                 if d <= MAX_DISTANCE_PX:
                     candidates.append((d, i))
             candidates.sort()
@@ -236,7 +296,7 @@ def build_city_graph(cities):
                 faction_neighbors.append(i)
 
     # Ограничиваем максимальное число соседей
-    for i in range(TOTAL_CITIES):
+    for i in range(total_cities):
         if len(graph[i]) > 4:
             graph[i] = random.sample(graph[i], 4)
 
@@ -282,7 +342,7 @@ def assign_factions_to_cities(positions):
         assigned += 1
 
     # Шаг 3: Добавляем оставшиеся города как нейтралы
-    neutral_cities = []
+    neutral_assignments = {}
     for idx in range(len(positions)):
         if idx in faction_assignments:
             continue
@@ -303,14 +363,14 @@ def assign_factions_to_cities(positions):
             "color_faction": "#AAAAAA"
         }
         cities.append(city)
+        neutral_assignments[idx] = city
 
     # Возвращаем список в том же порядке, что и positions
     result = [None] * len(positions)
     for idx in faction_assignments:
         result[idx] = faction_assignments[idx]
-    for city in cities:
-        if city["position"] in positions and result[positions.index(city["position"])] is None:
-            result[positions.index(city["position"])] = city
+    for idx, city in neutral_assignments.items():
+        result[idx] = city
 
     return result
 
@@ -347,22 +407,25 @@ def save_to_database(conn, cities, graph):
             road_id += 1
 
     # --- НОВАЯ ЛОГИКА: Генерация значений kf_crystal по заданному распределению ---
+    # На карте из 23 городов: 15 бедных, 6 средних и 2 богатых; на картах
+    # другого размера сохраняются те же пропорции.
     total_cities_count = len(cities)
-    # Проверяем, что общее количество городов соответствует
-    assert total_cities_count == 23, f"Ожидается 23 города, получено {total_cities_count}"
+    rich_count = round(total_cities_count * 2 / 23)
+    middle_count = round(total_cities_count * 6 / 23)
+    poor_count = total_cities_count - middle_count - rich_count
 
     kf_crystal_values = []
 
-    # 1. Генерируем 15 значений для диапазона [1.0, 1.2)
-    for _ in range(15):
+    # 1. Генерируем значения для диапазона [1.0, 1.2)
+    for _ in range(poor_count):
         kf_crystal_values.append(round(random.uniform(1.0, 1.2), 2))
 
-    # 2. Генерируем 6 значений для диапазона [1.8, 2.3)
-    for _ in range(6):
+    # 2. Генерируем значения для диапазона [1.8, 2.3)
+    for _ in range(middle_count):
         kf_crystal_values.append(round(random.uniform(1.8, 2.3), 2))
 
-    # 3. Генерируем 2 значений для диапазона [5.3, 7.75]
-    for _ in range(2):
+    # 3. Генерируем значения для диапазона [5.3, 7.75]
+    for _ in range(rich_count):
         kf_crystal_values.append(round(random.uniform(5.3, 7.75), 2))
 
     # Перемешиваем список, чтобы распределение было случайным по городам
@@ -379,7 +442,9 @@ def save_to_database(conn, cities, graph):
         )
 
     conn.commit()
-    print(f"[INFO] Сохранено {len(cities)} городов и {road_id - 1} дорог.")
+    paths_count = build_path_table(conn)
+    invalidate_map_index()
+    print(f"[INFO] Сохранено {len(cities)} городов и {road_id - 1} дорог, путей между городами: {paths_count}.")
     # Опционально: сообщить о заполнении kf_crystal
     print(f"[INFO] Столбец kf_crystal заполнен по заданному распределению: 10 значений [1.0, 1.7), 7 значений [1.7, 2.9), 6 значений [2.9, 4.8].")
 
@@ -396,13 +461,16 @@ def is_connected(positions):
     связен (от любой вершины достижимы все).
     """
     n = len(positions)
+    grid = SpatialGrid(MANHATTAN_THRESHOLD)
+    for i, position in enumerate(positions):
+        grid.add(i, position)
     visited = [False] * n
     queue = deque([0])
     visited[0] = True
 
     while queue:
         u = queue.popleft()
-        for v in range(n):
+        for v in grid.candidates(positions[u], MANHATTAN_THRESHOLD):
             if not visited[v] and manhattan(positions[u], positions[v]) <= MANHATTAN_THRESHOLD:
                 visited[v] = True
                 queue.append(v)
@@ -410,12 +478,12 @@ def is_connected(positions):
     return all(visited)
 
 
-def generate_map_and_cities(conn):
+def generate_map_and_cities(conn, total_cities=TOTAL_CITIES, map_size=MAP_SIZE):
     """Основная функция: генерация связного набора городов → остальное."""
 
     # Шаг 1: Генерация координат городов с гарантией связности по манхэттену
     print("[INFO] Генерация координат городов с гарантией связности...")
-    positions = generate_all_cities()
+    positions = generate_all_cities(total_cities, map_size)
 
     # Шаг 2: Назначаем фракции и остальные параметры
     cities = assign_factions_to_cities(positions)
@@ -1,5 +1,7 @@
 
+from army_strength import get_army_strength
 from fight import fight
+from map_index import get_map_index, invalidate_city_owners
 from db_lerdon_connect import *
 
 def format_number(number):
@@ -50,6 +52,15 @@ class AIController:
         self.turn = 0
         self.db_connection = conn
         self.cursor = self.db_connection.cursor()
+        # Общее состояние мира на время хода (world_state.TurnWorldState), если его выдали
+        self.world_state = None
+        # Источник случайных решений ИИ; parallel_ai на время хода подставляет
+        # random.Random с зерном от хода и фракции
+        self.rng = random
+        # Ход планируется на снимке БД в другом потоке (parallel_ai): окна не показываются,
+        # а вызовы Clock откладываются до применения плана
+        self.planning = False
+        self.deferred_callbacks = []
         self.garrison = self.load_garrison()
         self.relations = self.load_relations()
         self.previous_crowns = 0
@@ -94,12 +105,15 @@ class AIController:
         Загружает текущие ресурсы фракции из таблицы resources.
         """
         try:
-            self.cursor.execute('''
-                SELECT resource_type, amount
-                FROM resources
-                WHERE faction = ?
-            ''', (self.faction,))
-            rows = self.cursor.fetchall()
+            if self.world_state is not None:
+                rows = self.world_state.resources(self.faction).items()
+            else:
+                self.cursor.execute('''
+                    SELECT resource_type, amount
+                    FROM resources
+                    WHERE faction = ?
+                ''', (self.faction,))
+                rows = self.cursor.fetchall()
 
             # Обновление ресурсов на основе данных из базы данных
             for resource_type, amount in rows:
@@ -120,12 +134,15 @@ class AIController:
         Загружает данные о зданиях для текущей фракции из таблицы buildings.
         """
         try:
-            self.cursor.execute('''
-                SELECT city_name, building_type, count 
-                FROM buildings 
-                WHERE faction = ?
-            ''', (self.faction,))
-            rows = self.cursor.fetchall()
+            if self.world_state is not None:
+                rows = self.world_state.buildings(self.faction)
+            else:
+                self.cursor.execute('''
+                    SELECT city_name, building_type, count 
+                    FROM buildings 
+                    WHERE faction = ?
+                ''', (self.faction,))
+                rows = self.cursor.fetchall()
 
             # Сброс текущих данных о зданиях
             self.cities_buildings = {}
@@ -158,6 +175,9 @@ class AIController:
         Возвращает словарь, где ключи — названия фракций, а значения — уровни отношений.
         """
         try:
+            if self.world_state is not None:
+                return self.world_state.relations(self.faction)
+
             # Выполняем запрос к таблице relations
             self.cursor.execute('''
                 SELECT faction2, relationship
@@ -180,6 +200,9 @@ class AIController:
         Использует JOIN с таблицей units для фильтрации по faction.
         """
         try:
+            if self.world_state is not None:
+                return self.world_state.garrison(self.faction)
+
             # SQL-запрос с JOIN для получения гарнизона
             query = """
                 SELECT g.city_name, g.unit_name, g.unit_count, u.faction
@@ -207,6 +230,20 @@ class AIController:
             return {}
 
     def load_army(self):
+        if self.world_state is not None:
+            return {
+                unit_name: {
+                    "cost": {"money": info['cost_money'], "time": info['cost_time']},
+                    "stats": {
+                        "Атака": info['attack'],
+                        "Защита": info['defense'],
+                        "Прочность": info['durability'],
+                        "Класс": info['unit_class']
+                    },
+                    "consumption": info['consumption']
+                } for unit_name, info in self.world_state.faction_units(self.faction).items()
+            }
+
         query = """
             SELECT unit_name, cost_money, cost_time, attack, defense, durability, unit_class, consumption 
             FROM units 
@@ -236,17 +273,20 @@ class AIController:
         Также подсчитывает количество городов и сохраняет его в self.city_count.
         """
         try:
-            # SQL-запрос для получения списка городов
-            query = """
-                SELECT id, name 
-                FROM cities 
-                WHERE faction = ?
-            """
-            self.cursor.execute(query, (self.faction,))
-            rows = self.cursor.fetchall()
+            if self.world_state is not None:
+                cities = self.world_state.cities(self.faction)
+            else:
+                # SQL-запрос для получения списка городов
+                query = """
+                    SELECT id, name 
+                    FROM cities 
+                    WHERE faction = ?
+                """
+                self.cursor.execute(query, (self.faction,))
+                rows = self.cursor.fetchall()
 
-            # Преобразуем результат в словарь {id: name}
-            cities = {row[0]: row[1] for row in rows}
+                # Преобразуем результат в словарь {id: name}
+                cities = {row[0]: row[1] for row in rows}
 
             # Подсчет количества городов
             self.city_count = len(cities)  # Сохраняем количество городов
@@ -265,57 +305,48 @@ class AIController:
             return {}
 
     # Методы сохранения данных в БД
-    def save_resources_to_db(self):
+    def save_resources_to_db(self, commit=True):
         """
         Сохраняет текущие ресурсы фракции в таблицу resources.
-        Обновляет только существующие записи, не добавляет новые.
+        Обновляет только существующие записи, не добавляет новые
+        (UPDATE несуществующей строки ничего не меняет).
+        :param commit: Зафиксировать транзакцию сразу (save_all_data фиксирует сам).
         """
         try:
-            for resource_type, amount in self.resources.items():
-                # Проверяем, существует ли запись
-                self.cursor.execute('''
-                    SELECT amount
-                    FROM resources
-                    WHERE faction = ? AND resource_type = ?
-                ''', (self.faction, resource_type))
-                existing_record = self.cursor.fetchone()
-
-                if existing_record:
-                    # Обновляем существующую запись
-                    self.cursor.execute('''
-                        UPDATE resources
-                        SET amount = ?
-                        WHERE faction = ? AND resource_type = ?
-                    ''', (amount, self.faction, resource_type))
-                else:
-                    # Если записи нет, пропускаем её (не добавляем новую)
-                    pass
+            self.cursor.executemany('''
+                UPDATE resources
+                SET amount = ?
+                WHERE faction = ? AND resource_type = ?
+            ''', [(amount, self.faction, resource_type) for resource_type, amount in self.resources.items()])
 
             # Сохраняем изменения в базе данных
-            self.db_connection.commit()
+            if commit:
+                self.db_connection.commit()
         except sqlite3.Error as e:
             print(f"Ошибка при сохранении ресурсов: {e}")
 
-    def save_buildings(self):
+    def save_buildings(self, commit=True):
         """
         Сохраняет данные о зданиях в базу данных.
         Удаляет старые записи для текущей фракции и добавляет новые.
+        :param commit: Зафиксировать транзакцию сразу (save_all_data фиксирует сам).
         """
         try:
             # Удаляем старые записи для текущей фракции
             self.cursor.execute("DELETE FROM buildings WHERE faction = ?", (self.faction,))
 
             # Вставляем новые записи для каждого города и типа здания
-            for city_name, data in self.buildings.items():
-                for building_type, count in data["Здания"].items():
-                    if count > 0:  # Сохраняем только те здания, количество которых больше 0
-                        self.cursor.execute("""
-                            INSERT INTO buildings (faction, city_name, building_type, count)
-                            VALUES (?, ?, ?, ?)
-                        """, (self.faction, city_name, building_type, count))
+            # (сохраняем только те здания, количество которых больше 0)
+            self.cursor.executemany("""
+                INSERT INTO buildings (faction, city_name, building_type, count)
+                VALUES (?, ?, ?, ?)
+            """, [(self.faction, city_name, building_type, count)
+                  for city_name, data in self.buildings.items()
+                  for building_type, count in data["Здания"].items() if count > 0])
 
             # Сохраняем изменения в базе данных
-            self.db_connection.commit()
+            if commit:
+                self.db_connection.commit()
             print("Данные о зданиях успешно сохранены в БД.")
         except sqlite3.Error as e:
             print(f"Ошибка при сохранении данных о зданиях: {e}")
@@ -364,12 +395,16 @@ class AIController:
             # Для каждого города обновляем или добавляем записи гарнизона
             for city_name, units in self.garrison.items():
                 # Проверяем, принадлежит ли город текущей фракции
-                self.cursor.execute("""
-                    SELECT faction
-                    FROM cities
-                    WHERE name = ?
-                """, (city_name,))
-                result = self.cursor.fetchone()
+                if self.world_state is not None:
+                    owner = self.world_state.city_owner(city_name)
+                    result = (owner,) if owner is not None else None
+                else:
+                    self.cursor.execute("""
+                        SELECT faction
+                        FROM cities
+                        WHERE name = ?
+                    """, (city_name,))
+                    result = self.cursor.fetchone()
                 if not result or result[0] != self.faction:
                     print(f"Город {city_name} не принадлежит фракции {self.faction}. Пропускаем сохранение гарнизона.")
                     continue
@@ -468,8 +503,7 @@ class AIController:
             print(f"Нет доступных городов для строительства у фракции '{self.faction}'.")
             return False
 
-        import random
-        target_city = random.choice(list(self.cities.values()))
+        target_city = self.rng.choice(list(self.cities.values()))
 
         # Загружаем актуальные данные о зданиях в выбранном городе
         self.load_buildings()
@@ -625,8 +659,7 @@ class AIController:
             if hired_hero_3_class_name:
                 # Планируем выполнение экипировки на следующем кадре, чтобы убедиться,
                 # что все данные сохранены в БД
-                from kivy.clock import Clock
-                Clock.schedule_once(lambda dt: self.try_equip_random_artifacts_for_ai_hero(hired_hero_3_class_name), 0)
+                self.schedule_callback(lambda dt: self.try_equip_random_artifacts_for_ai_hero(hired_hero_3_class_name))
 
         else:
             print("Не удалось нанять ни одного юнита.")
@@ -843,6 +876,26 @@ class AIController:
                 print(f"Нанят герой '{unit_name}'")
                 break  # Только один герой за раз
 
+    def schedule_callback(self, callback):
+        """
+        Выполняет callback(dt) на следующем кадре. Во время планирования хода
+        на снимке вызов только запоминается (см. flush_deferred_callbacks).
+        """
+        if self.planning:
+            self.deferred_callbacks.append(callback)
+            return
+        from kivy.clock import Clock
+        Clock.schedule_once(callback, 0)
+
+    def flush_deferred_callbacks(self):
+        """
+        Планирует вызовы, отложенные при планировании хода на снимке.
+        Вызывается в основном потоке, когда план применён к основной БД.
+        """
+        callbacks, self.deferred_callbacks = self.deferred_callbacks, []
+        for callback in callbacks:
+            self.schedule_callback(callback)
+
     def try_equip_random_artifacts_for_ai_hero(self, hero_name):
         """
         Пытается купить и экипировать до 5 случайных артефактов герою ИИ.
@@ -885,8 +938,7 @@ class AIController:
             }
 
             # 4. Перемешиваем список артефактов для случайности
-            import random
-            random.shuffle(artifact_list)
+            self.rng.shuffle(artifact_list)
 
             # 5. Пытаемся купить и экипировать артефакты
             artifacts_equipped_count = 0
@@ -977,40 +1029,39 @@ class AIController:
             return
 
         # --- Генерация артефакта ---
-        import random
 
         # Случайный выбор параметров
-        param_choice = random.choice(["attack", "defense", "both"])
+        param_choice = self.rng.choice(["attack", "defense", "both"])
 
         if param_choice == "attack":
-            attack = random.randint(8000, 14000)
+            attack = self.rng.randint(8000, 14000)
             defense = 0
         elif param_choice == "defense":
             attack = 0
-            defense = random.randint(8000, 14000)
+            defense = self.rng.randint(8000, 14000)
         else:  # both
-            attack = random.randint(4000, 13000)
-            defense = random.randint(4000, 13000)
+            attack = self.rng.randint(4000, 13000)
+            defense = self.rng.randint(4000, 13000)
 
         # Случайный выбор слота (0: Оружие, 1: Голова, 2: Сапоги, 3: Туловище, 4: Аксессуар)
-        artifact_type = random.choice([0, 1, 2, 3, 4])
+        artifact_type = self.rng.choice([0, 1, 2, 3, 4])
         artifact_type_to_slot = {0: '0', 1: '1', 2: '2', 3: '3', 4: '4'}
         slot_type = artifact_type_to_slot[artifact_type]
 
         # Случайное название
         prefixes = ["Артефакт", "Квантовый", "Атомной", "Сингулярной", "Молекулярной"]
         suffixes = ["Силы", "Защиты", "Быстроты", "Власти", "Хаоса", "Порядка", "Кода"]
-        name = f"{random.choice(prefixes)} {random.choice(suffixes)}"
+        name = f"{self.rng.choice(prefixes)} {self.rng.choice(suffixes)}"
 
         # Случайная стоимость
-        cost = random.randint(2_000_000, 10_000_000)  # 2-10 мл.
+        cost = self.rng.randint(2_000_000, 10_000_000)  # 2-10 мл.
 
         # Сезон (может быть пустым или случайным)
         seasons_list = [[], ["Весна"], ["Лето"], ["Осень"], ["Зима"], ["Весна", "Лето"], ["Лето", "Осень"],
                         ["Осень", "Зима"], ["Зима", "Весна"], ["Весна", "Осень"], ["Лето", "Зима"],
                         ["Весна", "Лето", "Осень"], ["Весна", "Лето", "Зима"], ["Весна", "Осень", "Зима"],
                         ["Лето", "Осень", "Зима"], ["Все"]]
-        season_name = ', '.join(random.choice(seasons_list))
+        season_name = ', '.join(self.rng.choice(seasons_list))
 
         # Случайное изображение (предположим, что у ИИ есть доступ к папке с изображениями артефактов)
         # В реальности, вы можете генерировать изображения или использовать стандартные
@@ -1020,7 +1071,7 @@ class AIController:
             image_files = [f for f in os.listdir(artifact_images_path) if
                            f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))]
             if image_files:
-                image_url = os.path.join(artifact_images_path, random.choice(image_files))
+                image_url = os.path.join(artifact_images_path, self.rng.choice(image_files))
             else:
                 print(f"[WARNING] Не найдены изображения в {artifact_images_path}, используем заглушку.")
                 image_url = "files/pict/artifacts/custom/default_artifact.png"  # Заглушка
@@ -1147,6 +1198,8 @@ class AIController:
         """
         Возвращает количество городов, принадлежащих текущей фракции.
         """
+        if self.world_state is not None:
+            return len(self.world_state.cities(self.faction))
         self.cursor.execute("""
             SELECT COUNT(*) FROM cities 
             WHERE faction = ?
@@ -1157,6 +1210,15 @@ class AIController:
     def has_hero_of_class(self, class_number):
         """Проверяет, есть ли у фракции хотя бы один юнит указанного класса."""
         try:
+            if self.world_state is not None:
+                units_info = self.world_state.units()
+                for units in self.garrison.values():
+                    for unit in units:
+                        info = units_info.get(unit["unit_name"])
+                        if info and info['unit_class'] == str(class_number):
+                            return True
+                return self.world_state.has_unit_of_class(self.faction, class_number)
+
             # Проверка в текущем гарнизоне (в памяти)
             for units in self.garrison.values():
                 for unit in units:
@@ -1184,6 +1246,8 @@ class AIController:
     def is_unit_already_hired(self, unit_name):
         """Проверяет, есть ли указанный юнит в гарнизоне текущей фракции."""
         try:
+            if self.world_state is not None:
+                return self.world_state.has_unit(self.faction, unit_name)
             query = """
             SELECT 1
             FROM garrisons g
@@ -1207,38 +1271,24 @@ class AIController:
         total_limit = base_limit + city_bonus
         return total_limit
 
+    def _garrison_consumption(self):
+        """
+        Суммарное потребление Кристаллы гарнизонами фракции (один запрос с JOIN).
+        """
+        self.cursor.execute("""
+            SELECT SUM(g.unit_count * u.consumption)
+            FROM garrisons g
+            JOIN units u ON u.unit_name = g.unit_name
+            WHERE u.faction = ?
+        """, (self.faction,))
+        return self.cursor.fetchone()[0] or 0
+
     def calculate_current_consumption(self):
         """
         Рассчитывает текущее потребление армии.
         """
         try:
-            self.total_consumption = 0  # Сбрасываем предыдущее значение
-
-            # Выгрузка всех гарнизонов из таблицы garrisons
-            self.cursor.execute("""
-                SELECT city_name, unit_name, unit_count 
-                FROM garrisons
-            """)
-            garrisons = self.cursor.fetchall()
-
-            # Для каждого гарнизона находим соответствующий юнит в таблице units
-            for garrison in garrisons:
-                city_name, unit_name, unit_count = garrison
-
-                # Получаем потребление юнита
-                self.cursor.execute("""
-                    SELECT consumption, faction 
-                    FROM units 
-                    WHERE unit_name = ?
-                """, (unit_name,))
-                unit_data = self.cursor.fetchone()
-
-                if unit_data:
-                    consumption, unit_faction = unit_data
-                    if unit_faction == self.faction:
-                        # Добавляем потребление данного типа юнита
-                        self.total_consumption += consumption * unit_count
-
+            self.total_consumption = self._garrison_consumption()
             print(f"Текущее потребление Кристаллы: {self.total_consumption}")
 
         except Exception as e:
@@ -1250,34 +1300,21 @@ class AIController:
         и вычета суммарного потребления из self.raw_material.
         """
         try:
-            # Шаг 1: Выгрузка всех гарнизонов из таблицы garrisons
+            # Как и прежний построчный цикл, берётся потребление последней строки
+            # гарнизона фракции (в порядке таблицы); без строк значение не меняется
             self.cursor.execute("""
-                SELECT city_name, unit_name, unit_count 
-                FROM garrisons
-            """)
-            garrisons = self.cursor.fetchall()
-
-            # Шаг 2: Для каждого гарнизона находим соответствующий юнит в таблице units
-            for garrison in garrisons:
-                city_name, unit_name, unit_count = garrison
-
-                # Проверяем, к какой фракции принадлежит юнит
-                self.cursor.execute("""
-                    SELECT consumption, faction 
-                    FROM units 
-                    WHERE unit_name = ?
-                """, (unit_name,))
-                unit_data = self.cursor.fetchone()
-
-                if unit_data:
-                    consumption, faction = unit_data
-
-                    # Учитываем только юниты текущей фракции
-                    if faction == self.faction:
-                        # Расчет потребления для данного типа юнита
-                        self.total_consumption = consumption * unit_count
+                SELECT g.unit_count * u.consumption
+                FROM garrisons g
+                JOIN units u ON u.unit_name = g.unit_name
+                WHERE u.faction = ?
+                ORDER BY g.rowid DESC
+                LIMIT 1
+            """, (self.faction,))
+            row = self.cursor.fetchone()
+            if row is not None:
+                self.total_consumption = row[0]
 
-            # Шаг 3: Вычитание общего потребления из денег фракции
+            # Вычитание общего потребления из Кристаллы фракции
             self.raw_material -= self.total_consumption
             print(f"Общее потребление Кристаллы: {self.total_consumption}")
             print(f"Остаток Кристаллы у фракции: {self.raw_material}")
@@ -1297,14 +1334,20 @@ class AIController:
         Загружает данные о количестве больниц и фабрик из базы данных.
         """
         try:
-            query = """
-                SELECT building_type, SUM(count)
-                FROM buildings
-                WHERE faction = ?
-                GROUP BY building_type
-            """
-            self.cursor.execute(query, (self.faction,))
-            rows = self.cursor.fetchall()
+            if self.world_state is not None:
+                totals = {}
+                for _city_name, b_type, count in self.world_state.buildings(self.faction):
+                    totals[b_type] = totals.get(b_type, 0) + count
+                rows = list(totals.items())
+            else:
+                query = """
+                    SELECT building_type, SUM(count)
+                    FROM buildings
+                    WHERE faction = ?
+                    GROUP BY building_type
+                """
+                self.cursor.execute(query, (self.faction,))
+                rows = self.cursor.fetchall()
 
             # Обновляем количество зданий
             self.hospitals = next((count for b_type, count in rows if b_type == "Больница"), 0)
@@ -1319,7 +1362,7 @@ class AIController:
         Генерирует новую цену на Кристаллы.
         """
         # Простая реализация: случайная цена в диапазоне
-        self.raw_material_price = round(random.uniform(150, 200), 8)
+        self.raw_material_price = round(self.rng.uniform(150, 200), 8)
         print(f"Новая цена на Кристаллы: {self.raw_material_price}")
 
     def update_trade_resources_from_db(self):
@@ -1380,9 +1423,12 @@ class AIController:
         self.raw_material, self.population и словарь self.resources.
         """
         try:
-            query = "SELECT resource_type, amount FROM resources WHERE faction = ?"
-            self.cursor.execute(query, (self.faction,))
-            rows = self.cursor.fetchall()
+            if self.world_state is not None:
+                rows = list(self.world_state.resources(self.faction).items())
+            else:
+                query = "SELECT resource_type, amount FROM resources WHERE faction = ?"
+                self.cursor.execute(query, (self.faction,))
+                rows = self.cursor.fetchall()
 
             # Обновление ресурсов на основе данных из базы данных
             for row in rows:
@@ -1505,10 +1551,14 @@ class AIController:
             print(f"Ошибка при обновлении ресурсов: {e}")
 
     def save_all_data(self):
+        """
+        Записывает итог хода (ресурсы, здания, результаты) одной транзакцией.
+        """
         try:
-            self.save_resources_to_db()
-            self.save_buildings()
-            self.save_results_to_db()
+            self.save_resources_to_db(commit=False)
+            self.save_buildings(commit=False)
+            self.save_results_to_db(commit=False)
+            self.db_connection.commit()
             print("Все данные успешно сохранены в БД")
         except Exception as e:
             print(f"Ошибка при сохранении данных: {e}")
@@ -1524,13 +1574,17 @@ class AIController:
             str: Путь к изображению юнита или пустая строка, если не найдено
         """
         try:
-            query = """
-                SELECT image_path 
-                FROM units 
-                WHERE faction = ? AND unit_name = ?
-            """
-            self.cursor.execute(query, (self.faction, unit_name))
-            result = self.cursor.fetchone()
+            if self.world_state is not None:
+                info = self.world_state.units().get(unit_name)
+                result = (info['image_path'],) if info and info['faction'] == self.faction else None
+            else:
+                query = """
+                    SELECT image_path 
+                    FROM units 
+                    WHERE faction = ? AND unit_name = ?
+                """
+                self.cursor.execute(query, (self.faction, unit_name))
+                result = self.cursor.fetchone()
             if result:
                 return result[0]  # Возвращаем путь к изображению
             else:
@@ -1684,53 +1738,13 @@ class AIController:
         Рассчитывает силу армий для каждой фракции.
         :return: Словарь, где ключи — названия фракций, а значения — сила армии.
         """
-        class_coefficients = {
-            "1": 1.3,  # Класс 1: базовые юниты
-            "2": 1.7,  # Класс 2: улучшенные юниты
-            "3": 2.0,  # Класс 3: элитные юниты
-            "4": 3.0,  # Класс 4: легендарные юниты
-            "5": 4.0  # Класс 5: экстраординарные юниты
-        }
-
-        army_strength = {}
-
         try:
-            # Получаем все юниты из таблицы garrisons и их характеристики из таблицы units
-            query = """
-                SELECT g.unit_name, g.unit_count, u.faction, u.attack, u.defense, u.durability, u.unit_class 
-                FROM garrisons g
-                JOIN units u ON g.unit_name = u.unit_name
-            """
-            self.cursor.execute(query)
-            garrison_data = self.cursor.fetchall()
-
-            # Рассчитываем силу армии для каждой фракции
-            for row in garrison_data:
-                unit_name, unit_count, faction, attack, defense, durability, unit_class = row
-
-                if not faction:
-                    continue
-
-                # Коэффициент класса
-                coefficient = class_coefficients.get(unit_class, 1.0)
-
-                # Рассчитываем силу юнита
-                unit_strength = (attack * coefficient) + defense + durability
-
-                # Умножаем на количество юнитов
-                total_strength = unit_strength * unit_count
-
-                # Добавляем к общей силе фракции
-                if faction not in army_strength:
-                    army_strength[faction] = 0
-                army_strength[faction] += total_strength
-
+            # Сила с коэффициентами классов по всем гарнизонам (см. army_strength)
+            return get_army_strength(self.db_connection).army_strength()
         except sqlite3.Error as e:
             print(f"Ошибка при расчете силы армии: {e}")
             return {}
 
-        return army_strength
-
     def notify_player_about_war(self, faction):
         """
         Создает уведомление для игрока о том, что фракция объявила войну.
@@ -1779,27 +1793,13 @@ class AIController:
         :return: Имя ближайшего союзного города или None, если подходящий город не найден
         """
         try:
-            # Получаем координаты всех городов текущей фракции
-            query = "SELECT name, coordinates FROM cities WHERE faction = ?"
-            self.cursor.execute(query, (self.faction,))
-            our_cities = self.cursor.fetchall()
-
-            # Получаем координаты всех союзных городов
-            query = "SELECT name, coordinates FROM cities WHERE faction = ?"
-            self.cursor.execute(query, (faction,))
-            allied_cities = self.cursor.fetchall()
-
             # Находим ближайший союзный город с учетом ограничения по дистанции
+            # (как и раньше, берётся последняя подходящая пара городов)
             nearest_city = None
-            for our_city_name, our_coords in our_cities:
-                our_coords = our_coords.strip("[]")  # Убираем [ и ]
-                our_x, our_y = map(int, our_coords.split(','))
-                for allied_city_name, allied_coords in allied_cities:
-                    allied_coords = allied_coords.strip("[]")  # Убираем [ и ]
-                    allied_x, allied_y = map(int, allied_coords.split(','))
-                    distance = ((our_x - allied_x) ** 2 + (our_y - allied_y) ** 2) ** 0.5
-                    if distance <= 280:
-                        nearest_city = allied_city_name
+            map_index = get_map_index(self.db_connection)
+            for _our_city_name, allied_city_name in map_index.pairs_within(
+                    self.faction, faction, metric='euclidean', inclusive=True):
+                nearest_city = allied_city_name
             return nearest_city
         except sqlite3.Error as e:
             print(f"Ошибка при поиске ближайшего союзного города: {e}")
@@ -1810,31 +1810,10 @@ class AIController:
         :param faction: Название фракции
         :return: Имя ближайшего города или None, если подходящий город не найден"""
         try:
-            # Получаем координаты всех городов текущей фракции
-            query = "SELECT name, coordinates FROM cities WHERE faction = ?"
-            self.cursor.execute(query, (self.faction,))
-            our_cities = self.cursor.fetchall()
-
-            # Получаем координаты всех городов противника
-            query = "SELECT name, coordinates FROM cities WHERE faction = ?"
-            self.cursor.execute(query, (faction,))
-            enemy_cities = self.cursor.fetchall()
-
-            for our_city_name, our_coords in our_cities:
-                our_coords = our_coords.strip("[]")  # Убираем [ и ]
-                our_x, our_y = map(int, our_coords.split(','))
-
-                for enemy_city_name, enemy_coords in enemy_cities:
-                    enemy_coords = enemy_coords.strip("[]")  # Убираем [ и ]
-                    enemy_x, enemy_y = map(int, enemy_coords.split(','))
-
-                    # Новый расчет расстояния
-                    distance = abs(our_x - enemy_x) + abs(our_y - enemy_y)
-
-                    if distance < 280:
-                        nearest_city = enemy_city_name
-                        return nearest_city
-
+            # Первый город противника в пределах манхэттенского расстояния 280
+            map_index = get_map_index(self.db_connection)
+            for _our_city_name, enemy_city_name in map_index.pairs_within(self.faction, faction):
+                return enemy_city_name
             return None
         except sqlite3.Error as e:
             print(f"Ошибка при поиске ближайшего города: {e}")
@@ -1932,7 +1911,7 @@ class AIController:
 
         # Если остались места и есть герои — добавляем одного
         if hero_units and remaining < units_to_take and not self.hero_used_in_turn:
-            chosen_hero = random.choice(hero_units)
+            chosen_hero = self.rng.choice(hero_units)
             attack_army.append({
                 "city_name": chosen_hero["city_name"],
                 "unit_name": chosen_hero["unit_name"],
@@ -1997,7 +1976,8 @@ class AIController:
             attacking_army=attacking_army,
             attacking_fraction=self.faction,
             defending_fraction=target_faction,
-            conn=self.db_connection
+            conn=self.db_connection,
+            show_report=not self.planning
         )
 
         print(f"Результат битвы: {result}")
@@ -2152,7 +2132,7 @@ class AIController:
 
             # Если остались места и есть герои — добавляем одного
             if hero_units and remaining < units_to_take:
-                chosen_hero = random.choice(hero_units)
+                chosen_hero = self.rng.choice(hero_units)
                 attack_army.append({
                     "city_name": chosen_hero["city_name"],
                     "unit_name": chosen_hero["unit_name"],
@@ -2214,7 +2194,8 @@ class AIController:
                 attacking_army=attacking_army,
                 attacking_fraction=self.faction,
                 defending_fraction=faction,
-                conn=self.db_connection
+                conn=self.db_connection,
+                show_report=not self.planning
             )
             print(f"Результат битвы: {result}")
 
@@ -2268,6 +2249,7 @@ class AIController:
                     SET faction = ?
                     WHERE name = ?
                 """, (self.faction, city_name))
+                invalidate_city_owners()
                 print(f"Город {city_name} захвачен и укреплён оборонительными войсками.")
             else:
                 print(f"Атака на город {city_name} провалилась.")
@@ -2477,6 +2459,9 @@ class AIController:
         Получает все ресурсы указанной фракции.
         Возвращает словарь {тип_ресурса: количество}
         """
+        if self.world_state is not None:
+            return self.world_state.resources(faction)
+
         resources = {}
         self.cursor.execute('''
             SELECT resource_type, amount 
@@ -2932,7 +2917,7 @@ class AIController:
         except sqlite3.Error as e:
             print(f"Ошибка при обновлении экономической эффективности: {e}")
 
-    def save_results_to_db(self):
+    def save_results_to_db(self, commit=True):
         try:
             # Обновляем только коэффициент сделок
             self.cursor.execute('''SELECT Average_Deal_Ratio FROM results WHERE faction = ?''', (self.faction,))
@@ -2948,7 +2933,8 @@ class AIController:
                 self.cursor.execute('''INSERT INTO results (Average_Deal_Ratio, faction) VALUES (?, ?)''',
                                     (new_deal_ratio, self.faction))
 
-            self.db_connection.commit()
+            if commit:
+                self.db_connection.commit()
         except sqlite3.Error as e:
             print(f"Ошибка сохранения результатов: {e}")
 
@@ -2958,25 +2944,9 @@ class AIController:
         :return: Имя ближайшего нейтрального города или None
         """
         try:
-            # Получаем координаты всех своих городов
-            query = "SELECT name, coordinates FROM cities WHERE faction = ?"
-            self.cursor.execute(query, (self.faction,))
-            our_cities = self.cursor.fetchall()
-
-            # Получаем все нейтральные города
-            query = "SELECT name, coordinates FROM cities WHERE faction = 'Нейтрал'"
-            self.cursor.execute(query)
-            neutral_cities = self.cursor.fetchall()
-
-            for our_city_name, our_coords in our_cities:
-                our_coords = our_coords.strip("[]")
-                our_x, our_y = map(int, our_coords.split(','))
-                for city_name, city_coords in neutral_cities:
-                    city_coords = city_coords.strip("[]")
-                    enemy_x, enemy_y = map(int, city_coords.split(','))
-                    distance = abs(our_x - enemy_x) + abs(our_y - enemy_y)
-                    if distance < 280:
-                        return city_name
+            map_index = get_map_index(self.db_connection)
+            for _our_city_name, city_name in map_index.pairs_within(self.faction, 'Нейтрал'):
+                return city_name
             return None
         except sqlite3.Error as e:
             print(f"Ошибка при поиске нейтрального города: {e}")
@@ -3177,39 +3147,7 @@ class AIController:
         Рассчитывает силу армии фракции
         """
         try:
-            cursor = self.db_connection.cursor()
-
-            cursor.execute("""
-                SELECT g.unit_name, g.unit_count, u.attack, u.defense, u.durability, u.unit_class 
-                FROM garrisons g
-                JOIN units u ON g.unit_name = u.unit_name
-                WHERE u.faction = ?
-            """, (faction,))
-            units_data = cursor.fetchall()
-
-            total_strength = 0
-            class_1_count = 0
-            hero_bonus = 0
-            others_stats = 0
-
-            for unit_name, unit_count, attack, defense, durability, unit_class in units_data:
-                stats_sum = attack + defense + durability
-
-                if unit_class == "1":
-                    class_1_count += unit_count
-                    total_strength += stats_sum * unit_count
-                elif unit_class in ("2", "3"):
-                    hero_bonus += stats_sum * unit_count
-                else:
-                    others_stats += stats_sum * unit_count
-
-            if class_1_count > 0:
-                total_strength += hero_bonus * class_1_count
-
-            total_strength += others_stats
-
-            return total_strength
-
+            return get_army_strength(self.db_connection).pooled_power(faction)
         except Exception as e:
             print(f"Ошибка при расчете силы армии: {e}")
             return 0
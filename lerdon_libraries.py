@@ -11,8 +11,6 @@ import json
 import time
 import threading
 from datetime import datetime, timedelta
-import unicodedata
-import webbrowser
 from collections import defaultdict, deque
 import heapq
 import itertools
@@ -24,13 +22,12 @@ from kivy.graphics import Line, Color, Rectangle, RoundedRectangle, InstructionG
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.widget import Widget
 from kivy.core.text import Label as CoreLabel
-from kivy.uix.carousel import Carousel
 from kivy.uix.popup import Popup
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
-from kivy.uix.image import Image, AsyncImage
+from kivy.uix.image import Image
 from kivy.metrics import dp, sp
 from kivy.utils import platform
 from kivy.utils import get_color_from_hex, platform
@@ -38,8 +35,6 @@ from kivy.clock import Clock
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.slider import Slider
-from kivy.uix.dropdown import DropDown
-from kivy.uix.modalview import ModalView
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.uix.progressbar import ProgressBar
 from kivy.uix.spinner import Spinner
@@ -48,7 +43,6 @@ from kivy.uix.behaviors import ButtonBehavior
 from kivy.core.window import Window
 from kivy.uix.screenmanager import Screen
 from kivy.core.image import Image as CoreImage
-from kivy.vector import Vector
 from kivy.config import Config
 from kivy.resources import resource_find
 from kivy.graphics import Color, Ellipse
@@ -57,7 +51,6 @@ from kivy.uix.anchorlayout import AnchorLayout
 from kivy.uix.image import Image as KivyImage
 from kivy.graphics import Color, Rectangle, Line, PushMatrix, PopMatrix, Rotate, Translate
 from kivy.graphics import RoundedRectangle, Color, Rectangle as KvRect
-from kivy.uix.video import Video
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.uix.togglebutton import ToggleButton
 from kivy.logger import Logger
@@ -77,7 +70,6 @@ from kivy.uix.progressbar import ProgressBar
 from kivy.clock import Clock
 from kivy.animation import AnimationTransition
 from kivy.utils import get_color_from_hex as hex_color
-from kivy.uix.stencilview import StencilView
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
@@ -96,7 +88,6 @@ from kivy.clock import Clock
 from kivy.animation import Animation
 from kivy.graphics import Color, RoundedRectangle, Line
 from kivy.uix.image import Image
-from kivy.uix.video import Video
 from kivy.properties import ListProperty
 from kivy.lang import Builder
 from kivy import platform
@@ -1,7 +1,15 @@
-from game_process import GameScreen
-from ui import *
+import startup_profiler
+startup_profiler.install()  # Замер импортов при запуске (LERDON_IMPORT_PROFILE=1)
+
+# Экран игры (game_process) и всплывающие окна карты (ui) тянут за собой
+# экономику, ИИ, дипломатию и бой — они импортируются при входе в игру
+# и при первом клике по крепости, а не при старте приложения.
 from db_lerdon_connect import *
 from generate_map import generate_map_and_cities
+from map_index import add_city_owner_listener, get_map_index, remove_city_owner_listener
+from asset_registry import asset_exists, asset_source
+from db_manager import UnitOfWorkConnection
+from game_reset import restore_from_backup, reset_game_data
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
@@ -168,85 +176,6 @@ def load_cities_from_db(conn, selected_kingdom):
         return []
 
 
-def restore_from_backup(conn):
-    """
-    Восстанавливает данные из стандартных таблиц в рабочие.
-    :param conn: Активное соединение с базой данных.
-    """
-    cursor = conn.cursor()
-    tables_to_restore = [
-        ("diplomacies_default", "diplomacies"),
-        ("relations_default", "relations"),
-        ("resources_default", "resources"),
-        ("units_default", "units"),
-        ("artifacts_default", "artifacts"),
-        ("artifacts_ai_default", "artifacts_ai")
-    ]
-
-    try:
-        cursor.execute("BEGIN IMMEDIATE")  # Блокируем на время восстановления
-
-        for default_table, working_table in tables_to_restore:
-            cursor.execute(f"DELETE FROM {working_table}")
-            cursor.execute(f"INSERT INTO {working_table} SELECT * FROM {default_table}")
-
-        conn.commit()
-        print("Данные успешно восстановлены из бэкапа.")
-    except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Ошибка восстановления данных: {e}")
-
-
-def clear_tables(conn):
-    """
-    Очищает данные из указанных таблиц базы данных.
-    :param conn: Подключение к базе данных SQLite.
-    """
-    tables_to_clear = [
-        "buildings",
-        "cities",
-        "diplomacies",
-        "garrisons",
-        "resources",
-        "trade_agreements",
-        "turn",
-        "turn_save",
-        "armies",
-        "political_systems",
-        "karma",
-        "user_faction",
-        "units",
-        "results",
-        "auto_build_settings",
-        "interface_coord",
-        "hero_equipment",
-        "ai_hero_equipment",
-        "season",
-        "nobles",
-        "noble_events",
-        "coup_attempts",
-        "artifacts",
-        "artifacts_ai",
-        "artifact_effects_log",
-        "player_allies",
-        "negotiation_history",
-    ]
-
-    cursor = conn.cursor()
-
-    try:
-        for table in tables_to_clear:
-            # Используем TRUNCATE или DELETE для очистки таблицы
-            cursor.execute(f"DELETE FROM {table};")
-            print(f"Таблица '{table}' успешно очищена.")
-
-        # Фиксируем изменения
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Ошибка при очистке таблиц: {e}")
-        conn.rollback()  # Откат изменений в случае ошибки
-
-
 class AuthorScreen(Screen):
     def __init__(self, conn, **kwargs):
         super(AuthorScreen, self).__init__(**kwargs)
@@ -391,6 +320,7 @@ class AuthorScreen(Screen):
         app.root.add_widget(MenuWidget(self.conn))
 
     def open_link(self, instance, url):
+        import webbrowser
         webbrowser.open(url)
 
 
@@ -503,6 +433,7 @@ class LoadingScreen(FloatLayout):
 
     # === Логика загрузки ===
     def start_loading(self, dt):
+        startup_profiler.mark('loading_screen_first_frame')
         self.run_next_step()
 
     def run_next_step(self, *args):
@@ -547,7 +478,7 @@ class LoadingScreen(FloatLayout):
         print("Шаг 2: Очистка кэша...")
         from threading import Thread
         def cleanup_task():
-            clear_tables(self.conn)
+            reset_game_data(self.conn)
             Clock.schedule_once(self.run_next_step, 0)
 
         Thread(target=cleanup_task, daemon=True).start()
@@ -555,7 +486,7 @@ class LoadingScreen(FloatLayout):
     def step_restore_backup(self):
         print("Шаг 3: Восстановление из бэкапа...")
         self.update_progress(20)
-        restore_from_backup(self.conn)
+        # Стандартные данные уже восстановлены из шаблона на шаге 2
         Clock.schedule_once(self.run_next_step, 0.5)
 
     def step_load_assets(self):
@@ -586,6 +517,8 @@ class LoadingScreen(FloatLayout):
         self.bg_rect.texture = CoreImage('files/menu/main_fon.jpg').texture
         self.clear_widgets()
         self.add_widget(MenuWidget(self.conn, self.selected_map))
+        startup_profiler.mark('menu_shown')
+        startup_profiler.report(os.path.join(os.path.dirname(db_path), 'startup_profile.json'))
 
 
 class MapWidget(Widget):
@@ -595,10 +528,15 @@ class MapWidget(Widget):
         self.conn = conn
         self.fortress_data_for_canvas = []
         self.fortress_icon_widgets = {}
+        self.city_label_groups = {}  # {город: InstructionGroup подписи}
         self.current_player_kingdom = player_kingdom
         self.player_city_icon_widget = None
         self.has_blinked = False
-        self.update_cities_event = None
+        # Карта перерисовывается только при изменениях: размер окна — полностью,
+        # смена владельца города — только изменившиеся города
+        self._rebuild_trigger = Clock.create_trigger(self.update_cities, 0)
+        self._owners_trigger = Clock.create_trigger(self.refresh_city_owners, 0)
+        self._subscribed = False
         # === Сезонный оверлей ===
         self.season_overlay = None
         self.add_season_overlay()
@@ -612,7 +550,7 @@ class MapWidget(Widget):
         self.random_map_source = self.get_random_map_source()
 
         self.initialize_map()
-        self.update_cities_event = Clock.schedule_interval(self.update_cities, 1.0)
+        self._subscribe()
 
     def add_season_overlay(self):
         """Добавляет сезонный оверлей"""
@@ -627,43 +565,50 @@ class MapWidget(Widget):
             import traceback
             traceback.print_exc()
 
+    def _subscribe(self):
+        if self._subscribed:
+            return
+        Window.bind(size=self._on_window_resize)
+        add_city_owner_listener(self._owners_trigger)
+        self._subscribed = True
+
+    def _unsubscribe(self):
+        if not self._subscribed:
+            return
+        Window.unbind(size=self._on_window_resize)
+        remove_city_owner_listener(self._owners_trigger)
+        self._rebuild_trigger.cancel()
+        self._owners_trigger.cancel()
+        self._subscribed = False
+
     def on_parent(self, widget, parent):
         """Обработка удаления/добавления виджета"""
         if parent is None:
-            if self.update_cities_event:
-                Clock.unschedule(self.update_cities_event)
+            self._unsubscribe()
             if self.season_overlay:
                 self.season_overlay.stop_season_animation()
         else:
+            self._subscribe()
             # Добавляем оверлей только когда есть parent
             if self.season_overlay and self.season_overlay.parent is None:
                 parent.add_widget(self.season_overlay)
                 print("[SEASON] Сезонный оверлей добавлен в parent")
 
-    # 3. Измените update_cities - НЕ очищайте canvas.after:
-    def update_cities(self, dt=None):
-        self.map_scale = self.calculate_scale()
-        self.map_pos = self.calculate_centered_position()
-        self.canvas.clear()
-        # УДАЛИТЕ или закомментируйте эту строку:
-        # self.canvas.after.clear()  # ← Это удаляет сезонную анимацию!
+    def _on_window_resize(self, *args):
+        self._rebuild_trigger()
 
-        with self.canvas:
-            Color(1, 1, 1, 1)
-            self.map_image = Rectangle(
-                source=self.random_map_source,
-                pos=self.map_pos,
-                size=(self.base_map_width * self.map_scale, self.base_map_height * self.map_scale)
-            )
-        self.draw_roads()
-        self.draw_fortresses()
+    def update_cities(self, dt=None):
+        """Полная перестройка карты (при изменении размера окна)."""
+        self.initialize_map(schedule_blink=False)
 
     def initialize_map(self, schedule_blink=True):
         self.map_scale = self.calculate_scale()
         self.map_pos = self.calculate_centered_position()
-        self.canvas.clear()
 
-        with self.canvas:
+        # Статичный слой: изображение карты и подписи городов в canvas.before,
+        # иконки крепостей — дочерние виджеты, дороги — в canvas.after
+        self.canvas.before.clear()
+        with self.canvas.before:
             Color(1, 1, 1, 1)
             self.map_image = Rectangle(
                 source=self.random_map_source,
@@ -677,12 +622,7 @@ class MapWidget(Widget):
         if schedule_blink:
             Clock.schedule_once(self._schedule_blink, 0.2)
 
-    def draw_fortresses(self):
-        """Рисует крепости на карте с анимацией при смене фракции."""
-        self.clear_widgets()
-        self.fortress_icon_widgets.clear()
-        self.fortress_data_for_canvas.clear()
-
+    def _fortress_image(self, kingdom):
         faction_images = {
             'Вампиры': 'files/buildings/giperion.png',
             'Север': 'files/buildings/arkadia.png',
@@ -690,61 +630,86 @@ class MapWidget(Widget):
             'Адепты': 'files/buildings/eteria.png',
             'Элины': 'files/buildings/halidon.png'
         }
+        image_path = faction_images.get(kingdom, 'files/buildings/default.png')
+        if not asset_exists(image_path):
+            image_path = 'files/buildings/default.png'
+        return asset_source(image_path, image_path)
+
+    def _draw_city_label(self, fortress_name, kingdom, drawn_x, drawn_y):
+        """Рисует название города с обводкой (отдельная группа, чтобы менять её при захвате)."""
+        old_group = self.city_label_groups.pop(fortress_name, None)
+        if old_group is not None:
+            self.canvas.before.remove(old_group)
+
+        display_name = f"{fortress_name}({kingdom})"
+
+        label = CoreLabel(text=display_name, font_size=25, color=(1, 1, 1, 1))
+        label.refresh()
+        text_texture = label.texture
+        text_width, text_height = text_texture.size
+
+        text_x = drawn_x + (40 - text_width) / 2
+        text_y = drawn_y - text_height - 5
+
+        outline_width = 2
+
+        group = InstructionGroup()
+        group.add(Color(1, 1, 1, 1))
+        offsets = [
+            (-outline_width, -outline_width),
+            (-outline_width, 0),
+            (-outline_width, outline_width),
+            (0, outline_width),
+            (outline_width, outline_width),
+            (outline_width, 0),
+            (outline_width, -outline_width),
+            (0, -outline_width)
+        ]
+
+        for offset_x, offset_y in offsets:
+            group.add(Rectangle(
+                texture=text_texture,
+                pos=(text_x + offset_x, text_y + offset_y),
+                size=(text_width, text_height)
+            ))
+
+        group.add(Color(0, 0, 0, 1))
+        group.add(Rectangle(
+            texture=text_texture,
+            pos=(text_x, text_y),
+            size=(text_width, text_height)
+        ))
+
+        self.canvas.before.add(group)
+        self.city_label_groups[fortress_name] = group
+
+    def draw_fortresses(self):
+        """Рисует крепости и подписи городов заново (при построении карты и изменении размера окна)."""
+        self.clear_widgets()
+        self.fortress_icon_widgets.clear()
+        self.fortress_data_for_canvas.clear()
+        self.city_label_groups.clear()  # canvas.before уже очищен в initialize_map
 
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT name, faction, coordinates FROM cities")
-            fortresses_data = cursor.fetchall()
+            map_index = get_map_index(self.conn)
+            fortresses_data = [(name, map_index.owner(name), map_index.coords[name])
+                               for name in map_index.city_names]
         except sqlite3.Error as e:
             print(f"[ERROR] Ошибка при загрузке данных о городах: {e}")
             return
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
 
         if not fortresses_data:
             print("[DEBUG] Нет данных о крепостях в базе данных.")
             return
 
-        # ← Список изменённых городов (ВНЕ основного цикла)
-        changed_cities = []
-
-        for row in fortresses_data:
-            fortress_name, kingdom, coords_str = row
-            try:
-                coords = ast.literal_eval(coords_str)
-                if len(coords) != 2:
-                    raise ValueError(f"Координаты должны быть в формате [x, y], получено: {coords}")
-            except Exception as e:
-                print(f"[ERROR] Ошибка разбора координат для '{fortress_name}': {e}")
-                continue
-
-            fort_x, fort_y = coords
+        for fortress_name, kingdom, (fort_x, fort_y) in fortresses_data:
             drawn_x = fort_x * self.map_scale + self.map_pos[0]
             drawn_y = fort_y * self.map_scale + self.map_pos[1]
-
-            # --- Проверка изменения фракции ---
-            previous_faction = self.previous_city_factions.get(fortress_name)
-            image_path = faction_images.get(kingdom, 'files/buildings/default.png')
-
-            if not os.path.exists(image_path):
-                image_path = 'files/buildings/default.png'
-
-            # ← Если фракция изменилась — добавляем в список
-            if previous_faction is not None and previous_faction != kingdom:
-                changed_cities.append({
-                    'name': fortress_name,
-                    'new_image': image_path,
-                    'pos': (drawn_x, drawn_y),
-                    'old_faction': previous_faction,
-                    'new_faction': kingdom
-                })
-
             self.previous_city_factions[fortress_name] = kingdom
 
             # --- Создание виджета иконки ---
             icon_widget = Image(
-                source=image_path,
+                source=self._fortress_image(kingdom),
                 size=(77, 77),
                 pos=(drawn_x, drawn_y),
                 allow_stretch=True,
@@ -754,54 +719,9 @@ class MapWidget(Widget):
             self.fortress_icon_widgets[fortress_name] = icon_widget
 
             # --- Сохраняем данные для кликов ---
-            self.fortress_data_for_canvas.append((fortress_name, kingdom, fort_x, fort_y, drawn_x, drawn_y))  # ← Исправлена скобка
-
-            # --- Рисуем название города с обводкой ---
-            display_name = f"{fortress_name}({kingdom})"
-
-            label = CoreLabel(text=display_name, font_size=25, color=(1, 1, 1, 1))
-            label.refresh()
-            text_texture = label.texture
-            text_width, text_height = text_texture.size
-
-            text_x = drawn_x + (40 - text_width) / 2
-            text_y = drawn_y - text_height - 5
-
-            outline_width = 2
-
-            with self.canvas:  # ← Исправлены отступы
-                Color(1, 1, 1, 1)
-                offsets = [
-                    (-outline_width, -outline_width),
-                    (-outline_width, 0),
-                    (-outline_width, outline_width),
-                    (0, outline_width),
-                    (outline_width, outline_width),
-                    (outline_width, 0),
-                    (outline_width, -outline_width),
-                    (0, -outline_width)
-                ]
-
-                for offset_x, offset_y in offsets:
-                    Rectangle(
-                        texture=text_texture,
-                        pos=(text_x + offset_x, text_y + offset_y),
-                        size=(text_width, text_height)
-                    )
+            self.fortress_data_for_canvas.append((fortress_name, kingdom, fort_x, fort_y, drawn_x, drawn_y))
 
-                Color(0, 0, 0, 1)
-                Rectangle(
-                    texture=text_texture,
-                    pos=(text_x, text_y),
-                    size=(text_width, text_height)
-                )
-
-        # ← Запуск анимаций (ВНЕ цикла по городам)
-        for city_data in changed_cities:
-            Clock.schedule_once(
-                lambda dt, data=city_data: self.animate_city_capture(data),
-                0.05
-            )
+            self._draw_city_label(fortress_name, kingdom, drawn_x, drawn_y)
 
         # --- Обновляем icon_coordinates в БД ---
         try:
@@ -817,6 +737,49 @@ class MapWidget(Widget):
         finally:
             cursor2.close()
 
+    def refresh_city_owners(self, dt=None):
+        """
+        Обновляет только города, сменившие владельца: иконку, подпись и
+        данные для кликов, затем запускает анимацию захвата.
+        Вызывается по оповещению invalidate_city_owners.
+        """
+        try:
+            map_index = get_map_index(self.conn)
+        except sqlite3.Error as e:
+            print(f"[ERROR] Ошибка при загрузке данных о городах: {e}")
+            return
+
+        # ← Список изменённых городов
+        changed_cities = []
+
+        for i, (fortress_name, kingdom, fort_x, fort_y, drawn_x, drawn_y) in enumerate(self.fortress_data_for_canvas):
+            new_kingdom = map_index.owner(fortress_name)
+            if new_kingdom == kingdom:
+                continue
+
+            image_path = self._fortress_image(new_kingdom)
+            icon_widget = self.fortress_icon_widgets.get(fortress_name)
+            if icon_widget is not None:
+                icon_widget.source = image_path
+            self._draw_city_label(fortress_name, new_kingdom, drawn_x, drawn_y)
+            self.fortress_data_for_canvas[i] = (fortress_name, new_kingdom, fort_x, fort_y, drawn_x, drawn_y)
+            self.previous_city_factions[fortress_name] = new_kingdom
+
+            changed_cities.append({
+                'name': fortress_name,
+                'new_image': image_path,
+                'pos': (drawn_x, drawn_y),
+                'old_faction': kingdom,
+                'new_faction': new_kingdom
+            })
+
+        # ← Запуск анимаций
+        for city_data in changed_cities:
+            Clock.schedule_once(
+                lambda dt, data=city_data: self.animate_city_capture(data),
+                0.05
+            )
+
     def animate_city_capture(self, city_data):
         """Анимация вспышки при захвате города."""
         icon_widget = self.fortress_icon_widgets.get(city_data['name'])
@@ -938,49 +901,32 @@ class MapWidget(Widget):
         return [x, y]
 
     def draw_roads(self):
-        """Рисует дороги между ближайшими городами - вызывается один раз."""
-        # Используем self.canvas.after или self.canvas, но не очищаем его в update_cities
-        # Для простоты оставим как есть, но будем вызывать только один раз
-        self.canvas.after.clear()  # Очищаем after только один раз
+        """Рисует дороги между ближайшими городами (при построении карты и изменении размера окна)."""
+        self.canvas.after.clear()
 
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT name, coordinates FROM cities")
-            fortresses_data = cursor.fetchall()
+            # Пары городов ближе 280 по манхэттену берутся из индекса карты
+            road_segments = get_map_index(self.conn).road_segments()
         except sqlite3.Error as e:
             print(f"Ошибка при загрузке данных о городах для дорог: {e}")
             return
 
-        cities = []
-        for fortress_name, coords_str in fortresses_data:
-            try:
-                coords = ast.literal_eval(coords_str)
-                if len(coords) == 2:
-                    cities.append((fortress_name, coords))
-            except (ValueError, SyntaxError) as e:
-                print(f"Ошибка при разборе координат города '{fortress_name}' для дорог: {e}")
-                continue
-
         with self.canvas.after:
             Color(0.5, 0.5, 0.5, 1)  # Серый цвет для дорог
 
-            for i in range(len(cities)):
-                for j in range(i + 1, len(cities)):
-                    source_name, source_coords = cities[i]
-                    dest_name, dest_coords = cities[j]
-
-                    total_diff = self.calculate_manhattan_distance(source_coords, dest_coords)
+            for source_coords, dest_coords in road_segments:
+                drawn_x1 = source_coords[0] * self.map_scale + self.map_pos[0]
+                drawn_y1 = source_coords[1] * self.map_scale + self.map_pos[1]
+                drawn_x2 = dest_coords[0] * self.map_scale + self.map_pos[0]
+                drawn_y2 = dest_coords[1] * self.map_scale + self.map_pos[1]
 
-                    if total_diff < 280:
-                        drawn_x1 = source_coords[0] * self.map_scale + self.map_pos[0]
-                        drawn_y1 = source_coords[1] * self.map_scale + self.map_pos[1]
-                        drawn_x2 = dest_coords[0] * self.map_scale + self.map_pos[0]
-                        drawn_y2 = dest_coords[1] * self.map_scale + self.map_pos[1]
-
-                        Line(points=[drawn_x1, drawn_y1, drawn_x2, drawn_y2], width=1)
+                Line(points=[drawn_x1, drawn_y1, drawn_x2, drawn_y2], width=1)
 
     def calculate_manhattan_distance(self, source_coords, destination_coords):
-        """Вычисляет манхэттенское расстояние между точками"""
+        """
+        Вычисляет манхэттенское расстояние между точками.
+        Для расстояний между городами используйте get_map_index(conn).manhattan().
+        """
         return abs(source_coords[0] - destination_coords[0]) + abs(source_coords[1] - destination_coords[1])
 
     def check_fortress_click(self, touch):
@@ -996,6 +942,7 @@ class MapWidget(Widget):
                 save_last_clicked_city(self.conn, fortress_name)
 
                 # Создаём popup и передаём координаты как tuple (как в старой версии)
+                from ui import FortressInfoPopup
                 popup = FortressInfoPopup(
                     ai_fraction=kingdom,
                     city_coords=city_coords_for_popup,
@@ -1121,6 +1068,7 @@ class KingdomSelectionWidget(MDFloatLayout):
             self.panel_y_offset = 0.0
 
         # ======== ФОН ВИДЕО ========
+        from kivy.uix.video import Video
         self.bg_video = Video(
             source='files/menu/choice.mp4',
             state='play',
@@ -1835,6 +1783,7 @@ class KingdomSelectionWidget(MDFloatLayout):
         overlay = MDFloatLayout(size=Window.size)
         self.overlay = overlay
         self.add_widget(overlay)
+        from kivy.uix.video import Video
         self.start_video = Video(
             source='files/menu/start_game.mp4',
             state='play',
@@ -1870,14 +1819,14 @@ class KingdomSelectionWidget(MDFloatLayout):
             from kivy.app import App
             app = App.get_running_app()
             selected_kingdom = app.selected_kingdom
+            # Экран игры загружается только при входе в игру
+            from game_process import GameScreen
             MapWidget = globals().get('MapWidget')
-            GameScreen = globals().get('GameScreen')
-            if not MapWidget or not GameScreen:
+            if not MapWidget:
                 # Попробуем импортировать из текущего модуля
                 import sys
                 current_module = sys.modules[__name__]
                 MapWidget = getattr(current_module, 'MapWidget', None)
-                GameScreen = getattr(current_module, 'GameScreen', None)
             if MapWidget and GameScreen:
                 # Создаем виджет карты
                 map_widget = MapWidget(selected_kingdom=selected_kingdom, player_kingdom=selected_kingdom,
@@ -3723,7 +3672,7 @@ class Lerdon(MDApp):
         self.selected_kingdom = None  # Атрибут для хранения выбранного королевства
 
         # Инициализация соединения с базой данных
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, factory=UnitOfWorkConnection)
         self.conn.row_factory = sqlite3.Row
         self.conn.execute("PRAGMA journal_mode=WAL;")
         self.conn.execute("PRAGMA synchronous=NORMAL;")
@@ -3736,17 +3685,8 @@ class Lerdon(MDApp):
 
     def restart_app(self):
         """Перезапуск игры — очистка БД, восстановление бэкапа, пересоздание интерфейса."""
-        try:
-            # Очистка таблиц
-            clear_tables(self.conn)
-            self.conn.commit()
-            print("Таблицы успешно очищены.")
-        except sqlite3.Error as e:
-            print(f"Ошибка при очистке таблиц: {e}")
-            self.conn.rollback()
-
-        # Восстановление из бэкапа
-        restore_from_backup(self.conn)
+        # Очистка таблиц и восстановление стандартных данных из шаблона
+        reset_game_data(self.conn)
 
         # Сброс состояния приложения
         self.selected_kingdom = None
@@ -0,0 +1,346 @@
+"""
+Индекс карты: координаты городов, матрица расстояний и граф дорог.
+
+Строится один раз на партию из таблиц cities и roads, после чего ИИ и
+MapWidget получают расстояния, ближайшие города и число переходов по
+дорогам из памяти, без повторного чтения cities и разбора строк "[x, y]".
+
+Кратчайшие пути по дорогам между всеми парами городов (число переходов,
+длина пути и следующий город на пути) считаются один раз при генерации
+карты (build_path_table в generate_map.save_to_database) и хранятся в
+сохранении, в таблице road_paths. Индекс только читает БД: для старых
+сохранений без этой таблицы пути считаются в памяти и никуда не пишутся.
+
+Геометрия карты не меняется до генерации новой карты
+(invalidate_map_index), а владельцы городов перечитываются одним запросом
+после смены владельца (invalidate_city_owners). О смене владельца
+оповещаются подписчики add_city_owner_listener (например, MapWidget
+перерисовывает только изменившиеся города).
+
+Индекс свой у каждого потока: ход ИИ на снимках БД (parallel_ai) строит
+индекс для снимка и не вытесняет индекс основного соединения. Смена
+владельца на снимке не оповещает подписчиков — основная карта не менялась.
+"""
+
+import ast
+import heapq
+import math
+import threading
+from collections import deque
+
+# Порог расстояния, в пределах которого города считаются соседними на карте
+NEIGHBOUR_DISTANCE = 280
+
+PATH_TABLE = 'road_paths'
+
+
+def _road_graph(cursor):
+    """Граф дорог по id городов: {id: [id соседей]} и координаты {id: (x, y)}."""
+    cursor.execute("SELECT id, coordinates FROM cities ORDER BY rowid")
+    coords = {}
+    for city_id, coords_str in cursor.fetchall():
+        try:
+            point = ast.literal_eval(coords_str)
+        except (ValueError, SyntaxError):
+            continue
+        if len(point) == 2:
+            coords[city_id] = (point[0], point[1])
+
+    graph = {city_id: [] for city_id in coords}
+    cursor.execute("SELECT city1, city2 FROM roads ORDER BY id")
+    for city1, city2 in cursor.fetchall():
+        if city1 in graph and city2 in graph:
+            graph[city1].append(city2)
+            graph[city2].append(city1)
+    return graph, coords
+
+
+def _paths_from(source, graph, coords):
+    """
+    Пути из source во все достижимые города.
+    :return: {город: (число переходов, длина пути, следующий город после source)}.
+    """
+    # Число переходов и следующий город — обход в ширину
+    hops = {source: 0}
+    first_step = {source: source}
+    queue = deque([source])
+    while queue:
+        city = queue.popleft()
+        for neighbour in graph[city]:
+            if neighbour not in hops:
+                hops[neighbour] = hops[city] + 1
+                first_step[neighbour] = neighbour if city == source else first_step[city]
+                queue.append(neighbour)
+
+    # Длина пути по дорогам — алгоритм Дейкстры
+    lengths = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        length, city = heapq.heappop(heap)
+        if length > lengths[city]:
+            continue
+        x1, y1 = coords[city]
+        for neighbour in graph[city]:
+            x2, y2 = coords[neighbour]
+            candidate = length + math.hypot(x1 - x2, y1 - y2)
+            if candidate < lengths.get(neighbour, math.inf):
+                lengths[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+
+    return {city: (hops[city], round(lengths[city], 2), first_step[city]) for city in hops}
+
+
+def build_path_table(conn):
+    """
+    Пересчитывает таблицу road_paths по текущим cities и roads. Вызывается
+    при генерации карты: дороги меняются только вместе с картой.
+    :return: Число сохранённых пар городов.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PATH_TABLE} (
+            source INTEGER NOT NULL,
+            target INTEGER NOT NULL,
+            hops INTEGER NOT NULL,
+            length REAL NOT NULL,
+            next_city INTEGER NOT NULL,
+            PRIMARY KEY (source, target)
+        )
+    """)
+    cursor.execute(f"DELETE FROM {PATH_TABLE}")
+
+    graph, coords = _road_graph(cursor)
+    rows = []
+    for source in graph:
+        for target, (hops, length, next_city) in _paths_from(source, graph, coords).items():
+            rows.append((source, target, hops, length, next_city))
+    cursor.executemany(f"INSERT INTO {PATH_TABLE} (source, target, hops, length, next_city) "
+                       f"VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    return len(rows)
+
+
+class MapIndex:
+    def __init__(self, conn):
+        """
+        :param conn: Соединение с базой данных.
+        """
+        self.conn = conn
+        self.city_names = []      # Города в порядке строк таблицы cities
+        self.coords = {}          # {name: (x, y)}
+        self.owners = {}          # {name: faction}
+        self.road_graph = {}      # {name: [соседние по дорогам города]} из таблицы roads
+        self._position = {}       # {name: индекс в city_names}
+        self._manhattan = []      # Матрица манхэттенских расстояний
+        self._euclidean = []      # Матрица евклидовых расстояний
+        self._owners_stale = False
+        self._paths = {}          # {(откуда, куда): (число переходов, длина пути, следующий город)}
+        self._road_segments = {}  # {порог: [(coords1, coords2), ...]}
+        self._load()
+
+    def _load(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, name, coordinates, faction FROM cities ORDER BY rowid")
+        names_by_id = {}
+        for city_id, name, coords_str, faction in cursor.fetchall():
+            try:
+                coords = ast.literal_eval(coords_str)
+            except (ValueError, SyntaxError) as e:
+                print(f"[MAP] Ошибка при разборе координат города '{name}': {e}")
+                continue
+            if len(coords) != 2:
+                continue
+            self._position[name] = len(self.city_names)
+            self.city_names.append(name)
+            self.coords[name] = (coords[0], coords[1])
+            self.owners[name] = faction
+            self.road_graph[name] = []
+            names_by_id[city_id] = name
+
+        points = [self.coords[name] for name in self.city_names]
+        self._manhattan = [[abs(x1 - x2) + abs(y1 - y2) for x2, y2 in points] for x1, y1 in points]
+        self._euclidean = [[((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5 for x2, y2 in points] for x1, y1 in points]
+
+        cursor.execute("SELECT city1, city2 FROM roads")
+        for city1, city2 in cursor.fetchall():
+            name1, name2 = names_by_id.get(city1), names_by_id.get(city2)
+            if name1 is None or name2 is None:
+                continue
+            self.road_graph[name1].append(name2)
+            self.road_graph[name2].append(name1)
+
+        self._load_paths(cursor, names_by_id)
+
+    def _load_paths(self, cursor, names_by_id):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (PATH_TABLE,))
+        rows = []
+        if cursor.fetchone() is not None:
+            cursor.execute(f"SELECT source, target, hops, length, next_city FROM {PATH_TABLE}")
+            rows = cursor.fetchall()
+        if not rows and self.city_names:
+            # Сохранение до появления road_paths: таблицу заполнит следующая генерация карты
+            print("[MAP] Таблица путей по дорогам отсутствует, пути считаются в памяти")
+            for source in self.city_names:
+                for target, path in _paths_from(source, self.road_graph, self.coords).items():
+                    self._paths[(source, target)] = path
+            return
+
+        for source, target, hops, length, next_city in rows:
+            name1, name2 = names_by_id.get(source), names_by_id.get(target)
+            if name1 is None or name2 is None:
+                continue
+            self._paths[(name1, name2)] = (hops, length, names_by_id.get(next_city))
+
+    # --- Владельцы городов ---
+    def invalidate_owners(self):
+        self._owners_stale = True
+
+    def _refresh_owners(self):
+        if not self._owners_stale:
+            return
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name, faction FROM cities")
+        for name, faction in cursor.fetchall():
+            if name in self.owners:
+                self.owners[name] = faction
+        self._owners_stale = False
+
+    def owner(self, city_name):
+        self._refresh_owners()
+        return self.owners.get(city_name)
+
+    def cities_of(self, faction):
+        """Города фракции в порядке строк таблицы cities."""
+        self._refresh_owners()
+        return [name for name in self.city_names if self.owners[name] == faction]
+
+    # --- Расстояния ---
+    def manhattan(self, city1, city2):
+        return self._manhattan[self._position[city1]][self._position[city2]]
+
+    def euclidean(self, city1, city2):
+        return self._euclidean[self._position[city1]][self._position[city2]]
+
+    def pairs_within(self, from_faction, to_faction, max_distance=NEIGHBOUR_DISTANCE,
+                     metric='manhattan', inclusive=False):
+        """
+        Пары (свой город, город to_faction), расстояние между которыми меньше
+        max_distance (или не больше при inclusive=True). Порядок пар совпадает
+        с вложенным перебором городов по строкам таблицы cities.
+        """
+        matrix = self._euclidean if metric == 'euclidean' else self._manhattan
+        targets = [(name, self._position[name]) for name in self.cities_of(to_faction)]
+        for our_city in self.cities_of(from_faction):
+            row = matrix[self._position[our_city]]
+            for target_city, j in targets:
+                distance = row[j]
+                if distance < max_distance or (inclusive and distance == max_distance):
+                    yield our_city, target_city
+
+    def nearest_city(self, from_faction, to_faction, metric='manhattan'):
+        """
+        Ближайший к владениям from_faction город фракции to_faction.
+        :return: (имя города, расстояние) или (None, None).
+        """
+        matrix = self._euclidean if metric == 'euclidean' else self._manhattan
+        best_city, best_distance = None, None
+        targets = [(name, self._position[name]) for name in self.cities_of(to_faction)]
+        for our_city in self.cities_of(from_faction):
+            row = matrix[self._position[our_city]]
+            for target_city, j in targets:
+                if best_distance is None or row[j] < best_distance:
+                    best_city, best_distance = target_city, row[j]
+        return best_city, best_distance
+
+    def road_segments(self, max_distance=NEIGHBOUR_DISTANCE):
+        """
+        Пары координат городов ближе max_distance по манхэттену — линии, которые
+        MapWidget рисует как дороги. Это правило близости, а не таблица roads:
+        настоящие дороги — в road_graph.
+        """
+        if max_distance not in self._road_segments:
+            segments = []
+            for i, name1 in enumerate(self.city_names):
+                for j in range(i + 1, len(self.city_names)):
+                    if self._manhattan[i][j] < max_distance:
+                        segments.append((self.coords[name1], self.coords[self.city_names[j]]))
+            self._road_segments[max_distance] = segments
+        return self._road_segments[max_distance]
+
+    # --- Граф дорог ---
+    def hop_distance(self, city1, city2):
+        """Число переходов по дорогам между городами или None, если пути нет."""
+        path = self._paths.get((city1, city2))
+        return path[0] if path else None
+
+    def road_distance(self, city1, city2):
+        """Длина кратчайшего пути по дорогам или None, если пути нет."""
+        path = self._paths.get((city1, city2))
+        return path[1] if path else None
+
+    def reachable(self, city1, city2, max_hops=None):
+        """Есть ли путь по дорогам (не длиннее max_hops переходов)."""
+        path = self._paths.get((city1, city2))
+        return path is not None and (max_hops is None or path[0] <= max_hops)
+
+    def next_city(self, city1, city2):
+        """Следующий город на кратчайшем по числу переходов пути или None."""
+        path = self._paths.get((city1, city2))
+        return path[2] if path else None
+
+    def shortest_path(self, city1, city2):
+        """Кратчайший по числу переходов путь [city1, ..., city2] или None."""
+        if (city1, city2) not in self._paths:
+            return None
+        path = [city1]
+        while path[-1] != city2:
+            path.append(self._paths[(path[-1], city2)][2])
+        return path
+
+
+_map_index = threading.local()  # Индекс своего потока: index и generation
+_map_index_generation = 0
+_owner_listeners = []
+
+
+def get_map_index(conn):
+    """
+    Возвращает индекс карты для соединения, строит его при первом обращении.
+    """
+    index = getattr(_map_index, 'index', None)
+    if index is None or index.conn is not conn or _map_index.generation != _map_index_generation:
+        generation = _map_index_generation
+        index = _map_index.index = MapIndex(conn)
+        _map_index.generation = generation
+    return index
+
+
+def invalidate_map_index():
+    """Сбрасывает индекс целиком (новая карта) во всех потоках."""
+    global _map_index_generation
+    _map_index_generation += 1
+
+
+def invalidate_city_owners():
+    """Отмечает, что владелец какого-то города сменился, и оповещает подписчиков."""
+    index = getattr(_map_index, 'index', None)
+    if index is not None:
+        index.invalidate_owners()
+    if threading.current_thread() is not threading.main_thread():
+        return  # Ход ИИ на снимке БД: основная карта не менялась
+    for callback in list(_owner_listeners):
+        try:
+            callback()
+        except Exception as e:
+            print(f"[MAP] Ошибка в обработчике смены владельца города: {e}")
+
+
+def add_city_owner_listener(callback):
+    """Подписывает callback() на смену владельцев городов."""
+    if callback not in _owner_listeners:
+        _owner_listeners.append(callback)
+
+
+def remove_city_owner_listener(callback):
+    if callback in _owner_listeners:
+        _owner_listeners.remove(callback)
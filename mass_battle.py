@@ -0,0 +1,203 @@
+"""
+Быстрый расчёт массовых сражений.
+
+Альтернатива циклу боя в fight.fight(): армии упаковываются в параллельные
+массивы-столбцы (количество, атака, защита, живучесть, класс),
+сила каждого отряда считается один раз, а цепочка боя проходит по
+обороняющимся одним указателем без копирования словарей на каждую стычку.
+
+Модуль ничего не пишет в БД и не трогает входные армии, поэтому ИИ может
+дёшево прогонять и оценивать варианты атаки. Результат повторяет структуры
+final_report_* из fight().
+"""
+
+from fight import (
+    merge_units,
+    calculate_unit_power,
+    buildings_destroyed_by_damage,
+)
+
+
+def _parse_unit_class(value):
+    """Класс юнита из '3', 3 или '3 класс' -> 3."""
+    return int(str(value).split()[0])
+
+
+def pack_army(army):
+    """
+    Упаковывает армию в параллельные массивы в порядке, в котором fight()
+    выставляет отряды в бой: бонусы героев 2-3 класса наложены на базовые
+    юниты, отряды отсортированы по (класс, -урон).
+
+    :param army: Список юнитов в формате fight() (с units_stats).
+    :return: Словарь столбцов: name, image, count, attack, defense, durability,
+             unit_class, attack_power, defense_power.
+    """
+    merged = merge_units(army)
+
+    units = []
+    for u in merged:
+        stats = u.get('units_stats', {})
+        unit_class = _parse_unit_class(stats.get('Класс юнита', '1'))
+        if unit_class not in (1, 2, 3, 4):
+            # fight() отбрасывает юниты с неизвестным классом
+            continue
+        units.append((u, unit_class))
+
+    # Бонусы героев 2 и 3 класса для базовых юнитов
+    bonus_attack = bonus_defense = bonus_health = 0
+    for u, unit_class in units:
+        if unit_class in (2, 3):
+            stats = u['units_stats']
+            bonus_attack += stats.get('Урон', 0)
+            bonus_defense += stats.get('Защита', 0)
+            bonus_health += stats.get('Живучесть', 0)
+
+    rows = []
+    for order in (1, 2, 3, 4):
+        for u, unit_class in units:
+            if unit_class != order:
+                continue
+            stats = u['units_stats']
+            attack = stats['Урон']
+            defense = stats['Защита']
+            durability = stats['Живучесть']
+            if unit_class == 1:
+                attack += bonus_attack
+                defense += bonus_defense
+                durability += bonus_health
+            rows.append((u, unit_class, attack, defense, durability))
+
+    rows.sort(key=lambda r: (r[1], -int(r[2])))
+
+    columns = {
+        'name': [], 'image': [], 'count': [],
+        'attack': [], 'defense': [], 'durability': [],
+        'unit_class': [], 'attack_power': [], 'defense_power': [],
+    }
+    for u, unit_class, attack, defense, durability in rows:
+        boosted = {
+            'unit_name': u['unit_name'],
+            'units_stats': {'Урон': attack, 'Защита': defense, 'Живучесть': durability,
+                            'Класс юнита': str(unit_class)},
+        }
+        columns['name'].append(u['unit_name'])
+        columns['image'].append(u.get('unit_image', ''))
+        columns['count'].append(u['unit_count'])
+        columns['attack'].append(attack)
+        columns['defense'].append(defense)
+        columns['durability'].append(durability)
+        columns['unit_class'].append(unit_class)
+        # Сила считается так же, как в battle_chain (без соединения с БД)
+        columns['attack_power'].append(calculate_unit_power(boosted, is_attacking=True))
+        defense_power = calculate_unit_power(boosted, is_attacking=False)
+        columns['defense_power'].append(defense_power if defense_power > 0 else 1)  # защита от деления на 0
+    return columns
+
+
+def resolve_packed(attackers, defenders):
+    """
+    Проводит цепочку боя над упакованными армиями.
+    Погибшие обороняющиеся всегда образуют префикс списка, поэтому вместо
+    повторного прохода от начала хватает одного указателя на первого живого.
+
+    :param attackers: Столбцы атакующей армии (из pack_army).
+    :param defenders: Столбцы обороняющейся армии (из pack_army).
+    :return: (итоговые количества атакующих, итоговые количества обороняющихся,
+              число разрушенных зданий).
+    """
+    atk_count = list(attackers['count'])
+    def_count = list(defenders['count'])
+    atk_power = attackers['attack_power']
+    atk_class = attackers['unit_class']
+    def_power = defenders['defense_power']
+    def_class = defenders['unit_class']
+
+    buildings_destroyed = 0
+    first_alive = 0
+    total_defenders = len(def_count)
+
+    for a in range(len(atk_count)):
+        while first_alive < total_defenders and def_count[first_alive] <= 0:
+            first_alive += 1
+
+        d = first_alive
+        while d < total_defenders and atk_count[a] > 0:
+            if def_count[d] <= 0:
+                d += 1
+                continue
+
+            total_attack = atk_power[a] * atk_count[a]
+            total_defense = def_power[d] * def_count[d]
+            buildings_destroyed += buildings_destroyed_by_damage(total_attack)
+
+            if total_attack > total_defense:
+                remaining_power = total_attack - total_defense
+                if atk_class[a] >= 2:
+                    atk_count[a] = 1 if remaining_power >= 1 else 0
+                else:
+                    atk_count[a] = max(int(remaining_power // atk_power[a]), 0)
+                def_count[d] = 0
+                d += 1
+            else:
+                remaining_power = total_defense - total_attack
+                if def_class[d] >= 2:
+                    def_count[d] = 1 if remaining_power >= 1 else 0
+                else:
+                    def_count[d] = max(int(remaining_power // def_power[d]), 0)
+                atk_count[a] = 0
+                break
+
+    return atk_count, def_count, buildings_destroyed
+
+
+def _build_report(columns, final_counts):
+    return [{
+        'unit_name': name,
+        'initial_count': initial,
+        'unit_count': final,
+        'killed_count': initial - final
+    } for name, initial, final in zip(columns['name'], columns['count'], final_counts)]
+
+
+def resolve_mass_battle(attacking_army, defending_army):
+    """
+    Рассчитывает исход боя без записи в БД и без изменения входных армий.
+
+    :param attacking_army: Атакующая армия в формате fight().
+    :param defending_army: Обороняющаяся армия в формате fight().
+    :return: Словарь с ключами winner, attacking_losses, defending_losses,
+             attacking_units, defending_units (как в fight()) и buildings_destroyed.
+    """
+    attackers = pack_army(attacking_army)
+    defenders = pack_army(defending_army)
+    atk_final, def_final, buildings_destroyed = resolve_packed(attackers, defenders)
+
+    final_report_attacking = _build_report(attackers, atk_final)
+    final_report_defending = _build_report(defenders, def_final)
+
+    winner = 'attacking' if any(c > 0 for c in atk_final) else 'defending'
+    return {
+        "winner": winner,
+        "attacking_losses": sum(u['killed_count'] for u in final_report_attacking),
+        "defending_losses": sum(u['killed_count'] for u in final_report_defending),
+        "attacking_units": final_report_attacking,
+        "defending_units": final_report_defending,
+        "buildings_destroyed": buildings_destroyed,
+    }
+
+
+def score_attack(attacking_army, defending_army):
+    """
+    Оценка варианта атаки для ИИ: при победе — доля выживших атакующих,
+    при поражении — доля уничтоженных защитников минус 1.
+
+    :return: Победа — число в (0.0, 1.0], поражение — в [-1.0, 0.0]; больше — выгоднее.
+    """
+    result = resolve_mass_battle(attacking_army, defending_army)
+    if result['winner'] == 'attacking':
+        initial = sum(u['initial_count'] for u in result['attacking_units']) or 1
+        survived = sum(u['unit_count'] for u in result['attacking_units'])
+        return survived / initial
+    initial = sum(u['initial_count'] for u in result['defending_units']) or 1
+    return -1.0 + result['defending_losses'] / initial
@@ -491,7 +491,7 @@ def show_event_result_popup(message):
 
 from nobles_generator import (
     get_all_nobles,
-    update_noble_loyalty_for_event,
+    update_nobles_loyalty_for_event,
     attempt_secret_service_action,
     get_player_faction,
     get_noble_traits,
@@ -1096,12 +1096,7 @@ def show_event_popup(conn, player_faction, season_index, refresh_callback, cash_
         success = cash_player.deduct_resources(cost)
         if success:
             try:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM nobles WHERE status = 'active'")
-                active_nobles = cursor.fetchall()
-                for noble_row in active_nobles:
-                    noble_id = noble_row[0]
-                    update_noble_loyalty_for_event(conn, noble_id, player_faction, event_type, event_season)
+                update_nobles_loyalty_for_event(conn, player_faction, event_type, event_season)
                 # Тост-уведомление (быстрое)
                 show_toast_notification("Мероприятие проведено!", is_success=True, duration=0.4)
                 if callable(refresh_callback):
@@ -150,6 +150,61 @@ def get_noble_traits(ideology_str):
     else: # Простая идеология
         return {'type': 'ideology', 'value': ideology_str}
 
+def load_nobles_context(conn):
+    """
+    Загружает один раз на ход всё, что нужно для расчёта лояльности дворян:
+    фракцию и идеологию игрока и отношения игрока со всеми фракциями.
+    """
+    player_faction = get_player_faction(conn)
+    player_ideology = get_faction_ideology(conn, player_faction) if player_faction else 'Борьба'
+
+    return {
+        'player_faction': player_faction,
+        'player_ideology': player_ideology,
+        'relations': _load_relations(conn, player_faction) if player_faction else {},
+    }
+
+def _load_relations(conn, faction):
+    """Отношения фракции со всеми фракциями одним запросом: {фракция: отношение}."""
+    relations = {}
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT faction1, faction2, relationship FROM diplomacies
+        WHERE faction1 = ? OR faction2 = ?
+    """, (faction, faction))
+    for faction1, faction2, relationship in cursor.fetchall():
+        other = faction2 if faction1 == faction else faction1
+        # Как и в get_diplomacy_relation, берётся первая найденная запись
+        relations.setdefault(other, relationship)
+    return relations
+
+def _context_for_faction(conn, faction, context=None):
+    """
+    Контекст с отношениями фракции faction (от её имени проводится мероприятие).
+    Если контекст загружен для другой фракции, её отношения читаются одним запросом.
+    """
+    context = context or load_nobles_context(conn)
+    if faction != context['player_faction']:
+        context = dict(context, relations=_load_relations(conn, faction))
+    return context
+
+def _context_relation(context, faction):
+    return context['relations'].get(faction, 'нейтралитет')
+
+def _load_active_nobles(conn, columns):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {columns} FROM nobles WHERE status = 'active'")
+    return cursor.fetchall()
+
+def _save_loyalty(conn, rows, with_history=False):
+    """Сохраняет рассчитанные значения одним executemany и одним commit."""
+    cursor = conn.cursor()
+    if with_history:
+        cursor.executemany("UPDATE nobles SET loyalty = ?, attendance_history = ? WHERE id = ?", rows)
+    else:
+        cursor.executemany("UPDATE nobles SET loyalty = ? WHERE id = ?", rows)
+    conn.commit()
+
 def record_coup_attempt(conn, is_successful):
     """
     Записывает результат попытки переворота в таблицу coup_attempts.
@@ -254,13 +309,10 @@ def generate_initial_nobles(conn):
 
 def decrease_loyalty_over_time(conn):
     """Снижение лояльности всех дворян на 3% за ход, с учетом идеологии."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, loyalty, ideology FROM nobles WHERE status = 'active'")
-    nobles = cursor.fetchall()
-
-    player_ideology = get_player_ideology(conn)
+    player_ideology = load_nobles_context(conn)['player_ideology']
 
-    for noble_id, current_loyalty, ideology_str in nobles:
+    updates = []
+    for noble_id, current_loyalty, ideology_str in _load_active_nobles(conn, "id, loyalty, ideology"):
         noble_traits = get_noble_traits(ideology_str)
 
         decrease = 3.0
@@ -268,23 +320,31 @@ def decrease_loyalty_over_time(conn):
         if noble_traits['type'] == 'ideology' and noble_traits['value'] == player_ideology:
             decrease = 0.5
 
-        new_loyalty = max(0.0, current_loyalty - decrease)
-        cursor.execute("UPDATE nobles SET loyalty = ? WHERE id = ?", (new_loyalty, noble_id))
+        updates.append((max(0.0, current_loyalty - decrease), noble_id))
 
-    conn.commit()
+    _save_loyalty(conn, updates)
 
-def calculate_attendance_probability(conn, noble_id, player_faction, event_type, event_season):
+def calculate_attendance_probability(conn, noble_id, player_faction, event_type, event_season, context=None):
     """
     Рассчитывает вероятность посещения мероприятия дворянином.
+    :param context: Результат load_nobles_context (загружается, если не передан).
     """
     cursor = conn.cursor()
-    cursor.execute("SELECT name, ideology, attendance_history FROM nobles WHERE id = ?", (noble_id,))
+    cursor.execute("SELECT ideology, attendance_history FROM nobles WHERE id = ?", (noble_id,))
     result = cursor.fetchone()
 
     if not result:
         return 1.0
 
-    name, ideology_str, attendance_history = result
+    ideology_str, attendance_history = result
+    return _attendance_probability(ideology_str, attendance_history, event_season,
+                                   _context_for_faction(conn, player_faction, context))
+
+def _attendance_probability(ideology_str, attendance_history, event_season, context):
+    """
+    Вероятность посещения мероприятия по уже загруженным данным дворянина.
+    :param context: Контекст с отношениями фракции, проводящей мероприятие (_context_for_faction).
+    """
     noble_traits = get_noble_traits(ideology_str)
 
     TURNS_PAID_EFFECT_LASTS = 4
@@ -302,8 +362,7 @@ def calculate_attendance_probability(conn, noble_id, player_faction, event_type,
         return 0.4
 
     if noble_traits['type'] == 'ideology':
-        player_ideology = get_player_ideology(conn)
-        if noble_traits['value'] != player_ideology:
+        if noble_traits['value'] != context['player_ideology']:
             probability *= 0.4
 
     if noble_traits['type'] == 'race_love':
@@ -313,27 +372,19 @@ def calculate_attendance_probability(conn, noble_id, player_faction, event_type,
         }
         event_race = season_to_race_map.get(event_season)
         if event_race and loved_race != event_race:
-            relation = get_diplomacy_relation(conn, player_faction, loved_race)
+            relation = _context_relation(context, loved_race)
             if relation in ['война', 'нейтралитет']:
                 probability *= 0.4
 
     final_prob = max(0.0, min(1.0, probability))
     return final_prob
 
-def update_noble_loyalty_for_event(conn, noble_id, player_faction, event_type, event_season):
+def _event_outcome(loyalty, history_str, ideology_str, event_season, context):
     """
-    Обновление лояльности конкретного советника после мероприятия.
+    Бросок посещения мероприятия для одного дворянина.
+    :return: (новая лояльность, новая история посещений).
     """
-    cursor = conn.cursor()
-    cursor.execute("SELECT loyalty, attendance_history, ideology FROM nobles WHERE id = ?", (noble_id,))
-    result = cursor.fetchone()
-
-    if not result:
-        return
-
-    loyalty, history_str, ideology_str = result
-
-    attendance_prob = calculate_attendance_probability(conn, noble_id, player_faction, event_type, event_season)
+    attendance_prob = _attendance_probability(ideology_str, history_str, event_season, context)
 
     attended = random.random() < attendance_prob
 
@@ -349,10 +400,37 @@ def update_noble_loyalty_for_event(conn, noble_id, player_faction, event_type, e
     history_list.append('1' if attended else '0')
     if len(history_list) > 10:
         history_list = history_list[-10:]
-    new_history_str = ','.join(history_list)
+    return new_loyalty, ','.join(history_list)
 
-    cursor.execute("UPDATE nobles SET loyalty = ?, attendance_history = ? WHERE id = ?", (new_loyalty, new_history_str, noble_id))
-    conn.commit()
+def update_noble_loyalty_for_event(conn, noble_id, player_faction, event_type, event_season):
+    """
+    Обновление лояльности конкретного советника после мероприятия.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT loyalty, attendance_history, ideology FROM nobles WHERE id = ?", (noble_id,))
+    result = cursor.fetchone()
+
+    if not result:
+        return
+
+    loyalty, history_str, ideology_str = result
+    new_loyalty, new_history_str = _event_outcome(loyalty, history_str, ideology_str, event_season,
+                                                  _context_for_faction(conn, player_faction))
+    _save_loyalty(conn, [(new_loyalty, new_history_str, noble_id)], with_history=True)
+
+def update_nobles_loyalty_for_event(conn, player_faction, event_type, event_season):
+    """
+    Обновление лояльности всех активных советников после мероприятия:
+    дворяне и контекст загружаются один раз, результат сохраняется одним commit.
+    """
+    context = _context_for_faction(conn, player_faction)
+    updates = []
+    for noble_id, loyalty, history_str, ideology_str in _load_active_nobles(
+            conn, "id, loyalty, attendance_history, ideology"):
+        new_loyalty, new_history_str = _event_outcome(loyalty, history_str, ideology_str, event_season,
+                                                      context)
+        updates.append((new_loyalty, new_history_str, noble_id))
+    _save_loyalty(conn, updates, with_history=True)
 
 def check_coup_attempts(conn):
     """
@@ -594,14 +672,11 @@ def get_noble_display_name_with_sympathies(noble):
 
 def update_loyalty_dynamically(conn):
     """Обновление лояльности всех дворян на основе их предпочтений."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, loyalty, ideology FROM nobles WHERE status = 'active'")
-    nobles = cursor.fetchall()
+    context = load_nobles_context(conn)
+    player_ideology = context['player_ideology']
 
-    player_faction = get_player_faction(conn)
-    player_ideology = get_player_ideology(conn)
-
-    for noble_id, current_loyalty, ideology_str in nobles:
+    updates = []
+    for noble_id, current_loyalty, ideology_str in _load_active_nobles(conn, "id, loyalty, ideology"):
         noble_traits = get_noble_traits(ideology_str)
         loyalty_change = 0
 
@@ -615,7 +690,7 @@ def update_loyalty_dynamically(conn):
 
         elif noble_traits['type'] == 'race_love':
             loved_race = noble_traits['value']
-            relation = get_diplomacy_relation(conn, player_faction, loved_race)
+            relation = _context_relation(context, loved_race)
             try:
                 if isinstance(relation, str) and relation.endswith('%'):
                     relation_value = int(relation.rstrip('%'))
@@ -632,10 +707,9 @@ def update_loyalty_dynamically(conn):
         elif noble_traits['type'] == 'greed':
             pass
 
-        new_loyalty = max(0.0, min(100.0, current_loyalty + loyalty_change))
-        cursor.execute("UPDATE nobles SET loyalty = ? WHERE id = ?", (new_loyalty, noble_id))
+        updates.append((max(0.0, min(100.0, current_loyalty + loyalty_change)), noble_id))
 
-    conn.commit()
+    _save_loyalty(conn, updates)
 
 def change_noble_priorities(conn):
     """Смена приоритетов дворян каждые 13 ходов"""
@@ -647,8 +721,7 @@ def change_noble_priorities(conn):
         new_priorities = list(range(len(noble_ids)))
         random.shuffle(new_priorities)
 
-        for i, noble_id in enumerate(noble_ids):
-            cursor.execute("UPDATE nobles SET priority = ? WHERE id = ?", (new_priorities[i], noble_id))
+        cursor.executemany("UPDATE nobles SET priority = ? WHERE id = ?", zip(new_priorities, noble_ids))
 
         conn.commit()
         print("Приоритеты дворян изменены.")
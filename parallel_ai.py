@@ -0,0 +1,266 @@
+"""
+Одновременное планирование хода фракций ИИ на снимках базы данных.
+
+Каждая фракция планирует ход в отдельном потоке на собственной копии БД
+в памяти (снимок состояния перед ходом ИИ). Это конкурентность, а не
+параллельность: make_turn — код на Python, и GIL выполняет потоки по
+очереди; перекрываются только запросы SQLite, на время которых модуль
+sqlite3 отпускает GIL. Пул процессов не используется: контроллеры держат
+соединения и ссылки на объекты игры, которые нельзя передать в другой
+процесс.
+
+Снимок берётся через Connection.serialize вместе с ещё не
+зафиксированными фазами хода, так что транзакция хода
+(db_manager.unit_of_work) не прерывается и сбой посреди хода по-прежнему
+откатывает его целиком. Без serialize (Python < 3.11) снимок внутри
+транзакции снять нельзя, и фракции ходят последовательно.
+
+Случайные решения каждой фракции берутся из её собственного генератора
+(AIController.rng) с зерном от хода и фракции, поэтому план не зависит от
+того, в каком порядке потоки получают управление.
+
+После планирования фракции по очереди, в порядке словаря ai_controllers
+(как и при обычном ходе), применяются к основному соединению:
+
+1. Если фракция изменила только «свои» строки (ресурсы, здания, гарнизоны
+   своих городов, экипировку своих героев, свои отношения и результаты),
+   и эти строки в основной БД с момента снимка никто не менял, разделы
+   переносятся в основную БД одной транзакцией.
+2. Иначе (план затронул города, дипломатию, чужие гарнизоны, торговлю
+   и т.п., или разделы фракции уже изменил ход предыдущей фракции) план
+   отбрасывается, состояние контроллера восстанавливается, и фракция
+   сразу ходит заново на основном соединении.
+
+На снимке контроллер работает в режиме планирования (AIController.planning):
+отчёты о битвах не показываются, а вызовы Clock откладываются и выполняются
+в основном потоке, только если план применён. При повторном ходе окна и
+вызовы появляются как обычно.
+"""
+
+import copy
+import os
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# Таблицы, изменения в которых можно переносить из снимка.
+# Значение — условие раздела, принадлежащего фракции (параметр — имя фракции).
+FACTION_PARTITIONS = {
+    'resources': "faction = ?",
+    'buildings': "faction = ?",
+    'garrisons': "city_name IN (SELECT name FROM cities WHERE faction = ?)",
+    'ai_hero_equipment': "faction_name = ?",
+    'results': "faction = ?",
+    'relations': "faction1 = ?",
+}
+
+# Служебные таблицы SQLite, которые не считаются изменениями плана
+_IGNORED_TABLES = {'sqlite_sequence'}
+
+# Атрибуты контроллера, которые не копируются при сохранении состояния
+_CONNECTION_ATTRS = ('db_connection', 'cursor', 'season_manager', 'world_state')
+
+
+def _snapshot_factory(conn):
+    """
+    Функция, создающая копию базы в памяти для одного потока планирования.
+    :return: Функция без аргументов или None, если снимок нельзя снять,
+             не зафиксировав открытую транзакцию.
+    """
+    if hasattr(conn, 'serialize'):
+        image = bytearray(conn.serialize())
+        # Байты 18-19 заголовка: 2 — журнал WAL. У копии в памяти нет файла журнала,
+        # поэтому она переводится в обычный режим
+        image[18] = image[19] = 1
+        image = bytes(image)
+
+        def make_snapshot():
+            snapshot = sqlite3.connect(':memory:', check_same_thread=False)
+            snapshot.deserialize(image)
+            snapshot.row_factory = conn.row_factory
+            return snapshot
+        return make_snapshot
+
+    # backup API не работает при открытой транзакции
+    if conn.in_transaction:
+        return None
+
+    def make_snapshot():
+        snapshot = sqlite3.connect(':memory:', check_same_thread=False)
+        conn.backup(snapshot)
+        snapshot.row_factory = conn.row_factory
+        return snapshot
+    return make_snapshot
+
+
+def _save_controller_state(controller):
+    return {key: copy.deepcopy(value) for key, value in vars(controller).items()
+            if key not in _CONNECTION_ATTRS}
+
+
+def _plan_faction_turn(controller, snapshot):
+    """
+    Выполняет ход фракции на снимке и собирает список изменённых таблиц.
+    :return: Множество таблиц, в которые план что-либо писал.
+    """
+    written_tables = set()
+
+    def authorizer(action, arg1, arg2, db_name, trigger):
+        if action in (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE):
+            if arg1 and arg1 not in _IGNORED_TABLES:
+                written_tables.add(arg1)
+        return sqlite3.SQLITE_OK
+
+    snapshot.set_authorizer(authorizer)
+    controller.db_connection = snapshot
+    controller.cursor = snapshot.cursor()
+    controller.planning = True
+    try:
+        controller.make_turn()
+    finally:
+        controller.planning = False
+    snapshot.commit()
+    snapshot.set_authorizer(None)
+    return written_tables
+
+
+def _rows(conn, table, where, params):
+    cursor = conn.execute(f"SELECT * FROM {table} WHERE {where}", params)
+    return sorted((tuple(row) for row in cursor.fetchall()), key=repr)
+
+
+def _is_local_plan(faction, written_tables, base, snapshot):
+    """
+    Проверяет, что план фракции изменил только её собственные разделы таблиц.
+    """
+    if not written_tables.issubset(FACTION_PARTITIONS):
+        return False
+    for table in written_tables:
+        outside = f"IFNULL(({FACTION_PARTITIONS[table]}), 0) = 0"
+        if _rows(base, table, outside, (faction,)) != _rows(snapshot, table, outside, (faction,)):
+            return False
+    return True
+
+
+def _partitions_unchanged(faction, written_tables, base, conn):
+    """
+    Проверяет, что разделы фракции в основной БД такие же, как в снимке до хода
+    (их не изменил повторный ход одной из предыдущих фракций).
+    """
+    for table in written_tables:
+        where = FACTION_PARTITIONS[table]
+        if _rows(conn, table, where, (faction,)) != _rows(base, table, where, (faction,)):
+            return False
+    return True
+
+
+def _apply_partitions(faction, written_tables, base, snapshot, conn):
+    """
+    Переносит разделы фракции из снимка в основную БД одной транзакцией.
+    Существующие строки сохраняют свой id, новые получают id от основной БД.
+    """
+    with conn:
+        for table in sorted(written_tables):
+            where = FACTION_PARTITIONS[table]
+            new_rows = _rows(snapshot, table, where, (faction,))
+            if new_rows == _rows(base, table, where, (faction,)):
+                continue
+
+            columns = [row[1] for row in base.execute(f"PRAGMA table_info({table})").fetchall()]
+            base_ids = set()
+            if 'id' in columns:
+                id_index = columns.index('id')
+                base_ids = {row[0] for row in base.execute(f"SELECT id FROM {table} WHERE {where}", (faction,))}
+
+            conn.execute(f"DELETE FROM {table} WHERE {where}", (faction,))
+            for row in new_rows:
+                if 'id' in columns and row[id_index] not in base_ids:
+                    insert_columns = [c for c in columns if c != 'id']
+                    values = [v for c, v in zip(columns, row) if c != 'id']
+                else:
+                    insert_columns, values = columns, list(row)
+                conn.execute(
+                    f"INSERT INTO {table} ({', '.join(insert_columns)}) "
+                    f"VALUES ({', '.join('?' for _ in insert_columns)})",
+                    values
+                )
+
+
+def run_ai_turns_parallel(conn, ai_controllers, max_workers=None):
+    """
+    Выполняет ход всех фракций ИИ: планирование параллельно, применение и повторные
+    ходы — в порядке ai_controllers.
+
+    :param conn: Основное соединение с базой данных.
+    :param ai_controllers: Словарь {faction: AIController}.
+    :param max_workers: Размер пула потоков (по умолчанию — число ядер).
+    :return: Словарь {'merged': [...], 'replayed': [...]} — какие фракции применены
+             из снимка, а какие сходили заново на основном соединении.
+    """
+    if not ai_controllers:
+        return {'merged': [], 'replayed': []}
+
+    factions = list(ai_controllers)
+    make_snapshot = _snapshot_factory(conn)
+    if make_snapshot is None:
+        print("[AI] Снимок БД внутри транзакции хода недоступен, ход ИИ выполняется последовательно")
+        for faction in factions:
+            ai_controllers[faction].make_turn()
+        return {'merged': [], 'replayed': factions}
+
+    base = make_snapshot()
+    snapshots = {faction: make_snapshot() for faction in factions}
+
+    # Зерно хода берётся из общего random в основном потоке (воспроизводимо при
+    # random.seed), генератор фракции — от зерна, номера хода и имени фракции.
+    # Состояние сохраняется после этого: повторный ход повторит те же решения
+    turn_seed = random.getrandbits(64)
+    for faction in factions:
+        controller = ai_controllers[faction]
+        controller.rng = random.Random(f"{turn_seed}:{controller.turn}:{faction}")
+    saved_states = {faction: _save_controller_state(ai_controllers[faction]) for faction in factions}
+
+    workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=min(workers, len(factions))) as pool:
+        futures = {
+            faction: pool.submit(_plan_faction_turn, ai_controllers[faction], snapshots[faction])
+            for faction in factions
+        }
+        plans = {}
+        for faction in factions:
+            try:
+                plans[faction] = futures[faction].result()
+            except Exception as e:
+                print(f"[AI] Ошибка планирования хода фракции {faction}: {e}")
+                plans[faction] = None
+
+    merged, replayed = [], []
+    for faction in factions:
+        controller = ai_controllers[faction]
+        controller.db_connection = conn
+        controller.cursor = conn.cursor()
+
+        written_tables = plans[faction]
+        if (written_tables is not None
+                and _is_local_plan(faction, written_tables, base, snapshots[faction])
+                and _partitions_unchanged(faction, written_tables, base, conn)):
+            try:
+                _apply_partitions(faction, written_tables, base, snapshots[faction], conn)
+                merged.append(faction)
+                controller.flush_deferred_callbacks()
+                continue
+            except sqlite3.Error as e:
+                print(f"[AI] Не удалось применить план фракции {faction}: {e}")
+
+        # План нельзя перенести — фракция ходит заново на основном соединении, в своей очереди
+        vars(controller).update(saved_states[faction])
+        replayed.append(faction)
+        controller.make_turn()
+
+    for snapshot in snapshots.values():
+        snapshot.close()
+    base.close()
+
+    print(f"[AI] Параллельный ход: из снимка применено {len(merged)}, "
+          f"последовательно переиграно {len(replayed)}")
+    return {'merged': merged, 'replayed': replayed}
@@ -13,6 +13,7 @@ import sqlite3
 import threading
 
 from economic import format_number
+from army_strength import get_army_strength
 # Глобальная блокировка для работы с БД
 db_lock = threading.Lock()
 from nobles import show_nobles_window
@@ -488,63 +489,9 @@ def calculate_peace_army_points(conn, faction):
     - Герои 2 и 3 класса усиливают ТОЛЬКО юнитов 1 класса из своего гарнизона
     - Бонусы не распространяются между городами
     """
-    cursor = conn.cursor()
-
     try:
-        # Получаем данные с привязкой к городу
-        cursor.execute("""
-            SELECT g.city_name, g.unit_name, g.unit_count, u.attack, u.defense, u.durability, u.unit_class 
-            FROM garrisons g
-            JOIN units u ON g.unit_name = u.unit_name
-            WHERE u.faction = ?
-        """, (faction,))
-        units_data = cursor.fetchall()
-
-        # Группируем юниты по городам
-        cities_data = {}
-
-        for row in units_data:
-            city_name, unit_name, unit_count, attack, defense, durability, unit_class = row
-
-            if city_name not in cities_data:
-                cities_data[city_name] = {
-                    "class_1": {"count": 0, "total_stats": 0},
-                    "heroes": {"total_stats": 0},   # классы 2 и 3
-                    "others": {"total_stats": 0}    # классы 4 и выше
-                }
-
-            stats_sum = attack + defense + durability
-
-            if unit_class == "1":
-                cities_data[city_name]["class_1"]["count"] += unit_count
-                cities_data[city_name]["class_1"]["total_stats"] += stats_sum * unit_count
-            elif unit_class in ("2", "3"):
-                cities_data[city_name]["heroes"]["total_stats"] += stats_sum * unit_count
-            else:
-                cities_data[city_name]["others"]["total_stats"] += stats_sum * unit_count
-
-        # Рассчитываем силу для каждого города отдельно
-        total_strength = 0
-
-        for city, data in cities_data.items():
-            class_1_count = data["class_1"]["count"]
-            base_stats = data["class_1"]["total_stats"]
-            hero_bonus = data["heroes"]["total_stats"]
-            others_stats = data["others"]["total_stats"]
-
-            city_strength = 0
-
-            # Бонусы героев применяются ТОЛЬКО к юнитам 1 класса в этом городе
-            if class_1_count > 0:
-                city_strength += base_stats + hero_bonus * class_1_count
-
-            # Юниты 4+ класса добавляются без бонусов
-            city_strength += others_stats
-
-            total_strength += city_strength
-
-        return total_strength
-
+        # Суммы по гарнизонам поддерживаются в army_strength
+        return get_army_strength(conn).garrison_power(faction)
     except Exception as e:
         print(f"Ошибка при вычислении очков армии: {e}")
         return 0
@@ -552,71 +499,8 @@ def calculate_peace_army_points(conn, faction):
 
 def calculate_army_strength(conn):
     """Рассчитывает силу армий для каждой фракции с локальными бонусами по гарнизонам."""
-
-    army_strength = {}
-
     try:
-        cursor = conn.cursor()
-
-        # Получаем все юниты с привязкой к городу
-        cursor.execute("""
-            SELECT g.city_name, g.unit_name, g.unit_count, u.faction, u.attack, u.defense, u.durability, u.unit_class 
-            FROM garrisons g
-            JOIN units u ON g.unit_name = u.unit_name
-        """)
-        garrison_data = cursor.fetchall()
-
-        # Собираем данные по фракциям и городам
-        factions_data = {}
-
-        for row in garrison_data:
-            city_name, unit_name, unit_count, faction, attack, defense, durability, unit_class = row
-
-            if not faction:
-                continue
-
-            if faction not in factions_data:
-                factions_data[faction] = {}
-
-            if city_name not in factions_data[faction]:
-                factions_data[faction][city_name] = {
-                    "class_1": {"count": 0, "total_stats": 0},
-                    "heroes": {"total_stats": 0},  # герои класса 2 и 3
-                    "others": {"total_stats": 0}   # юниты класса 4 и выше
-                }
-
-            stats_sum = attack + defense + durability
-            city_data = factions_data[faction][city_name]
-
-            if unit_class == "1":
-                city_data["class_1"]["count"] += unit_count
-                city_data["class_1"]["total_stats"] += stats_sum * unit_count
-            elif unit_class in ("2", "3"):
-                city_data["heroes"]["total_stats"] += stats_sum * unit_count
-            else:  # класс 4 и выше
-                city_data["others"]["total_stats"] += stats_sum * unit_count
-
-        # Рассчитываем силу для каждой фракции
-        for faction, cities in factions_data.items():
-            faction_strength = 0
-
-            for city, data in cities.items():
-                class_1_count = data["class_1"]["count"]
-                base_stats = data["class_1"]["total_stats"]
-                hero_bonus = data["heroes"]["total_stats"]
-                others_stats = data["others"]["total_stats"]
-
-                city_strength = 0
-
-                # Локальное применение бонусов: только внутри города
-                if class_1_count > 0:
-                    city_strength += base_stats + hero_bonus * class_1_count
-
-                city_strength += others_stats
-                faction_strength += city_strength
-
-            army_strength[faction] = faction_strength
-
+        army_strength = get_army_strength(conn).garrison_powers()
     except Exception as e:
         print(f"Ошибка при работе с базой данных: {e}")
         return {}
@@ -737,63 +621,9 @@ def calculate_total_faction_power(conn, faction):
     - ВСЕ герои фракции классов 2 и 3 усиливают ВСЕХ юнитов 1-го класса
       во ВСЕХ гарнизонах фракции (бонусы суммируются)
     """
-    cursor = conn.cursor()
-
     try:
-        # === ШАГ 1: Находим ВСЕХ героев фракции классов 2 и 3 ===
-        # Убрали LIMIT 1 — теперь получаем всех героев для суммирования бонусов
-        cursor.execute("""
-            SELECT u.attack, u.defense, u.durability, u.unit_class
-            FROM garrisons g
-            JOIN units u ON g.unit_name = u.unit_name
-            WHERE u.faction = ? AND u.unit_class IN ('2', '3')
-        """, (faction,))
-
-        hero_rows = cursor.fetchall()
-
-        # Суммируем характеристики ВСЕХ героев классов 2 и 3
-        total_hero_stats = 0
-        for hero_row in hero_rows:
-            hero_attack, hero_defense, hero_durability, hero_class = hero_row
-            total_hero_stats += hero_attack + hero_defense + hero_durability
-
-        # === ШАГ 2: Считаем ВСЕ юниты фракции ===
-        cursor.execute("""
-            SELECT g.unit_name, g.unit_count, u.attack, u.defense, u.durability, u.unit_class 
-            FROM garrisons g
-            JOIN units u ON g.unit_name = u.unit_name
-            WHERE u.faction = ?
-        """, (faction,))
-
-        units_data = cursor.fetchall()
-
-        total_class_1_count = 0      # Общее количество юнитов 1-го класса по всей фракции
-        total_class_1_stats = 0      # Сумма характеристик всех юнитов 1-го класса
-        total_others_stats = 0       # Сумма характеристик юнитов 4+ класса
-
-        for row in units_data:
-            unit_name, unit_count, attack, defense, durability, unit_class = row
-            stats_sum = attack + defense + durability
-
-            if unit_class == "1":
-                total_class_1_count += unit_count
-                total_class_1_stats += stats_sum * unit_count
-            elif unit_class in ("2", "3"):
-                # Герои не учитываются в базе мощности, только как источник бонуса
-                pass
-            else:  # класс 4 и выше
-                total_others_stats += stats_sum * unit_count
-
-        # === ШАГ 3: Применяем ГЛОБАЛЬНЫЙ бонус ВСЕХ героев ===
-        # Суммарный бонус всех героев умножается на ОБЩЕЕ количество юнитов 1-го класса фракции
-        global_bonus = total_hero_stats * total_class_1_count
-
-        # Итоговая формула:
         # Общая мощь = (база юнитов 1-го класса) + (глобальный бонус всех героев) + (юниты 4+ класса)
-        total_power = total_class_1_stats + global_bonus + total_others_stats
-
-        return total_power
-
+        return get_army_strength(conn).total_power(faction)
     except Exception as e:
         print(f"Ошибка при вычислении общей мощи фракции {faction}: {e}")
         return 0
@@ -2,6 +2,7 @@
 
 import sqlite3
 from db_lerdon_connect import db_path
+from fight import invalidate_unit_catalog
 
 class SeasonManager:
     """
@@ -62,6 +63,8 @@ class SeasonManager:
         self.last_idx = None
         # Кэш артефактов - словарь {artifact_id: (attack, defense, season_name)}
         self._artifact_cache = {}
+        # Кэш пересчёта юнитов - {unit_name: (входные данные, итоговые характеристики)}
+        self._unit_stats_cache = {}
 
     def _load_artifact_cache(self, conn, faction_type="both"):
         """
@@ -119,6 +122,11 @@ class SeasonManager:
         1. Базовых значений из units_default.
         2. Бонусов от артефактов (из artifact_effects_log).
         3. Сезонного коэффициента (из FACTION_EFFECTS).
+
+        Итог пересчитывается только для юнитов, у которых изменились база,
+        бонусы артефактов или сезонный коэффициент, а записываются только
+        строки units, отличающиеся от итога, — одним executemany в одной
+        транзакции. Если ничего не изменилось, запись и commit не выполняются.
         """
         if season_idx is None:
             print("[SEASON] Season index is None, cannot recalculate units.")
@@ -143,56 +151,39 @@ class SeasonManager:
                 artifact_effects[hero_name] = {}
             artifact_effects[hero_name][stat_name] = total_change
 
+        # Текущие значения в units (их могли сбросить к базе и в других местах)
+        cur.execute("SELECT unit_name, attack, defense, durability, cost_money, cost_time FROM units")
+        current_units = {row[0]: tuple(row[1:]) for row in cur.fetchall()}
+
         # Получаем сезонный коэффициент для статов (attack, defense)
         current_season_effects = self.FACTION_EFFECTS[season_idx]
 
-        # Пересчитываем характеристики
+        updates = []
         for unit_name, base_data in default_units.items():
-            base_atk = base_data['attack']
-            base_def = base_data['defense']
-            base_hp = base_data['durability']
-            base_cost_money = base_data['cost_money']
-            base_cost_time = base_data['cost_time']
-            faction = base_data['faction']
-
-            # 1. Применяем бонусы от артефактов к базовым значениям
-            artifact_bonus_atk = artifact_effects.get(unit_name, {}).get('attack', 0)
-            artifact_bonus_def = artifact_effects.get(unit_name, {}).get('defense', 0)
-            artifact_bonus_hp = artifact_effects.get(unit_name, {}).get('durability', 0)
-            artifact_bonus_cost_money = artifact_effects.get(unit_name, {}).get('cost_money', 0)
-            artifact_bonus_cost_time = artifact_effects.get(unit_name, {}).get('cost_time', 0)
-
-            # Итог после артефактов (формула: база + (база * процент_артефакта / 100))
-            # Но процент артефакта уже хранится как бонус, его нужно преобразовать обратно в коэффициент
-            # Пусть A - процент артефакта. Тогда bonus = base * (A / 100).
-            # Итог = base + bonus = base + base * (A / 100) = base * (1 + A / 100).
-            # Нам нужен коэффициент от артефактов: artifact_coeff = 1 + A / 100.
-            # Тогда итог после артефактов: base * artifact_coeff.
-            # Однако, в _calculate_stat_change_from_default мы делаем: base * (A / 100) = bonus.
-            # Итог после артефактов: base + bonus.
-            # Теперь применяем сезонный коэффициент к этому итогу.
-            artifact_coeff_atk = 1.0 + (artifact_bonus_atk / 100.0) if base_atk != 0 else 1.0
-            artifact_coeff_def = 1.0 + (artifact_bonus_def / 100.0) if base_def != 0 else 1.0
-            artifact_coeff_hp = 1.0 + (artifact_bonus_hp / 100.0) if base_hp != 0 else 1.0
-
-            temp_atk = int(round(base_atk * artifact_coeff_atk)) if base_atk != 0 else base_atk + artifact_bonus_atk
-            temp_def = int(round(base_def * artifact_coeff_def)) if base_def != 0 else base_def + artifact_bonus_def
-            temp_hp = int(round(base_hp * artifact_coeff_hp)) if base_hp != 0 else base_hp + artifact_bonus_hp
-
-            # 2. Применяем сезонный коэффициент к результату после артефактов
-            # Получаем коэффициент для фракции
-            faction_season_effects = current_season_effects.get(faction, {'stat': 1.0, 'cost': 1.0})
-            season_stat_coeff = faction_season_effects['stat']
-            season_cost_coeff = faction_season_effects['cost']
-
-            final_atk = int(round(temp_atk * season_stat_coeff))
-            final_def = int(round(temp_def * season_stat_coeff))
-            final_hp = int(round(temp_hp * season_stat_coeff))
-            final_cost_money = int(round((base_cost_money + artifact_bonus_cost_money) * season_cost_coeff))
-            final_cost_time = int(round((base_cost_time + artifact_bonus_cost_time) * season_cost_coeff))
-
-            # Обновляем таблицу units
-            cur.execute("""
+            faction_season_effects = current_season_effects.get(base_data['faction'], {'stat': 1.0, 'cost': 1.0})
+            unit_effects = artifact_effects.get(unit_name, {})
+
+            # Пересчитываем юнит, только если изменились его входные данные
+            signature = (tuple(base_data.values()),
+                         faction_season_effects['stat'], faction_season_effects['cost'],
+                         tuple(sorted(unit_effects.items())))
+            cached = self._unit_stats_cache.get(unit_name)
+            if cached is not None and cached[0] == signature:
+                final_stats = cached[1]
+            else:
+                final_stats = self._calculate_unit_stats(base_data, unit_effects, faction_season_effects)
+                self._unit_stats_cache[unit_name] = (signature, final_stats)
+
+            if unit_name in current_units and current_units[unit_name] != final_stats:
+                updates.append(final_stats + (unit_name,))
+
+        if not updates:
+            print(f"[SEASON] Характеристики в units актуальны для сезона {self.SEASON_NAMES[season_idx]}")
+            return
+
+        # Обновляем таблицу units
+        with conn:
+            cur.executemany("""
                 UPDATE units
                 SET
                     attack = ?,
@@ -201,10 +192,58 @@ class SeasonManager:
                     cost_money = ?,
                     cost_time = ?
                 WHERE unit_name = ?
-            """, (final_atk, final_def, final_hp, final_cost_money, final_cost_time, unit_name))
+            """, updates)
 
-        conn.commit()
-        print(f"[SEASON] Пересчитаны характеристики в units для сезона {self.SEASON_NAMES[season_idx]}")
+        # Таблица units переписана — справочник юнитов в fight.py нужно перечитать
+        invalidate_unit_catalog()
+        print(f"[SEASON] Пересчитаны характеристики {len(updates)} юнитов для сезона {self.SEASON_NAMES[season_idx]}")
+
+    @staticmethod
+    def _calculate_unit_stats(base_data, unit_effects, faction_season_effects):
+        """
+        Итоговые (attack, defense, durability, cost_money, cost_time) юнита
+        после бонусов артефактов и сезонного коэффициента.
+        """
+        base_atk = base_data['attack']
+        base_def = base_data['defense']
+        base_hp = base_data['durability']
+        base_cost_money = base_data['cost_money']
+        base_cost_time = base_data['cost_time']
+
+        # 1. Применяем бонусы от артефактов к базовым значениям
+        artifact_bonus_atk = unit_effects.get('attack', 0)
+        artifact_bonus_def = unit_effects.get('defense', 0)
+        artifact_bonus_hp = unit_effects.get('durability', 0)
+        artifact_bonus_cost_money = unit_effects.get('cost_money', 0)
+        artifact_bonus_cost_time = unit_effects.get('cost_time', 0)
+
+        # Итог после артефактов (формула: база + (база * процент_артефакта / 100))
+        # Но процент артефакта уже хранится как бонус, его нужно преобразовать обратно в коэффициент
+        # Пусть A - процент артефакта. Тогда bonus = base * (A / 100).
+        # Итог = base + bonus = base + base * (A / 100) = base * (1 + A / 100).
+        # Нам нужен коэффициент от артефактов: artifact_coeff = 1 + A / 100.
+        # Тогда итог после артефактов: base * artifact_coeff.
+        # Однако, в _calculate_stat_change_from_default мы делаем: base * (A / 100) = bonus.
+        # Итог после артефактов: base + bonus.
+        # Теперь применяем сезонный коэффициент к этому итогу.
+        artifact_coeff_atk = 1.0 + (artifact_bonus_atk / 100.0) if base_atk != 0 else 1.0
+        artifact_coeff_def = 1.0 + (artifact_bonus_def / 100.0) if base_def != 0 else 1.0
+        artifact_coeff_hp = 1.0 + (artifact_bonus_hp / 100.0) if base_hp != 0 else 1.0
+
+        temp_atk = int(round(base_atk * artifact_coeff_atk)) if base_atk != 0 else base_atk + artifact_bonus_atk
+        temp_def = int(round(base_def * artifact_coeff_def)) if base_def != 0 else base_def + artifact_bonus_def
+        temp_hp = int(round(base_hp * artifact_coeff_hp)) if base_hp != 0 else base_hp + artifact_bonus_hp
+
+        # 2. Применяем сезонный коэффициент к результату после артефактов
+        season_stat_coeff = faction_season_effects['stat']
+        season_cost_coeff = faction_season_effects['cost']
+
+        final_atk = int(round(temp_atk * season_stat_coeff))
+        final_def = int(round(temp_def * season_stat_coeff))
+        final_hp = int(round(temp_hp * season_stat_coeff))
+        final_cost_money = int(round((base_cost_money + artifact_bonus_cost_money) * season_cost_coeff))
+        final_cost_time = int(round((base_cost_time + artifact_bonus_cost_time) * season_cost_coeff))
+        return final_atk, final_def, final_hp, final_cost_money, final_cost_time
 
     def apply_artifact_bonuses(self, conn):
         """
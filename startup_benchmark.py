@@ -0,0 +1,293 @@
+"""
+Бенчмарк холодного старта: время импорта модулей и первого кадра.
+
+Каждый замер выполняется в отдельном процессе, чтобы импорт был «холодным»:
+- импорт каждого модуля верхнего уровня (main, game_process, ii, economic,
+  ai_models.diplomacy_chat, ...) — медиана и минимум по нескольким запускам
+  и самые долгие вложенные импорты (startup_profiler);
+- время до первого кадра LoadingScreen (от начала импорта main) и время,
+  за которое LoadingScreen.run_next_step доходит до step_complete.
+
+Окно Kivy создаётся без дисплея: по умолчанию KIVY_GL_BACKEND=mock и
+SDL_VIDEODRIVER=dummy (их можно переопределить окружением или --window).
+Если оконный провайдер в системе всё же требует дисплей, запускайте через
+xvfb-run. Замер кадра идёт на временной копии game_data.db, рабочая база
+не меняется.
+
+Запуск:
+    python startup_benchmark.py --repeat 5 --output startup.json
+    python startup_benchmark.py --compare startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'game_data.db')
+
+DEFAULT_MODULES = [
+    'lerdon_libraries',
+    'main',
+    'game_process',
+    'ii',
+    'economic',
+    'army',
+    'politic',
+    'fight',
+    'ui',
+    'seasons',
+    'nobles_generator',
+    'event_manager',
+    'ai_models.diplomacy_chat',
+]
+
+# Маркер строки с результатом в выводе рабочего процесса
+RESULT_MARKER = 'STARTUP_BENCHMARK_RESULT '
+
+HEADLESS_ENV = {
+    'KIVY_NO_ARGS': '1',
+    'KIVY_NO_FILELOG': '1',
+    'KIVY_NO_CONSOLELOG': '1',
+    'KIVY_GL_BACKEND': 'mock',
+    'SDL_VIDEODRIVER': 'dummy',
+    'LERDON_IMPORT_PROFILE': '1',
+}
+
+
+def _ms(seconds):
+    return round(seconds * 1000.0, 2)
+
+
+# --- Рабочие процессы ---
+def _worker_import(module_name):
+    import importlib
+    import startup_profiler
+    startup_profiler.install()
+
+    started = time.perf_counter()
+    importlib.import_module(module_name)
+    elapsed = time.perf_counter() - started
+
+    imports = sorted(startup_profiler._profiler.imports.items(),
+                     key=lambda item: item[1]['self_ms'], reverse=True)
+    return {
+        'import_ms': _ms(elapsed),
+        'modules_loaded': len(imports),
+        'slowest': [{'module': name, 'self_ms': info['self_ms']} for name, info in imports[:10]],
+    }
+
+
+def _worker_frame(db_source, timeout):
+    import startup_profiler
+    startup_profiler.install()
+
+    work_dir = tempfile.mkdtemp(prefix='lerdon_bench_')
+    work_db = os.path.join(work_dir, 'game_data.db')
+    shutil.copyfile(db_source, work_db)
+
+    result = {}
+    started = time.perf_counter()
+    try:
+        import main
+        result['import_main_ms'] = _ms(time.perf_counter() - started)
+        main.db_path = work_db  # Lerdon и сброс партии работают с копией базы
+
+        from kivy.clock import Clock
+        loading_screen = main.LoadingScreen
+        steps_started = {}
+
+        original_start = loading_screen.start_loading
+        original_complete = loading_screen.step_complete
+
+        def start_loading(self, dt):
+            now = time.perf_counter()
+            result.setdefault('first_frame_ms', _ms(now - started))
+            steps_started.setdefault('at', now)
+            return original_start(self, dt)
+
+        def step_complete(self):
+            now = time.perf_counter()
+            result['steps_to_complete_ms'] = _ms(now - steps_started.get('at', now))
+            result['step_complete_ms'] = _ms(now - started)
+            original_complete(self)
+            Clock.schedule_once(lambda dt: app.stop(), 0)
+
+        def on_timeout(dt):
+            result['error'] = f"step_complete не достигнут за {timeout} с"
+            app.stop()
+
+        loading_screen.start_loading = start_loading
+        loading_screen.step_complete = step_complete
+
+        app = main.Lerdon()
+        Clock.schedule_once(on_timeout, timeout)
+        app.run()
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return result
+
+
+# --- Запуск замеров ---
+def _run_worker(args, env_overrides, timeout):
+    env = dict(os.environ)
+    for key, value in HEADLESS_ENV.items():
+        env.setdefault(key, value)
+    env.update(env_overrides)
+    command = [sys.executable, os.path.abspath(__file__), '--worker'] + args
+    try:
+        completed = subprocess.run(command, cwd=BASE_DIR, env=env, capture_output=True,
+                                   text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': f"процесс не завершился за {timeout} с"}
+
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    tail = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ['нет вывода']
+    return {'error': f"код {completed.returncode}: {tail[0]}"}
+
+
+def _summary(values):
+    return {
+        'median': round(statistics.median(values), 2),
+        'min': round(min(values), 2),
+        'max': round(max(values), 2),
+    }
+
+
+def measure_imports(modules, repeat, env_overrides):
+    results = {}
+    for module_name in modules:
+        runs = [_run_worker(['import', module_name], env_overrides, timeout=300) for _ in range(repeat)]
+        ok = [run for run in runs if 'error' not in run]
+        if not ok:
+            results[module_name] = {'error': runs[-1]['error']}
+            continue
+        results[module_name] = {
+            'import_ms': _summary([run['import_ms'] for run in ok]),
+            'modules_loaded': ok[-1]['modules_loaded'],
+            'slowest': ok[-1]['slowest'],
+            'runs': len(ok),
+        }
+    return results
+
+
+def measure_frame(repeat, db_source, timeout, env_overrides):
+    runs = [_run_worker(['frame', '--db', db_source, '--timeout', str(timeout)], env_overrides,
+                        timeout=timeout + 120) for _ in range(repeat)]
+    ok = [run for run in runs if 'error' not in run]
+    if not ok:
+        return {'error': runs[-1]['error']}
+    summary = {key: _summary([run[key] for run in ok])
+               for key in ('import_main_ms', 'first_frame_ms', 'steps_to_complete_ms', 'step_complete_ms')}
+    summary['runs'] = len(ok)
+    return summary
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=30).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(modules=None, repeat=3, db_source=DEFAULT_DB_PATH, frame=True,
+                  frame_timeout=60, window=None):
+    """
+    Выполняет все замеры.
+    :return: Отчёт (словарь, пригодный для JSON).
+    """
+    env_overrides = {'KIVY_WINDOW': window} if window else {}
+    report = {
+        'revision': _git_revision(),
+        'finished_at': None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'imports': measure_imports(modules or DEFAULT_MODULES, repeat, env_overrides),
+        'frame': measure_frame(repeat, db_source, frame_timeout, env_overrides) if frame else None,
+    }
+    report['finished_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    return report
+
+
+def _print_report(report, baseline=None):
+    def delta(current, previous):
+        if previous is None:
+            return ''
+        return f" ({current - previous:+.2f})"
+
+    base_imports = (baseline or {}).get('imports', {})
+    print(f"Ревизия: {report['revision']}, Python {report['python']}, запусков: {report['repeat']}")
+    for module_name, info in report['imports'].items():
+        if 'error' in info:
+            print(f"  import {module_name}: ошибка — {info['error']}")
+            continue
+        previous = base_imports.get(module_name, {}).get('import_ms', {}).get('median')
+        print(f"  import {module_name}: {info['import_ms']['median']} мс{delta(info['import_ms']['median'], previous)}"
+              f" (модулей: {info['modules_loaded']})")
+
+    frame = report['frame']
+    if frame is None:
+        return
+    if 'error' in frame:
+        print(f"  LoadingScreen: ошибка — {frame['error']}")
+        return
+    base_frame = (baseline or {}).get('frame') or {}
+    for key, title in (('first_frame_ms', 'первый кадр LoadingScreen'),
+                       ('steps_to_complete_ms', 'run_next_step → step_complete')):
+        previous = base_frame.get(key, {}).get('median') if 'error' not in base_frame else None
+        print(f"  {title}: {frame[key]['median']} мс{delta(frame[key]['median'], previous)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта игры")
+    parser.add_argument('--modules', nargs='*', default=None, help="Модули для замера импорта")
+    parser.add_argument('--repeat', type=int, default=3, help="Запусков на каждый замер")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Путь к game_data.db")
+    parser.add_argument('--no-frame', action='store_true', help="Не замерять первый кадр LoadingScreen")
+    parser.add_argument('--frame-timeout', type=int, default=60, help="Таймаут замера кадра, с")
+    parser.add_argument('--window', default=None, help="Оконный провайдер Kivy (KIVY_WINDOW)")
+    parser.add_argument('--output', default=None, help="Сохранить результаты в JSON")
+    parser.add_argument('--compare', default=None, help="JSON прошлого запуска для сравнения")
+    parser.add_argument('--worker', nargs='+', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--timeout', type=int, default=60, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        kind = args.worker[0]
+        if kind == 'import':
+            result = _worker_import(args.worker[1])
+        else:
+            result = _worker_frame(args.db, args.timeout)
+        print(RESULT_MARKER + json.dumps(result, ensure_ascii=False))
+        return
+
+    report = run_benchmark(modules=args.modules, repeat=args.repeat, db_source=args.db,
+                           frame=not args.no_frame, frame_timeout=args.frame_timeout, window=args.window)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    _print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
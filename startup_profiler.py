@@ -0,0 +1,137 @@
+"""
+Профилировщик холодного старта: время импорта каждого модуля.
+
+Включается переменной окружения LERDON_IMPORT_PROFILE=1 (или enabled=True).
+install() нужно вызвать до остальных импортов main.py: после этого каждый
+впервые загружаемый модуль замеряется — полное время импорта (вместе с
+вложенными импортами) и собственное время модуля. mark() отмечает время от
+старта процесса до ключевых событий (первый кадр LoadingScreen, показ
+меню), report() печатает самые долгие импорты и сохраняет отчёт в JSON.
+"""
+
+import json
+import os
+import sys
+import time
+
+
+class _TimedLoader:
+    """Обёртка над загрузчиком модуля, замеряющая exec_module."""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._enter(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class StartupProfiler:
+    def __init__(self, enabled=None):
+        """
+        :param enabled: Включить профилирование (по умолчанию — из LERDON_IMPORT_PROFILE).
+        """
+        if enabled is None:
+            enabled = os.environ.get('LERDON_IMPORT_PROFILE', '') == '1'
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.imports = {}   # {модуль: {'total_ms', 'self_ms', 'parent'}}
+        self.marks = {}     # {событие: мс от старта}
+        self._stack = []    # [[модуль, начало, время вложенных импортов], ...]
+        self._installed = False
+
+    # --- Перехват импортов ---
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def _enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, name):
+        _name, started, children = self._stack.pop()
+        total = time.perf_counter() - started
+        if self._stack:
+            self._stack[-1][2] += total
+        self.imports[name] = {
+            'total_ms': round(total * 1000.0, 2),
+            'self_ms': round((total - children) * 1000.0, 2),
+            'parent': self._stack[-1][0] if self._stack else None,
+        }
+
+    def install(self):
+        if self.enabled and not self._installed:
+            sys.meta_path.insert(0, self)
+            self._installed = True
+        return self
+
+    def uninstall(self):
+        if self._installed:
+            sys.meta_path.remove(self)
+            self._installed = False
+
+    # --- Отчёт ---
+    def mark(self, event):
+        """Отмечает время от старта процесса до события."""
+        if self.enabled and event not in self.marks:
+            self.marks[event] = round((time.perf_counter() - self.started) * 1000.0, 2)
+
+    def report(self, report_path=None, top=15):
+        """
+        Печатает самые долгие импорты и сохраняет полный отчёт в JSON.
+        :param report_path: Путь к JSON-файлу (None — только вывод в консоль).
+        :param top: Сколько модулей показать в консоли.
+        """
+        if not self.enabled:
+            return None
+        imports = sorted(self.imports.items(), key=lambda item: item[1]['self_ms'], reverse=True)
+        report = {
+            'marks': self.marks,
+            'total_import_ms': round(sum(info['self_ms'] for info in self.imports.values()), 2),
+            'imports': [dict(module=name, **info) for name, info in imports],
+        }
+
+        print(f"[STARTUP] Импорт модулей: {report['total_import_ms']} мс, события: {self.marks}")
+        for name, info in imports[:top]:
+            print(f"[STARTUP]   {name}: {info['self_ms']} мс (вместе с вложенными {info['total_ms']} мс)")
+
+        if report_path:
+            try:
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+            except OSError as e:
+                print(f"[STARTUP] Не удалось сохранить отчёт запуска: {e}")
+        return report
+
+
+_profiler = StartupProfiler()
+
+
+def install():
+    """Начинает замер импортов (если профилирование включено)."""
+    return _profiler.install()
+
+
+def mark(event):
+    _profiler.mark(event)
+
+
+def report(report_path=None, top=15):
+    return _profiler.report(report_path, top)
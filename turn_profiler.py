@@ -0,0 +1,125 @@
+"""
+Профилировщик фаз хода для GameScreen.process_turn.
+
+Включается переменной окружения LERDON_TURN_PROFILE=1 (или enabled=True).
+Для каждой фазы хода (и для каждой фракции ИИ) записывает время выполнения,
+число SQL-запросов и число изменённых строк, а для соединения с единицами
+работы (db_manager.UnitOfWorkConnection) — ещё и число commit/rollback.
+Отчёт за ход дописывается в JSONL-файл, в котором хранятся только
+последние max_turns ходов.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class TurnProfiler:
+    def __init__(self, conn, report_path, enabled=None, max_turns=50):
+        """
+        :param conn: Соединение с базой данных, запросы которого считаются.
+        :param report_path: Путь к JSONL-файлу с отчётами по ходам.
+        :param enabled: Включить профилирование (по умолчанию — из LERDON_TURN_PROFILE).
+        :param max_turns: Сколько последних ходов хранить в файле.
+        """
+        if enabled is None:
+            enabled = os.environ.get('LERDON_TURN_PROFILE', '') == '1'
+        self.enabled = enabled
+        self.conn = conn
+        self.report_path = report_path
+        self.max_turns = max_turns
+
+        self._sql_count = 0
+        self._turn = None
+        self._turn_started = None
+        self._turn_changes = 0
+        self._uow_before = {}
+        self._phases = []
+
+    def _count_statement(self, _sql):
+        self._sql_count += 1
+
+    def begin_turn(self, turn):
+        """Начинает сбор статистики для нового хода."""
+        if not self.enabled:
+            return
+        self._turn = turn
+        self._phases = []
+        self._sql_count = 0
+        self._turn_started = time.perf_counter()
+        self._turn_changes = self.conn.total_changes
+        self._uow_before = dict(getattr(self.conn, 'uow_stats', {}))
+        self.conn.set_trace_callback(self._count_statement)
+
+    @contextmanager
+    def phase(self, name, faction=None):
+        """
+        Замеряет одну фазу хода.
+        :param name: Название фазы.
+        :param faction: Фракция (для ходов ИИ).
+        """
+        if not self.enabled or self._turn_started is None:
+            yield
+            return
+
+        started = time.perf_counter()
+        sql_before = self._sql_count
+        changes_before = self.conn.total_changes
+        try:
+            yield
+        finally:
+            self._phases.append({
+                'phase': name,
+                'faction': faction,
+                'wall_ms': round((time.perf_counter() - started) * 1000.0, 2),
+                'sql': self._sql_count - sql_before,
+                'rows': self.conn.total_changes - changes_before,
+            })
+
+    def end_turn(self):
+        """Завершает ход: формирует отчёт и сохраняет его в файл."""
+        if not self.enabled or self._turn_started is None:
+            return
+        self.conn.set_trace_callback(None)
+
+        report = {
+            'turn': self._turn,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'total_ms': round((time.perf_counter() - self._turn_started) * 1000.0, 2),
+            'total_sql': self._sql_count,
+            'total_rows': self.conn.total_changes - self._turn_changes,
+            'phases': self._phases,
+        }
+        uow_stats = getattr(self.conn, 'uow_stats', None)
+        if uow_stats is not None:
+            report['transactions'] = {key: value - self._uow_before.get(key, 0)
+                                      for key, value in uow_stats.items()}
+        self._turn_started = None
+
+        if self._phases:
+            slowest = max(self._phases, key=lambda p: p['wall_ms'])
+            label = slowest['phase'] if not slowest['faction'] else f"{slowest['phase']} ({slowest['faction']})"
+            print(f"[PROFILE] Ход {report['turn']}: {report['total_ms']} мс, SQL: {report['total_sql']}, "
+                  f"самая долгая фаза: {label} — {slowest['wall_ms']} мс")
+
+        self._write_report(report)
+        return report
+
+    def _write_report(self, report):
+        """Дописывает отчёт в JSONL, оставляя только последние max_turns строк."""
+        try:
+            lines = []
+            if os.path.exists(self.report_path):
+                with open(self.report_path, 'r', encoding='utf-8') as f:
+                    lines = [line for line in f.read().splitlines() if line.strip()]
+            lines.append(json.dumps(report, ensure_ascii=False))
+            lines = lines[-self.max_turns:]
+
+            tmp_path = self.report_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp_path, self.report_path)
+        except OSError as e:
+            print(f"[PROFILE] Не удалось сохранить отчёт профилирования: {e}")
@@ -1,6 +1,8 @@
 from db_lerdon_connect import *
 
+from asset_registry import asset_exists, asset_source
 from fight import fight
+from map_index import NEIGHBOUR_DISTANCE, get_map_index, invalidate_city_owners
 
 
 def format_number(number):
@@ -875,7 +877,7 @@ class FortressInfoPopup(Popup):
 
                 # Изображение юнита - проверяем существование файла
                 unit_image_source = unit_image
-                if unit_image_source and not os.path.exists(unit_image_source):
+                if unit_image_source and not asset_exists(unit_image_source):
                     print(f"Файл изображения не найден: {unit_image_source}")
                     unit_image_source = "files/pict/placeholder.png"
 
@@ -902,9 +904,9 @@ class FortressInfoPopup(Popup):
 
                 # Иконка специализации (только для классов 2 и 3)
                 if unit_class in ("2", "3") and specialization_icon_path:
-                    if os.path.exists(specialization_icon_path):
+                    if asset_exists(specialization_icon_path):
                         icon_image = Image(
-                            source=specialization_icon_path,
+                            source=asset_source(specialization_icon_path, specialization_icon_path),
                             size_hint=(None, None),
                             size=(120, 120),
                             pos_hint={'center_y': 0.5}
@@ -1012,7 +1014,7 @@ class FortressInfoPopup(Popup):
 
                 # Изображение юнита - проверяем существование файла
                 unit_image_source = unit_image
-                if unit_image_source and not os.path.exists(unit_image_source):
+                if unit_image_source and not asset_exists(unit_image_source):
                     print(f"Файл изображения не найден: {unit_image_source}")
                     unit_image_source = "files/pict/placeholder.png"
 
@@ -1039,9 +1041,9 @@ class FortressInfoPopup(Popup):
 
                 # Иконка специализации (только для классов 2 и 3)
                 if unit_class in ("2", "3") and specialization_icon_path:
-                    if os.path.exists(specialization_icon_path):
+                    if asset_exists(specialization_icon_path):
                         icon_image = Image(
-                            source=specialization_icon_path,
+                            source=asset_source(specialization_icon_path, specialization_icon_path),
                             size_hint=(None, None),
                             size=(120, 120),
                             pos_hint={'center_y': 0.5}
@@ -1564,14 +1566,10 @@ class FortressInfoPopup(Popup):
                         show_popup_message("Ошибка", "Не указан исходный город для перемещения.")
                         return
 
-                    # Получаем координаты городов и считаем манхэттенское расстояние
-                    source_coords = self.get_city_coordinates(source_city)
-                    dest_coords = self.get_city_coordinates(self.city_name)
-                    x_diff = abs(source_coords[0] - dest_coords[0])
-                    y_diff = abs(source_coords[1] - dest_coords[1])
-                    total_diff = x_diff + y_diff
+                    # Манхэттенское расстояние между городами — из индекса карты
+                    total_diff = get_map_index(self.conn).manhattan(source_city, self.city_name)
 
-                    if total_diff < 280:
+                    if total_diff < NEIGHBOUR_DISTANCE:
                         allowed_by_distance = True
                         break  # достаточно одного юнита
 
@@ -1944,6 +1942,7 @@ class FortressInfoPopup(Popup):
                     SET faction = ? 
                     WHERE name = ?
                 """, (new_owner, city_name))
+                invalidate_city_owners()
 
                 # 2. Переносим только атакующие юниты
                 for unit in attacking_units:
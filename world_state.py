@@ -0,0 +1,179 @@
+"""
+Общее состояние мира на время хода ИИ.
+
+Вместо того чтобы каждый метод AIController заново выбирал из БД ресурсы,
+здания, гарнизоны, города и отношения, таблицы читаются несколькими
+массовыми запросами в начале хода ИИ, и все контроллеры пользуются одной
+копией.
+
+Актуальность поддерживается без ручной инвалидации: пока состояние открыто,
+на соединение установлен authorizer, который запоминает таблицы, куда
+что-либо писалось. Такие таблицы перечитываются при следующем обращении,
+если с момента их загрузки изменилось conn.total_changes. Таблицы, в
+которые за ход никто не писал (units, cities, relations чаще всего),
+загружаются один раз.
+"""
+
+import sqlite3
+
+
+class TurnWorldState:
+    TABLES = ('units', 'cities', 'resources', 'buildings', 'garrisons', 'relations')
+
+    def __init__(self, conn):
+        """
+        :param conn: Соединение с базой данных, общее для всех контроллеров ИИ.
+        """
+        self.conn = conn
+        self._data = {}
+        self._loaded_at = {}
+        self._written_tables = set()
+        self._opened = False
+
+    # --- Жизненный цикл ---
+    def open(self):
+        """Загружает все таблицы и начинает отслеживать записи в них."""
+        # set_authorizer сбрасывает подготовленные запросы, поэтому каждая
+        # запись хотя бы раз пройдёт через _authorize.
+        self.conn.set_authorizer(self._authorize)
+        self._opened = True
+        for table in self.TABLES:
+            self._load(table)
+        return self
+
+    def close(self):
+        """Прекращает отслеживание и освобождает загруженные данные."""
+        if self._opened:
+            self.conn.set_authorizer(None)
+        self._opened = False
+        self._data = {}
+        self._loaded_at = {}
+        self._written_tables = set()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _authorize(self, action, arg1, arg2, db_name, trigger):
+        if action in (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE):
+            if arg1 in self.TABLES:
+                self._written_tables.add(arg1)
+        return sqlite3.SQLITE_OK
+
+    def _table(self, table):
+        """Данные таблицы; перечитывает её, если в неё писали после загрузки."""
+        if table not in self._data or (
+                table in self._written_tables and self._loaded_at[table] != self.conn.total_changes):
+            self._load(table)
+        return self._data[table]
+
+    # --- Массовая загрузка ---
+    def _load(self, table):
+        cursor = self.conn.cursor()
+        if table == 'units':
+            cursor.execute("""
+                SELECT unit_name, faction, cost_money, cost_time, image_path,
+                       attack, defense, durability, unit_class, consumption
+                FROM units
+            """)
+            data = {}
+            for row in cursor.fetchall():
+                data[row[0]] = {
+                    'faction': row[1], 'cost_money': row[2], 'cost_time': row[3],
+                    'image_path': row[4], 'attack': row[5], 'defense': row[6],
+                    'durability': row[7], 'unit_class': str(row[8]), 'consumption': row[9],
+                }
+        elif table == 'cities':
+            cursor.execute("SELECT id, name, faction FROM cities")
+            data = [tuple(row) for row in cursor.fetchall()]
+        elif table == 'resources':
+            cursor.execute("SELECT faction, resource_type, amount FROM resources")
+            data = {}
+            for faction, resource_type, amount in cursor.fetchall():
+                data.setdefault(faction, {})[resource_type] = amount
+        elif table == 'buildings':
+            cursor.execute("SELECT faction, city_name, building_type, count FROM buildings")
+            data = {}
+            for faction, city_name, building_type, count in cursor.fetchall():
+                data.setdefault(faction, []).append((city_name, building_type, count))
+        elif table == 'garrisons':
+            cursor.execute("SELECT city_name, unit_name, unit_count, unit_image FROM garrisons")
+            data = [tuple(row) for row in cursor.fetchall()]
+        elif table == 'relations':
+            cursor.execute("SELECT faction1, faction2, relationship FROM relations")
+            data = {}
+            for faction1, faction2, relationship in cursor.fetchall():
+                data.setdefault(faction1, {})[faction2] = relationship
+        else:
+            raise ValueError(f"Неизвестная таблица состояния мира: {table}")
+
+        self._data[table] = data
+        self._loaded_at[table] = self.conn.total_changes
+
+    # --- Запросы контроллеров ---
+    def units(self):
+        """Словарь {unit_name: характеристики юнита}."""
+        return self._table('units')
+
+    def faction_units(self, faction):
+        """Юниты, которые может нанимать фракция: {unit_name: характеристики}."""
+        return {name: info for name, info in self.units().items() if info['faction'] == faction}
+
+    def cities(self, faction):
+        """Города фракции в формате {id: name}."""
+        return {city_id: name for city_id, name, owner in self._table('cities') if owner == faction}
+
+    def city_owner(self, city_name):
+        for _city_id, name, owner in self._table('cities'):
+            if name == city_name:
+                return owner
+        return None
+
+    def resources(self, faction):
+        """Копия ресурсов фракции {resource_type: amount}."""
+        return dict(self._table('resources').get(faction, {}))
+
+    def buildings(self, faction):
+        """Строки зданий фракции: [(city_name, building_type, count), ...]."""
+        return list(self._table('buildings').get(faction, []))
+
+    def relations(self, faction):
+        """Копия отношений фракции {faction2: relationship}."""
+        return dict(self._table('relations').get(faction, {}))
+
+    def garrison(self, faction):
+        """
+        Гарнизоны из юнитов фракции, как в AIController.load_garrison:
+        {city_name: [{"unit_name": ..., "unit_count": ...}, ...]}.
+        """
+        units = self.units()
+        garrison = {}
+        for city_name, unit_name, unit_count, _image in self._table('garrisons'):
+            info = units.get(unit_name)
+            if info is None or info['faction'] != faction:
+                continue
+            garrison.setdefault(city_name, []).append({
+                "unit_name": unit_name,
+                "unit_count": unit_count
+            })
+        return garrison
+
+    def has_unit(self, faction, unit_name):
+        """Стоит ли юнит фракции хотя бы в одном гарнизоне."""
+        info = self.units().get(unit_name)
+        if info is None or info['faction'] != faction:
+            return False
+        return any(name == unit_name for _city, name, _count, _image in self._table('garrisons'))
+
+    def has_unit_of_class(self, faction, unit_class):
+        """Есть ли в гарнизонах юнит фракции указанного класса."""
+        units = self.units()
+        unit_class = str(unit_class)
+        for _city, unit_name, _count, _image in self._table('garrisons'):
+            info = units.get(unit_name)
+            if info is not None and info['faction'] == faction and info['unit_class'] == unit_class:
+                return True
+        return False